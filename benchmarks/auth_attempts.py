@@ -0,0 +1,83 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures the cost of recording authentication attempts: queueing one attempt (what every login
+    attempt pays on the event loop), and writing batches of them to an SQLite database, as the
+    database thread does.
+
+    Usage: python benchmarks/auth_attempts.py
+"""
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import logging
+import os
+import tempfile
+import time
+import timeit
+
+from sqlalchemy import create_engine
+
+from hornet.core.db.handler import AUTH_ATTEMPT_COLUMNS, DatabaseHandler
+from hornet.core.db.models import AuthAttempt, Base
+from hornet.core.db.writer import ColumnBatcher
+from hornet.core.session import Session
+
+NUMBER = 100000
+BATCH_SIZES = [100, 1000, 10000]
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    session = Session(('192.0.2.1', 40022), None)
+    batcher = ColumnBatcher(AUTH_ATTEMPT_COLUMNS, lambda columns: None, batch_size=NUMBER * 10)
+    record = lambda: batcher.add(1500000000, str(session.id), session.client_address[0], u'root', u'123456',
+                                 'SSH-2.0-libssh2_1.8.0', False)
+    seconds = min(timeit.repeat(record, number=NUMBER, repeat=3))
+    print 'Queueing an attempt: {:.2f}us ({:,.0f} attempts/s)'.format(seconds / NUMBER * 1e6, NUMBER / seconds)
+
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        engine = create_engine('sqlite:///' + db_path)
+        Base.metadata.create_all(engine)
+        print '{:<12} {:>20}'.format('batch size', 'attempts/s written')
+        for batch_size in BATCH_SIZES:
+            columns = {
+                'time': [1500000000] * batch_size,
+                'session_id': [str(session.id)] * batch_size,
+                'source_ip': ['192.0.2.1'] * batch_size,
+                'username': [u'root'] * batch_size,
+                'password': [u'pass{}'.format(i) for i in range(batch_size)],
+                'client_version': ['SSH-2.0-libssh2_1.8.0'] * batch_size,
+                'success': [False] * batch_size,
+            }
+            started = time.time()
+            with engine.begin() as connection:
+                DatabaseHandler.insert_columns(connection, AuthAttempt.__table__, columns)
+            print '{:<12} {:>20,.0f}'.format(batch_size, batch_size / (time.time() - started))
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
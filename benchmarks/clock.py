@@ -0,0 +1,56 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures what it costs to read the time the way Hornet used to (an Arrow object per reading)
+    against the shared Clock, for the readings on the hot paths: the activity timestamp recorded
+    with every write to a shell, and the timestamp of every recorded command.
+    Hornet doesn't depend on arrow anymore, it has to be installed to run this.
+
+    Usage: python benchmarks/clock.py
+"""
+
+import logging
+import timeit
+
+import arrow
+
+from hornet.common.clock import CLOCK
+from hornet.core.session import Session
+
+NUMBER = 100000
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    session = Session(('127.0.0.1', 2222), None)
+    readings = [
+        ('arrow.now().timestamp', lambda: arrow.now().timestamp),
+        ('CLOCK.timestamp()', CLOCK.timestamp),
+        ('CLOCK.monotonic()', CLOCK.monotonic),
+        ('Session.touch()', session.touch),
+    ]
+    print '{:<32} {:>16}'.format('reading', 'time (ns)')
+    for name, func in readings:
+        seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+        print '{:<32} {:>16.0f}'.format(name, seconds / NUMBER * 1e9)
+
+
+if __name__ == '__main__':
+    main()
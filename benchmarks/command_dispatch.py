@@ -0,0 +1,70 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures the cost of parsing the arguments of typical bot commands: building the parser on
+    every call (what Hornet used to do), parsing with a parser built once, and going through the
+    command registry, which also memoises results.
+
+    Usage: python benchmarks/command_dispatch.py
+"""
+
+import logging
+import timeit
+
+from hornet.core.commands import parsers
+
+COMMANDS = [
+    ('ls', ['-la']),
+    ('ls', ['-l', '-h', '-t']),
+    ('uname', ['-a']),
+    ('wget', ['-O', 'x.sh', 'http://example.com/x.sh']),
+    ('ssh', ['root@test01']),
+]
+SPECS = {
+    'ls': (parsers.LS_SPEC, False),
+    'uname': (parsers.UNAME_SPEC, False),
+    'wget': (parsers.WGET_SPEC, True),
+    'ssh': (parsers.SSH_SPEC, False),
+}
+NUMBER = 2000
+
+
+def rebuild_and_parse(command, params):
+    spec, known_only = SPECS[command]
+    return parsers.CommandParser(command, spec, known_only)._parse(params)
+
+
+def compiled_parse(command, params):
+    return parsers.COMMAND_PARSERS[command]._parse(params)
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print '{:<40} {:>16} {:>16} {:>16}'.format('command', 'rebuilt (us)', 'compiled (us)', 'registry (us)')
+    for command, params in COMMANDS:
+        timings = []
+        for func in (rebuild_and_parse, compiled_parse, parsers.parse):
+            seconds = min(timeit.repeat(lambda: func(command, params), number=NUMBER, repeat=3))
+            timings.append(seconds / NUMBER * 1e6)
+        print '{:<40} {:>16.1f} {:>16.1f} {:>16.1f}'.format(' '.join([command] + params), *timings)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures listings the way bots run them, against a filesystem on disk: with an empty path cache
+    (every entry is listed and stat'ed, as Hornet always used to do), and with the cache filled by
+    a previous listing of the same directory.
+
+    Usage: python benchmarks/ls_listing.py
+"""
+
+import logging
+import shutil
+import tempfile
+import timeit
+
+from hornet.core.commands.ls_command import LsCommand
+from hornet.core.commands.parsers import parse
+from hornet.core.fs_wrapper import SandboxedFS
+
+LISTINGS = [
+    ('ls -la /', ['-la'], '/'),
+    ('ls /tmp', [], '/tmp'),
+    ('ls -la /etc', ['-la'], '/etc'),
+    ('ls -l /usr/bin', ['-l'], '/usr/bin'),
+]
+ENTRIES = {'/': 20, '/tmp': 10, '/etc': 200, '/usr/bin': 1000}
+NUMBER = 20
+
+
+def create_filesystem(root):
+    filesystem = SandboxedFS(root)
+    for path, count in sorted(ENTRIES.items()):
+        filesystem.makedirs(unicode(path), recreate=True)
+        for i in range(count):
+            filesystem.setbytes(u'{}/file{:05}'.format(path.rstrip('/'), i), b'x' * (i % 5000))
+    return filesystem
+
+
+def list_path(filesystem, params, path, cold):
+    if cold:
+        filesystem.path_cache.clear()
+    return LsCommand(parse('ls', params), [path], filesystem, '/').process()
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    root = tempfile.mkdtemp()
+    try:
+        filesystem = create_filesystem(root)
+        print '{:<24} {:>8} {:>16} {:>16}'.format('listing', 'entries', 'uncached (ms)', 'cached (ms)')
+        for name, params, path in LISTINGS:
+            timings = []
+            for cold in (True, False):
+                seconds = min(timeit.repeat(lambda: list_path(filesystem, params, path, cold), number=NUMBER,
+                                            repeat=3))
+                timings.append(seconds / NUMBER * 1e3)
+            print '{:<24} {:>8} {:>16.2f} {:>16.2f}'.format(name, len(filesystem.listdir(path)), *timings)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
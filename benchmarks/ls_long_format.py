@@ -0,0 +1,97 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures `ls -l` of a directory with 10000 entries, which share a few modes and modification
+    times like the entries of /usr/bin do: formatting every entry from scratch (time.localtime,
+    time.strftime and filemode per entry, what Hornet used to do), the memoised formatter with
+    its column widths, and the whole listing once it is in the path cache. The entries are stat'ed
+    once beforehand, so only formatting is measured.
+
+    Usage: python benchmarks/ls_long_format.py
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+import timeit
+
+from tarfile import filemode
+
+from hornet.common.clock import CLOCK
+from hornet.core.commands import ls_command
+from hornet.core.commands.ls_command import LsCommand
+from hornet.core.commands.parsers import parse
+from hornet.core.fs_wrapper import SandboxedFS
+
+ENTRIES = 10000
+MTIMES = [1400000000 + i * 86400 for i in range(20)]
+NUMBER = 5
+
+
+def create_filesystem(root):
+    filesystem = SandboxedFS(root)
+    filesystem.makedirs(u'/usr/bin')
+    for i in range(ENTRIES):
+        path = os.path.join(root, 'usr', 'bin', 'file{:05}'.format(i))
+        with open(path, 'w') as entry:
+            entry.write('x' * (i % 3000))
+        os.chmod(path, 0o755 if i % 3 else 0o644)
+        os.utime(path, (MTIMES[i % len(MTIMES)], MTIMES[i % len(MTIMES)]))
+    return filesystem
+
+
+def format_from_scratch(rows):
+    lines = []
+    for name, stat_result, _ in rows:
+        last_modified = time.strftime("%b %d %H:%M", time.localtime(stat_result.st_mtime))
+        lines.append("%s %2s %s %s %6s %s %s" % (filemode(stat_result.st_mode), stat_result.st_nlink, 'ftp', 'ftp',
+                                                  stat_result.st_size, last_modified, name))
+    return lines
+
+
+def format_memoised(rows):
+    now = CLOCK.timestamp()
+    return ls_command._format_long([(ls_command._get_fields(stat_result, now), name) for name, stat_result, _ in rows])
+
+
+def list_cached(filesystem):
+    return LsCommand(parse('ls', ['-l']), ['/usr/bin'], filesystem, '/').process()
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    root = tempfile.mkdtemp()
+    try:
+        filesystem = create_filesystem(root)
+        rows = filesystem.cached(u'/usr/bin', 'ls -l rows', ls_command._list_rows)
+        print '{:<40} {:>16}'.format('ls -l of {} entries'.format(ENTRIES), 'time (ms)')
+        for name, func in [('formatted from scratch', lambda: format_from_scratch(rows)),
+                           ('memoised formatter', lambda: format_memoised(rows)),
+                           ('cached listing', lambda: list_cached(filesystem))]:
+            seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+            print '{:<40} {:>16.1f}'.format(name, seconds / NUMBER * 1e3)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+    Measures the CPU time that many long running commands with periodic output (like ping) cost
+    while they wait between two lines: each sleeping in its own loop, as ping used to, against all
+    of them waiting on Tickers of one PeriodicScheduler.
+
+    Usage: python benchmarks/periodic_output.py
+"""
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import logging
+import time
+
+import gevent
+
+from hornet.core.scheduler import PeriodicScheduler
+
+INTERVAL = 0.1
+DURATION = 2
+COMMANDS = [100, 1000, 5000]
+
+
+def sleeping(count, ticks):
+    def command():
+        while ticks[0] < count * DURATION / INTERVAL:
+            ticks[0] += 1
+            gevent.sleep(INTERVAL)
+    return [gevent.spawn(command) for _ in range(count)]
+
+
+def ticking(count, ticks):
+    scheduler = PeriodicScheduler()
+
+    def command(ticker):
+        with ticker:
+            while ticks[0] < count * DURATION / INTERVAL and ticker.wait():
+                ticks[0] += 1
+    return [gevent.spawn(command, scheduler.every(INTERVAL)) for _ in range(count)]
+
+
+def measure(start_commands, count):
+    ticks = [0]
+    started = time.clock()
+    greenlets = start_commands(count, ticks)
+    gevent.joinall(greenlets)
+    return time.clock() - started, ticks[0]
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    print '{:<12} {:>10} {:>16} {:>16}'.format('commands', 'ticks', 'sleep (CPU ms)', 'ticker (CPU ms)')
+    for count in COMMANDS:
+        sleep_time, ticks = measure(sleeping, count)
+        ticker_time, _ = measure(ticking, count)
+        print '{:<12} {:>10} {:>16.0f} {:>16.0f}'.format(count, ticks, sleep_time * 1000, ticker_time * 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Counts the channel sends (each one at least an SSH packet) and bytes it takes to send the output
+    of typical commands, from the echoed newline to the next prompt, with every write sent on its own (what Hornet
+    used to do) and with the buffered output of the Shell. Bytes on the wire are estimated for
+    aes-ctr with hmac-sha2-256, without TCP/IP headers.
+
+    wget runs in offline mode, so nothing leaves the machine.
+
+    Usage: python benchmarks/shell_output.py
+"""
+
+import logging
+import shutil
+import tempfile
+
+import gevent.queue
+
+from hornet.common.config import Network
+from hornet.core.downloads import DownloadScheduler
+from hornet.core.host import VirtualHost
+from hornet.core.shell import Shell
+
+COMMANDS = [
+    ('ls', ['-la', '/']),
+    ('ls', ['--help']),
+    ('uname', ['-a']),
+    ('ifconfig', []),
+    ('wget', ['--help']),
+    ('wget', ['http://example.com/bins.sh']),
+    ('echo', ['$HOME']),
+    ('pwd', []),
+]
+MAC_SIZE = 32
+BLOCK_SIZE = 16
+
+
+class _Channel(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def sendall(self, data):
+        self.sent.append(data)
+
+
+class _Session(object):
+    last_activity = None
+
+
+class BenchShell(Shell):
+
+    def __init__(self, buffered):
+        # Skip TelnetHandler.__init__, which would run a whole session
+        self.sock = _Channel()
+        self.session = _Session()
+        self.cookedq = gevent.queue.Queue()
+        self._output = []
+        self._output_size = 0
+        if not buffered:
+            self.MAX_BUFFERED_OUTPUT = 0
+
+
+def get_wire_size(data):
+    # SSH_MSG_CHANNEL_DATA: type, channel and length, then the packet framing, padding and MAC
+    payload_size = 9 + len(data)
+    padding = 3 + BLOCK_SIZE - ((payload_size + 8) % BLOCK_SIZE)
+    return 4 + 1 + payload_size + padding + MAC_SIZE
+
+
+def run(host, command, params, buffered):
+    shell = BenchShell(buffered)
+    shell.write('\n')  # The echo of the Enter key that ended the command line
+    getattr(host, 'run_' + command)(params, shell)
+    shell.write(host.prompt)
+    shell.flush()  # The shell waits for input
+    return len(shell.sock.sent), sum(len(data) for data in shell.sock.sent), \
+        sum(get_wire_size(data) for data in shell.sock.sent)
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    fs_dir = tempfile.mkdtemp()
+    try:
+        params = {'hostname': 'bench', 'ip_address': '192.168.0.10', 'env': {}, 'valid_logins': {},
+                  'filesystem': 'memory'}
+        host = VirtualHost(params, Network('192.168.0.0/24', '192.168.0.2', '192.168.0.1'), fs_dir,
+                           downloads=DownloadScheduler(offline=True, fake_size=(50000, 50000)))
+        host.login('root')
+        print '{:<32} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+            'command', 'sends', 'sends (buf)', 'bytes', 'wire', 'wire (buf)')
+        for command, command_params in COMMANDS:
+            sends, size, wire_size = run(host, command, command_params, False)
+            buffered_sends, _, buffered_wire_size = run(host, command, command_params, True)
+            print '{:<32} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+                ' '.join([command] + command_params), sends, buffered_sends, size, wire_size, buffered_wire_size)
+    finally:
+        shutil.rmtree(fs_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures the per-connection setup of a server Transport the way Hornet used to do it (parsing
+    the moduli file with load_server_moduli() for every connection) against injecting the moduli
+    parsed once by the HostKeyStore, and the time of complete handshakes (key exchange and login)
+    against a running honeypot.
+
+    Usage: python benchmarks/ssh_handshake.py
+"""
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import time
+import timeit
+
+import paramiko
+
+import hornet
+from hornet.common.keys import HostKeyStore
+from hornet.main import Hornet
+
+NUMBER = 200
+HANDSHAKES = 20
+SYSTEM_MODULI = 400
+
+
+def _setup_loading(moduli_file):
+    transport = paramiko.Transport(socket.socket())
+    transport.load_server_moduli(moduli_file)
+    transport.close()
+
+
+def _setup_injected(moduli):
+    transport = paramiko.Transport(socket.socket())
+    transport._modulus_pack = moduli
+    transport.close()
+
+
+def _handshake(port, kex):
+    transport = paramiko.Transport(('127.0.0.1', port))
+    transport.get_security_options().kex = (kex,)
+    transport.connect(username='testuser', password='testpassword')
+    transport.close()
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    working_dir = tempfile.mkdtemp()
+    try:
+        store = HostKeyStore({}, working_dir)
+        store.load()
+        moduli_file = next(path for path in store.moduli_files if os.path.isfile(path))
+        with open(moduli_file) as source:
+            lines = [line for line in source if not line.startswith('#')]
+        # A system moduli file has a few hundred moduli, the bundled one only a handful
+        if len(lines) < SYSTEM_MODULI:
+            lines *= SYSTEM_MODULI // len(lines)
+            moduli_file = os.path.join(working_dir, 'moduli')
+            with open(moduli_file, 'w') as target:
+                target.writelines(lines)
+
+        print '{} moduli in {}'.format(len(lines), moduli_file)
+        print '{:<40} {:>16}'.format('transport setup', 'time (us)')
+        setups = [
+            ('parse moduli per connection', lambda: _setup_loading(moduli_file)),
+            ('inject cached moduli', lambda: _setup_injected(store.moduli)),
+        ]
+        for name, func in setups:
+            seconds = min(timeit.repeat(func, number=NUMBER, repeat=3))
+            print '{:<40} {:>16.0f}'.format(name, seconds / NUMBER * 1e6)
+
+        with open(os.path.join(os.path.dirname(hornet.__file__), 'data', 'default_config.json')) as config_file:
+            config = json.load(config_file)
+        config['database'] = 'sqlite:///' + os.path.join(working_dir, 'hornet.db')
+        with open(os.path.join(working_dir, 'config.json'), 'w') as config_file:
+            json.dump(config, config_file)
+        honeypot = Hornet(working_dir)
+        honeypot.start()
+        port = honeypot.server.server_port
+        print
+        print '{:<40} {:>16}'.format('handshake and login', 'time (ms)')
+        for kex in ('diffie-hellman-group14-sha1', 'diffie-hellman-group-exchange-sha256'):
+            started = time.time()
+            for _ in range(HANDSHAKES):
+                _handshake(port, kex)
+            print '{:<40} {:>16.1f}'.format(kex, (time.time() - started) / HANDSHAKES * 1e3)
+        honeypot.stop()
+    finally:
+        shutil.rmtree(working_dir)
+
+
+if __name__ == '__main__':
+    main()
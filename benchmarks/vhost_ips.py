@@ -0,0 +1,78 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures how long it takes to create a VirtualHost (IP validation and random assignment) for
+    networks from /24 up to /8. The enumeration based approach Hornet used to take is measured
+    as well, up to /16 (beyond that it takes minutes and gigabytes of memory).
+
+    Usage: python benchmarks/vhost_ips.py
+"""
+
+import logging
+import random
+import shutil
+import tempfile
+import timeit
+
+from hornet.common.config import Network
+from hornet.core.host import VirtualHost
+
+PREFIXES = [24, 20, 16, 12, 8]
+ENUMERATION_LIMIT = 16
+REPEAT = 5
+
+
+def create_vhost(network, fs_dir, ip_address):
+    params = {
+        'hostname': 'bench',
+        'ip_address': ip_address,
+        'env': {},
+        'valid_logins': {}
+    }
+    return VirtualHost(params, network, fs_dir)
+
+
+def enumerate_ips(network, ip_address):
+    valid_ips = map(str, network[1:-1])
+    if ip_address not in valid_ips:
+        ip_address = random.choice(valid_ips)
+    return ip_address
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    fs_dir = tempfile.mkdtemp()
+    try:
+        print '{:>8} {:>18} {:>18}'.format('network', 'arithmetic (ms)', 'enumeration (ms)')
+        for prefix in PREFIXES:
+            network = Network('10.0.0.0/{}'.format(prefix), '10.0.0.2', '10.0.0.1')
+            arithmetic = min(timeit.repeat(lambda: create_vhost(network, fs_dir, None), number=1, repeat=REPEAT))
+            if prefix >= ENUMERATION_LIMIT:
+                enumeration = min(timeit.repeat(lambda: enumerate_ips(network, None), number=1, repeat=REPEAT))
+                enumeration = '{:.3f}'.format(enumeration * 1000)
+            else:
+                enumeration = 'skipped'
+            print '{:>8} {:>18.3f} {:>18}'.format('/{}'.format(prefix), arithmetic * 1000, enumeration)
+    finally:
+        shutil.rmtree(fs_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Measures how long a download takes to complete when it is fetched from a local HTTP server,
+    served from the URL cache, and made up in offline mode, for a few payload sizes. Nothing
+    leaves the machine, so the numbers only depend on it.
+
+    Usage: python benchmarks/wget_cache.py
+"""
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import logging
+import os
+import shutil
+import tempfile
+import timeit
+
+import gevent.pywsgi
+
+from hornet.core.downloads import DownloadScheduler
+from hornet.core.payloads import PayloadStore
+from hornet.core.url_cache import UrlCache
+
+SIZES = [4 * 1024, 256 * 1024, 4 * 1024 * 1024]
+NUMBER = 50
+
+
+def fetch(scheduler, url):
+    download = scheduler.submit(url)
+    for _ in download.iter_body():
+        pass
+    download.close()
+
+
+def main():
+    logging.disable(logging.CRITICAL)
+    bodies = dict(('/{}'.format(size), os.urandom(size)) for size in SIZES)
+
+    def application(environ, start_response):
+        body = bodies[environ['PATH_INFO']]
+        start_response('200 OK', [('Content-Type', 'application/octet-stream'), ('Content-Length', str(len(body)))])
+        return [body]
+
+    server = gevent.pywsgi.WSGIServer(('127.0.0.1', 0), application, log=None)
+    server.start()
+    working_dir = tempfile.mkdtemp()
+    try:
+        payloads = PayloadStore(os.path.join(working_dir, 'payloads'))
+        network = DownloadScheduler(payloads=payloads)
+        cached = DownloadScheduler(payloads=payloads, cache=UrlCache(os.path.join(working_dir, 'urls')))
+        print '{:<12} {:>16} {:>16} {:>16}'.format('size', 'network (ms)', 'cached (ms)', 'offline (ms)')
+        for size in SIZES:
+            url = 'http://127.0.0.1:{}/{}'.format(server.server_port, size)
+            offline = DownloadScheduler(offline=True, fake_size=(size, size))
+            fetch(cached, url)
+            timings = []
+            for scheduler in (network, cached, offline):
+                seconds = min(timeit.repeat(lambda: fetch(scheduler, url), number=NUMBER, repeat=3))
+                timings.append(seconds / NUMBER * 1e3)
+            print '{:<12} {:>16.2f} {:>16.2f} {:>16.2f}'.format(size, *timings)
+    finally:
+        server.stop()
+        shutil.rmtree(working_dir)
+
+
+if __name__ == '__main__':
+    main()
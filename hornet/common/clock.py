@@ -0,0 +1,89 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import ctypes
+import sys
+import time
+
+from gevent.hub import _get_hub
+
+CLOCK_MONOTONIC = 1  # From <linux/time.h>
+
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+def _load_clock_gettime():
+    """ Returns libc's clock_gettime (librt's on glibc before 2.17), or None where it can't be used. """
+    if not sys.platform.startswith('linux'):
+        return None
+    for name in (None, 'librt.so.1'):
+        try:
+            clock_gettime = ctypes.CDLL(name, use_errno=True).clock_gettime
+        except (OSError, AttributeError):
+            continue
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+        clock_gettime.restype = ctypes.c_int
+        return clock_gettime
+    return None
+
+
+_clock_gettime = _load_clock_gettime()
+
+
+class Clock(object):
+    """
+        Cheap time readings for hot paths, like every write to a shell or every recorded command,
+        where building an Arrow object (about 20us each) adds up. timestamp() is the wall-clock time
+        with millisecond resolution, for records. monotonic() never goes backwards, even when the
+        system clock is set back, and is meant for deadlines.
+    """
+
+    def __init__(self):
+        self._offset = 0.0
+        self._last = 0.0
+        self._timespec = _Timespec()
+        self._timespec_ref = ctypes.byref(self._timespec)
+        if _clock_gettime is not None:
+            self.monotonic = self._clock_gettime_monotonic
+
+    def timestamp(self):
+        # The event loop reads the wall clock once per iteration, so this needs no system call.
+        # Threads without a hub (like the database thread) read it themselves.
+        hub = _get_hub()
+        now = time.time() if hub is None else hub.loop.now()
+        return int(now * 1000) / 1000.0
+
+    def _clock_gettime_monotonic(self):
+        _clock_gettime(CLOCK_MONOTONIC, self._timespec_ref)
+        return self._timespec.tv_sec + self._timespec.tv_nsec * 1e-9
+
+    def monotonic(self):
+        # Without clock_gettime (Python 2 has no monotonic clock), make up for the wall clock going
+        # backwards. Forward jumps can't be told apart from time passing, and still move deadlines.
+        now = time.time() + self._offset
+        if now < self._last:
+            self._offset += self._last - now
+            now = self._last
+        self._last = now
+        return now
+
+
+CLOCK = Clock()
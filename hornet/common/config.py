@@ -19,6 +19,7 @@
 
 import netaddr
 import logging
+import random
 
 logger = logging.getLogger(__name__)
 
@@ -29,18 +30,73 @@ class Network(netaddr.IPNetwork):
         self.gateway = gateway
         super(Network, self).__init__(addr)
 
+    def is_valid_host(self, address):
+        """ Checks whether `address` is a host address of this network (neither the network nor the broadcast
+            address), without enumerating the network. """
+        try:
+            ip = netaddr.IPAddress(address, flags=netaddr.INET_PTON)
+        except (netaddr.AddrFormatError, ValueError, TypeError):
+            return False
+        if str(ip) != address:  # Only accept the canonical form, e.g. no leading zeros
+            return False
+        return ip.version == self.version and self.first < ip.value < self.last
+
+    def random_host(self):
+        """ Returns a random host address of this network, as a string. """
+        return str(netaddr.IPAddress(random.randint(self.first + 1, self.last - 1), self.version))
+
 
 class Config(object):
 
     def __init__(self, cdict):
         self.port = cdict['port']
         self.host = cdict['host']
+        self.workers = cdict.get('workers', 1)
         self.database = cdict['database']
         self.network = Network(cdict['network']['network_ip'],
                                cdict['network']['dns_server'], cdict['network']['gateway'])
         self.num_vhosts = len(cdict['virtual_hosts'])
         self.vhost_params = cdict['virtual_hosts']
         self.key_file = cdict['key_file']
+        self.host_key_files = {'rsa': self.key_file}
+        self.host_key_files.update(cdict.get('host_keys', {}))
+        self.moduli_file = cdict.get('moduli_file', None)
+        self.bundled_moduli = cdict.get('bundled_moduli', True)
+
+        persistence = cdict.get('persistence', {})
+        self.persistence_batch_size = persistence.get('batch_size', 100)
+        self.persistence_flush_interval = persistence.get('flush_interval', 1.0)
+        self.persistence_auth_batch_size = persistence.get('auth_batch_size', 1000)
+
+        consumer = cdict.get('session_consumer', {})
+        self.consumer_workers = consumer.get('workers', 2)
+        self.consumer_batch_size = consumer.get('batch_size', 50)
+        self.consumer_queue_size = consumer.get('queue_size', 1000)
+        self.consumer_stats_interval = consumer.get('stats_interval', 60)
+
+        sessions = cdict.get('sessions', {})
+        self.session_idle_timeout = sessions.get('idle_timeout', 60)
+        self.session_preauth_timeout = sessions.get('preauth_timeout', 60)
+        self.session_max_duration = sessions.get('max_duration', 0)
+
+        commands = cdict.get('commands', {})
+        self.max_recursive_listing_output = commands.get('max_recursive_listing_output', 1024 * 1024)
+
+        downloads = cdict.get('downloads', {})
+        self.download_max_concurrent = downloads.get('max_concurrent', 32)
+        self.download_max_per_host = downloads.get('max_per_host', 4)
+        self.download_connect_timeout = downloads.get('connect_timeout', 10)
+        self.download_read_timeout = downloads.get('read_timeout', 30)
+        self.download_max_duration = downloads.get('max_duration', 300)
+        self.download_bandwidth = downloads.get('bandwidth', 0)
+        self.payload_directory = downloads.get('payload_directory', 'payloads')
+        self.download_cache_directory = downloads.get('cache_directory', 'url_cache')
+        self.download_cache_ttl = downloads.get('cache_ttl', 86400)
+        self.download_cache_size = downloads.get('cache_size', 10000)
+        self.download_offline = downloads.get('offline', False)
+        self.download_offline_directory = downloads.get('offline_directory', None)
+        self.download_fake_content_type = downloads.get('fake_content_type', None)
+        self.download_fake_size = (downloads.get('fake_min_size', 4096), downloads.get('fake_max_size', 65536))
 
         self.default_hostname = None
         for p in self.vhost_params:
@@ -18,9 +18,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import os
 import random
+import tempfile
 
-from paramiko import RSAKey
+from paramiko import RSAKey, ECDSAKey, Ed25519Key
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +37,25 @@ def get_rsa_key_file(filename, password=None):
     return key
 
 
+def get_ecdsa_key_file(filename, password=None):
+    try:
+        key = ECDSAKey(filename=filename, password=password)
+    except IOError:
+        logger.info('ECDSA Key file not found, generating a new one: %s', filename)
+        key = ECDSAKey.generate()
+        key.write_private_key_file(filename, password=password)
+    return key
+
+
+def get_ed25519_key_file(filename, password=None):
+    # Paramiko can't generate Ed25519 keys, so these have to be provided (e.g. by ssh-keygen)
+    try:
+        return Ed25519Key(filename=filename, password=password)
+    except IOError:
+        logger.warning('Ed25519 Key file not found, skipping it: %s', filename)
+        return None
+
+
 def get_random_item(collection):
     if isinstance(collection, dict):
         all_keys = list(collection.keys())
@@ -44,6 +65,18 @@ def get_random_item(collection):
         return random.choice(collection)
 
 
+def write_atomically(path, write):
+    """ Calls `write` with a temporary file next to `path`, and renames it to `path` once written. """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            write(temp_file)
+        os.rename(temp_path, path)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+
 # http://stackoverflow.com/questions/1094841/reusable-library-to-get-human-readable-version-of-file-size
 # By Fred Cicera
 def human_readable(num, suffix=''):
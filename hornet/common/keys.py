@@ -0,0 +1,108 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+
+import hornet
+
+from paramiko.primes import ModulusPack
+
+from hornet.common.helpers import get_rsa_key_file, get_ecdsa_key_file, get_ed25519_key_file
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_MODULI_FILES = ['/etc/ssh/moduli', '/usr/local/etc/moduli']
+BUNDLED_MODULI_FILE = os.path.join(os.path.dirname(hornet.__file__), 'data', 'moduli')
+
+KEY_LOADERS = {
+    'rsa': get_rsa_key_file,
+    'ecdsa': get_ecdsa_key_file,
+    'ed25519': get_ed25519_key_file
+}
+
+
+def load_moduli(moduli_files):
+    """ Parses the first of `moduli_files` that exists and has usable moduli. Returns a ModulusPack, or None. """
+    for path in moduli_files:
+        moduli = ModulusPack()
+        try:
+            moduli.read_file(path)
+        except IOError:
+            continue
+        if moduli.pack:
+            logger.info('Loaded moduli of %s bits from %s', ', '.join(str(bits) for bits in sorted(moduli.pack)), path)
+            return moduli
+        logger.warning('No usable moduli in %s', path)
+    logger.warning('No moduli found, Diffie-Hellman group exchange is disabled')
+    return None
+
+
+class HostKeyStore(object):
+    """
+        Holds the parsed SSH host keys in memory, so that they are read from disk once
+        instead of on every connection. `reload()` re-reads the files, which allows the
+        keys to be rotated without restarting the honeypot.
+
+        The moduli for Diffie-Hellman group exchange are kept the same way. They come from
+        `moduli_file`, the system's moduli file, or the ones bundled with Hornet (if `bundled_moduli`).
+    """
+
+    def __init__(self, key_files, working_directory, moduli_file=None, bundled_moduli=True):
+        self.key_files = key_files
+        self.working_directory = working_directory
+        self.keys = []
+        self.moduli_files = list(SYSTEM_MODULI_FILES)
+        if moduli_file:
+            self.moduli_files.insert(0, os.path.join(working_directory, moduli_file))
+        if bundled_moduli:
+            self.moduli_files.append(BUNDLED_MODULI_FILE)
+        self.moduli = None
+
+    def load(self):
+        keys = []
+        for key_type in sorted(self.key_files):
+            if key_type not in KEY_LOADERS:
+                logger.error('Unsupported host key type: %s', key_type)
+                continue
+            key_path = os.path.join(self.working_directory, self.key_files[key_type])
+            try:
+                key = KEY_LOADERS[key_type](key_path)
+            except Exception:
+                logger.exception('Could not load %s host key from %s', key_type, key_path)
+                continue
+            if key is not None:
+                keys.append(key)
+        self.moduli = load_moduli(self.moduli_files)
+        if not keys and self.keys:
+            logger.error('No host keys could be loaded, keeping the previous ones')
+            return
+        # Swap the whole list at once, connections in progress keep the keys they started with
+        self.keys = keys
+        logger.info('Loaded %s host keys', len(keys))
+
+    def reload(self):
+        logger.info('Reloading host keys')
+        self.load()
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
@@ -0,0 +1,89 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import os
+
+import hornet
+
+from telnetsrv.telnetsrvlib import IAC
+
+logger = logging.getLogger(__name__)
+
+COMMANDS_DIR = os.path.join(os.path.dirname(hornet.__file__), 'data', 'commands')
+
+
+def cook(text):
+    """ Does what TelnetHandler.write does to outgoing text, so the result can go to writecooked. """
+    return text.replace(IAC, IAC + IAC).replace('\n', '\r\n')
+
+
+class AssetCache(object):
+    """
+        The static output of commands (help and version texts, etc) from `directory`, loaded into
+        memory once. Assets are named by their path relative to `directory`, e.g. 'ls/help', and
+        stored exactly as they are sent: stripped lines, terminal line endings, as a byte string.
+    """
+
+    def __init__(self, directory=COMMANDS_DIR):
+        self.directory = directory
+        self._assets = {}
+        self._signature = None
+        self.load()
+
+    def load(self):
+        assets = {}
+        for name, path in self._walk():
+            with open(path, 'r') as asset_file:
+                text = ''.join(line.strip() + '\n' for line in asset_file)
+            assets[name] = cook(text)
+        # Swap in a whole new dict, so readers never see a partially loaded cache
+        self._assets = assets
+        self._signature = self._get_signature()
+        logger.debug('Loaded %s command assets from %s', len(assets), self.directory)
+
+    def reload(self):
+        """ Loads the assets again if anything in the directory changed. Returns True if it did. """
+        if self._get_signature() == self._signature:
+            return False
+        logger.info('Command assets in %s changed, reloading them', self.directory)
+        self.load()
+        return True
+
+    def get(self, name):
+        return self._assets[name]
+
+    def __contains__(self, name):
+        return name in self._assets
+
+    def _walk(self):
+        for dir_path, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                yield os.path.relpath(path, self.directory), path
+
+    def _get_signature(self):
+        signature = []
+        for name, path in self._walk():
+            stat_result = os.stat(path)
+            signature.append((name, stat_result.st_mtime, stat_result.st_size))
+        return sorted(signature)
+
+
+COMMAND_ASSETS = AssetCache()
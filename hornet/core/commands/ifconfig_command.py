@@ -18,61 +18,85 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import os
 from string import Template
 
+from hornet.core.commands.assets import COMMANDS_DIR
+
 logger = logging.getLogger(__name__)
 
+TEMPLATE_PATH = os.path.join(COMMANDS_DIR, 'ifconfig', 'output_template')
+
 
 class _IfconfigTemplate(object):
 
+    _templates = {}
+
     def __init__(self, template_path):
         self.interface_data = {}
         with open(template_path, 'r') as templatefile:
-            self.all_template = templatefile.read()
-            interfaces = self.all_template.split('\n\n')
+            self.all_template = Template(templatefile.read())
+            interfaces = self.all_template.template.split('\n\n')
             for interface in interfaces:
                 first_line = interface.split('\n')[0]
                 interface_name = first_line.split()[0]
-                self.interface_data[interface_name] = interface
+                self.interface_data[interface_name] = Template(interface)
+
+    @classmethod
+    def load(cls, template_path):
+        """ Returns the parsed template at `template_path`, each file is only parsed once. """
+        if template_path not in cls._templates:
+            cls._templates[template_path] = cls(template_path)
+        return cls._templates[template_path]
 
     def interface_exists(self, interface):
         return interface in self.interface_data
 
-    def render(self, iface, network, ip_address):
-        mapping = {
+    @property
+    def interfaces(self):
+        return self.interface_data.keys()
+
+    @staticmethod
+    def _get_mapping(network, ip_address):
+        return {
             'ip_addr': ip_address,
             'broadcast_addr': network.broadcast,
             'subnet_mask': network.netmask
         }
-        template_string = Template(self.interface_data[iface])
-        return template_string.safe_substitute(mapping)
+
+    def render(self, iface, network, ip_address):
+        return self.interface_data[iface].safe_substitute(self._get_mapping(network, ip_address))
 
     def render_all(self, network, ip_address):
-        mapping = {
-            'ip_addr': ip_address,
-            'broadcast_addr': network.broadcast,
-            'subnet_mask': network.netmask
-        }
-        template_string = Template(self.all_template)
-        return template_string.safe_substitute(mapping)
+        return self.all_template.safe_substitute(self._get_mapping(network, ip_address))
 
 
 class IfconfigCommand(object):
+    """
+        The ifconfig output of a single host. Its network doesn't change, so the output of every
+        interface is rendered up front, and only rendered again when the host's IP address changes.
+    """
 
-    def __init__(self, params, template_path, ip_address, network):
-        self.params = params
-        self.ip_address = ip_address
+    def __init__(self, network, template_path=TEMPLATE_PATH):
         self.network = network
-        self.template_path = template_path
-        self.template = None
+        self.template = _IfconfigTemplate.load(template_path)
+        self.ip_address = None
+        self.output = {}
 
-    def process(self):
-        self.template = _IfconfigTemplate(self.template_path)
-        if self.params:
-            interface_name = self.params[0]
+    def process(self, params, ip_address):
+        if ip_address != self.ip_address:
+            self._render(ip_address)
+        if params:
+            interface_name = params[0]
             if not self.template.interface_exists(interface_name):
                 return '{}: error fetching interface information: Device not found'.format(interface_name)
-            else:
-                return self.template.render(interface_name, self.network, self.ip_address)
-        else:
-            return self.template.render_all(self.network, self.ip_address)
+            return self.output[interface_name]
+        return self.output[None]
+
+    def _render(self, ip_address):
+        logger.debug('Rendering ifconfig output for %s', ip_address)
+        output = {None: self.template.render_all(self.network, ip_address)}
+        for interface in self.template.interfaces:
+            output[interface] = self.template.render(interface, self.network, ip_address)
+        self.output = output
+        self.ip_address = ip_address
@@ -19,14 +19,176 @@
 
 import logging
 import os
+import re
 import time
 
+from stat import S_ISDIR
 from tarfile import filemode  # Coverts file/directory mode into the ls format (e.g drwxr-xr-x)
-from fs.errors import IllegalBackReference
+from fs.errors import IllegalBackReference, ResourceNotFound
+
+from hornet.common.clock import CLOCK
 
 logger = logging.getLogger(__name__)
 
 
+# Like ls, show the time of day for files modified in the last six months, and the year for others
+SIX_MONTHS = 365.2425 * 24 * 60 * 60 / 2
+
+
+class _Memo(object):
+    """
+        Remembers what `function` returned for (about) the `size` most recently used arguments. Values
+        used since the last `size` new ones were added are kept, the others are forgotten. Unlike an
+        OrderedDict, this costs a single dict lookup for values that are remembered.
+    """
+
+    def __init__(self, function, size):
+        self.function = function
+        self.size = size
+        self._recent = {}
+        self._old = {}
+
+    def __call__(self, key):
+        try:
+            return self._recent[key]
+        except KeyError:
+            pass
+        try:
+            value = self._old[key]
+        except KeyError:
+            value = self.function(key)
+        if len(self._recent) >= self.size:
+            self._old = self._recent
+            self._recent = {}
+        self._recent[key] = value
+        return value
+
+
+def _format_mtime(key):
+    minute, recent = key
+    try:
+        local_time = time.localtime(minute * 60)
+    except (ValueError, OverflowError):
+        local_time = time.localtime()
+    return time.strftime('%b %e %H:%M' if recent else '%b %e  %Y', local_time)
+
+
+# Most entries of a directory share a handful of modes and modification times
+_mode_strings = _Memo(filemode, 64)
+_mtime_strings = _Memo(_format_mtime, 1024)
+
+
+def _get_fields(stat_result, now):
+    """ The columns of `ls -l` (mode, links, owner, group, size and modification time, as strings) of a stat result. """
+    mtime = stat_result.st_mtime
+    return (_mode_strings(stat_result.st_mode), str(stat_result.st_nlink), 'ftp', 'ftp', str(stat_result.st_size),
+            _mtime_strings((int(mtime) // 60, now - SIX_MONTHS < mtime < now + 1)))
+
+
+def _long_fields(filesystem, path):
+    """ The columns of `ls -l` for `path`. Cached by the filesystem, see LsCommand. """
+    return _get_fields(filesystem.cached_stat(path), CLOCK.timestamp())
+
+
+def _listdir_unsorted(filesystem, path):
+    """ The names in the directory `path`, in the order the filesystem lists them. """
+    return filesystem.listdir(path)
+
+
+def _list_rows(filesystem, path):
+    """
+        (name, stat result, columns of `ls -l`) of every entry of the directory `path`, in the order
+        the filesystem lists them, made with a single stat of each entry. Cached by the filesystem,
+        see LsCommand.
+    """
+    now = CLOCK.timestamp()
+    rows = []
+    for name in filesystem.cached(path, 'ls -U', _listdir_unsorted):
+        stat_result = filesystem.stat(os.path.join(path, name))
+        rows.append((name, stat_result, _get_fields(stat_result, now)))
+    return rows
+
+
+def _format_long(rows):
+    """
+        Returns the lines of `ls -l` for `rows` of (columns, name). Like ls, the columns are as wide as
+        their widest value: the numbers are aligned to the right, owner and group to the left.
+    """
+    links_width = owner_width = group_width = size_width = 1
+    for fields, _ in rows:
+        links_width = max(links_width, len(fields[1]))
+        owner_width = max(owner_width, len(fields[2]))
+        group_width = max(group_width, len(fields[3]))
+        size_width = max(size_width, len(fields[4]))
+    line_format = '%%s %%%ds %%-%ds %%-%ds %%%ds %%s %%s' % (links_width, owner_width, group_width, size_width)
+    return [line_format % (fields + (name,)) for fields, name in rows]
+
+
+_NUMBERS = re.compile(r'(\d+)')
+
+
+def _get_extension(name):
+    dot = name.rfind('.')
+    return name[dot:] if dot > 0 else ''
+
+
+def _get_version(name):
+    # Numbers in names compare by their value, like ls -v does, e.g. libc.so.6 < libc.so.10
+    return [int(part) if part.isdigit() else part for part in _NUMBERS.split(name)]
+
+
+# The sort orders of --sort, as keys of a row (name, stat result, columns). Ties are sorted by name.
+SORT_KEYS = {
+    'name': lambda row: row[0],
+    'size': lambda row: (-row[1].st_size, row[0]),
+    'time': lambda row: (-row[1].st_mtime, row[0]),
+    'extension': lambda row: (_get_extension(row[0]), row[0]),
+    'version': lambda row: (_get_version(row[0]), row[0]),
+}
+# The orders that need nothing but the names, no stat of the entries
+NAME_SORTS = {'none', 'name', 'extension', 'version'}
+
+
+def _list_directory(filesystem, path, long_format, all_entries, sort, reverse):
+    """
+        Returns the number of blocks of the listed entries of the directory `path`, and the lines that
+        list them. `sort` is a key of SORT_KEYS, or 'none' for the order of the filesystem. The entries
+        are stat'ed at most once, and sorted by a precomputed key. Cached by the filesystem, see LsCommand.
+    """
+    if long_format or sort not in NAME_SORTS:
+        rows = [row for row in filesystem.cached(path, 'ls rows', _list_rows)
+                if all_entries or not row[0].startswith('.')]
+    else:
+        rows = [(name, None, None) for name in filesystem.cached(path, 'ls -U', _listdir_unsorted)
+                if all_entries or not name.startswith('.')]
+    if all_entries:
+        # ls sorts . and .. along with the other entries, or lists them first
+        dot_rows = []
+        for name, entry_path in (('.', path), ('..', os.path.dirname(path))):
+            fields = filesystem.cached(entry_path, 'ls -l fields', _long_fields) if long_format else None
+            dot_rows.append((name, filesystem.cached_stat(entry_path), fields))
+        rows = dot_rows + rows
+    if sort != 'none':
+        rows.sort(key=SORT_KEYS[sort])
+        if reverse:
+            rows.reverse()
+    if not long_format:
+        return 0, [row[0] for row in rows]
+    return sum(row[1].st_blocks for row in rows), _format_long([(row[2], row[0]) for row in rows])
+
+
+def _get_sort(args):
+    """ The --sort word for the options in `args`. ls sorts by the last option given, these are checked by priority. """
+    if args.U or args.f:
+        return 'none'
+    if args.sort:
+        return args.sort
+    for option, sort in ((args.S, 'size'), (args.t, 'time'), (args.X, 'extension'), (args.v, 'version')):
+        if option:
+            return sort
+    return 'name'
+
+
 class _PathInfo(object):
 
     def __init__(self, path, total, output, path_exists, is_dir):
@@ -38,22 +200,27 @@ class _PathInfo(object):
 
 
 class LsCommand(object):
+    """
+        Lists paths of a filesystem. Stat results, directory listings, the columns of `ls -l` and
+        the long listings of whole directories come from the filesystem's PathCache, so listing
+        something that hasn't changed costs no syscalls and little formatting.
+    """
+
     def __init__(self, args, paths, filesystem, working_path):
         self.args = args
+        if args.f:
+            # Like ls, -f lists everything, unsorted and in short form
+            args.all = True
+            args.l = False
+        self.sort = _get_sort(args)
         self.paths = sorted(paths)
         self.filesystem = filesystem
         self.working_path = working_path
         self.output = {}
 
     def process(self):
-        for count, p in enumerate(self.paths):
-            try:
-                normalized_path = os.path.normpath(os.path.join(self.working_path, p))
-                self._process_path(normalized_path, key_path=p)
-            except IllegalBackReference as e:
-                logger.warn('Access to the external file system was attempted.')
-                new_path = os.path.join(self.working_path, p.lstrip('../'))
-                self._process_path(new_path, key_path=p)
+        for p in self.paths:
+            self._process_argument(p)
         result = ''
         if len(self.paths) == 1:
             path = self.paths[0]
@@ -62,22 +229,10 @@ class LsCommand(object):
                 if not self.args.directory:
                     if current_path_info.is_dir:
                         result += 'total {}\n'.format(current_path_info.total)
-                        if self.args.all:
-                            result += self._get_hidden_dirs(current_path_info.path)
 
                 result += '\n'.join(current_path_info.path_output)
             else:
-                if self.args.all:
-                    if not self.args.directory:
-                        if not current_path_info.is_dir:
-                            dirs = current_path_info.path_output
-                        else:
-                            dirs = ['.', '..'] + current_path_info.path_output
-                    else:
-                        dirs = current_path_info.path_output
-                else:
-                    dirs = current_path_info.path_output
-                result += ' '.join(dirs)
+                result += ' '.join(current_path_info.path_output)
         else:
             for path in self.paths:
                 current_path_info = self.output[path]
@@ -87,43 +242,72 @@ class LsCommand(object):
                 if self.args.l:
                     if not self.args.directory and current_path_info.is_dir:
                         result += 'total {}\n'.format(current_path_info.total)
-                        if self.args.all:
-                            result += self._get_hidden_dirs(current_path_info.path)
                     result += '\n'.join(current_path_info.path_output)
                 else:
-                    if self.args.all:
-                        dirs = ['.', '..'] + current_path_info.path_output
-                    else:
-                        dirs = current_path_info.path_output
-                    result += ' '.join(dirs)
+                    result += ' '.join(current_path_info.path_output)
                 if not self.args.directory:
                     result += '\n\n'
                 else:
                     result += '\n'
         return result.strip()  # remove the last newline, because shell.writeline() will introduce it later.
 
+    def iter_recursive(self):
+        """
+            Yields the output of `ls -R` directory by directory, walking the filesystem depth first while
+            the output is sent, so that only the directories still to be listed are kept in memory.
+            The chunks are separated by blank lines, and the last one doesn't end with a newline.
+        """
+        separator = ''
+        for p in self.paths:
+            # Directories still to be listed, the next one last: (path as shown, path)
+            pending = [(p, self._process_argument(p))]
+            while pending:
+                shown_path, path = pending.pop()
+                if shown_path not in self.output:
+                    self._process_path(path, key_path=shown_path)
+                path_info = self.output.pop(shown_path)
+                if not path_info.is_dir:
+                    yield separator + '\n'.join(path_info.path_output)
+                    separator = '\n\n'
+                    continue
+                yield separator + '{}:\n'.format(shown_path) + self._format_directory(path_info)
+                separator = '\n\n'
+                subdirectories = []
+                _, names = self._list_directory(path_info.path, long_format=False)
+                for name in names:
+                    if name in ('.', '..'):
+                        continue
+                    if _is_dir(self._get_stat(os.path.join(path_info.path, name))):
+                        subdirectories.append((os.path.join(shown_path, name), os.path.join(path_info.path, name)))
+                pending.extend(reversed(subdirectories))
+
+    def _process_argument(self, p):
+        """ Processes the path `p` given on the command line. Returns the absolute path that was processed. """
+        try:
+            normalized_path = os.path.normpath(os.path.join(self.working_path, p))
+            self._process_path(normalized_path, key_path=p)
+            return normalized_path
+        except IllegalBackReference:
+            logger.warn('Access to the external file system was attempted.')
+            new_path = os.path.join(self.working_path, p.lstrip('../'))
+            self._process_path(new_path, key_path=p)
+            return new_path
+
+    def _format_directory(self, path_info):
+        if self.args.l:
+            return 'total {}\n'.format(path_info.total) + '\n'.join(path_info.path_output)
+        return ' '.join(path_info.path_output)
+
     def _stat_path(self, path):
         hidden = False
         base_name = path.split('/')[-1]
         if base_name.startswith('.'):
             hidden = True
-        stat_result = os.stat(self.filesystem.getsyspath(path))
-        try:
-            last_modified = time.strftime("%b %d %H:%M", time.localtime(stat_result.st_mtime))
-        except ValueError:
-            last_modified = time.strftime("%b %d %H:%M")
+        stat_result = self.filesystem.cached_stat(path)
         name = os.path.basename(path) or '.'
         total = stat_result.st_blocks
         if self.args.l:
-            path_string = "%s %2s %s %s %6s %s %s" % (
-                filemode(stat_result.st_mode),
-                stat_result.st_nlink,
-                'ftp',
-                'ftp',
-                stat_result.st_size,
-                last_modified,
-                name
-            )
+            path_string = _format_long([(self.filesystem.cached(path, 'ls -l fields', _long_fields), name)])[0]
         else:
             path_string = name
 
@@ -133,8 +317,9 @@ class LsCommand(object):
         path_output = []
         is_directory = False
         logger.debug('Processing path: {}'.format(path))
+        stat_result = self._get_stat(path)
         if self.args.directory:
-            if self.filesystem.isfile(path) or self.filesystem.isdir(path):
+            if stat_result is not None:
                 exists = True
                 stat = self._stat_path(path)
                 if stat['hidden']:
@@ -143,7 +328,7 @@ class LsCommand(object):
                 else:
                     path_output.append(stat['path_string'])
                 total = stat['total']
-                if self.filesystem.isdir(path):
+                if _is_dir(stat_result):
                     is_directory = True
             else:
                 exists = False
@@ -152,21 +337,14 @@ class LsCommand(object):
             path_info = _PathInfo(path, total, path_output, exists, is_directory)
             self._add_path_output(path_info, key_path)
         else:
-            if self.filesystem.isdir(unicode(path)):
+            if _is_dir(stat_result):
                 # Process all files one by one, adding to the output list
                 exists = True
                 total = 0
                 is_directory = True
-                for file_ in sorted(self.filesystem.listdir(path)):
-                    file_path = os.path.join(path, file_)
-                    stat = self._stat_path(file_path)
-                    if stat['hidden']:
-                        if self.args.all:
-                            path_output.append(stat['path_string'])
-                    else:
-                        path_output.append(stat['path_string'])
-                    total += stat['total']
-            elif self.filesystem.isfile(path):
+                total, lines = self._list_directory(path, self.args.l)
+                path_output.extend(lines)
+            elif stat_result is not None:
                 exists = True
                 stat = self._stat_path(path)
                 if stat['hidden']:
@@ -182,30 +360,23 @@ class LsCommand(object):
         path_info = _PathInfo(path, total, path_output, exists, is_directory)
         self._add_path_output(path_info, key_path)
 
+    def _list_directory(self, path, long_format):
+        options = (long_format, self.args.all, self.sort, self.args.reverse)
+        return self.filesystem.cached(path, ('ls',) + options,
+                                      lambda filesystem, _path: _list_directory(filesystem, _path, *options))
+
+    def _get_stat(self, path):
+        try:
+            return self.filesystem.cached_stat(path)
+        except (OSError, ResourceNotFound):
+            return None
+
     def _add_path_output(self, path_info, key_path):
         if key_path is None:
             self.output[path_info.path] = path_info
         else:
             self.output[key_path] = path_info
 
-    def _get_hidden_dirs(self, path):
-        path = self.filesystem.getsyspath(path)
-        parent_path = os.path.abspath(os.path.join(path, os.pardir))
-        return '{}\n{}\n'.format(self._stat_relative_dirs(path, name='.'),
-                                 self._stat_relative_dirs(parent_path, name='..'))
 
-    def _stat_relative_dirs(self, path, name=None):
-        stat_result = os.stat(path)
-        try:
-            last_modified = time.strftime("%b %d %H:%M", time.localtime(stat_result.st_mtime))
-        except ValueError:
-            last_modified = time.strftime("%b %d %H:%M")
-        return "%s %2s %s %s %6s %s %s" % (
-            filemode(stat_result.st_mode),
-            stat_result.st_nlink,
-            'ftp',
-            'ftp',
-            stat_result.st_size,
-            last_modified,
-            name
-        )
+def _is_dir(stat_result):
+    return stat_result is not None and S_ISDIR(stat_result.st_mode)
@@ -0,0 +1,200 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Parser(argparse.ArgumentParser):
+    def error(self, message):
+        logger.info('User supplied wrong arguments: %s', message)
+        raise ParseError()
+
+
+class ParseError(Exception):
+    pass
+
+
+def flag(*names, **kwargs):
+    """ Option spec for a boolean switch. """
+    kwargs.setdefault('action', 'store_true')
+    kwargs.setdefault('default', False)
+    return names, kwargs
+
+
+def option(*names, **kwargs):
+    """ Option spec for an option (or positional) that takes a value. """
+    return names, kwargs
+
+
+class CommandParser(object):
+    """
+        The argument parser of a single command, built once from its option spec. Bots send the same
+        few argument lists over and over, so results are memoised per argument list (the most recently
+        used `cache_size` of them). Callers get a copy of the cached result, and may modify it.
+    """
+
+    def __init__(self, name, spec, known_only=False, cache_size=256):
+        self.name = name
+        self.known_only = known_only
+        self.cache_size = cache_size
+        self.parser = Parser(prog=name, add_help=False)
+        for names, kwargs in spec:
+            self.parser.add_argument(*names, **kwargs)
+        self._cache = collections.OrderedDict()
+
+    def parse(self, params):
+        """
+            Returns the parsed Namespace, or a (Namespace, unparsed arguments) tuple if the command
+            accepts unknown arguments. Raises ParseError for invalid arguments.
+        """
+        key = tuple(params)
+        try:
+            result = self._cache.pop(key)
+        except KeyError:
+            result = self._parse(list(params))
+            if len(self._cache) >= self.cache_size:
+                self._cache.popitem(last=False)
+        self._cache[key] = result
+
+        if result is None:
+            raise ParseError()
+        if self.known_only:
+            args, unparsed = result
+            return argparse.Namespace(**vars(args)), list(unparsed)
+        return argparse.Namespace(**vars(result))
+
+    def _parse(self, params):
+        try:
+            if self.known_only:
+                return self.parser.parse_known_args(params)
+            return self.parser.parse_args(params)
+        except ParseError:
+            return None
+
+
+LS_SPEC = [
+    flag('-a', '--all'),
+    flag('-A', '--almost-all'),
+    flag('-d', '--directory'),
+    flag('-l'),
+
+    # We ignore these (for now), but still parse them ;-)
+    flag('-h', '--human-readable'),
+    flag('-b', '--escape'),
+    option('--block-size'),
+    flag('-B', '--ignore-backups'),
+    flag('-c'),
+    flag('-C'),
+    option('--color'),
+    flag('-D', '--dired'),
+    flag('-f'),
+    flag('-F', '--classify'),
+    flag('--file-type'),
+    option('--format'),
+    flag('--full-time'),
+    flag('-g'),
+    flag('--group-directories-first'),
+    flag('-G', '--no-group'),
+    flag('-H', '--dereference-command-line'),
+    flag('--dereference-command-line-symlink-to-dir'),
+    option('--hide'),
+    option('--indicator-style'),
+    flag('-i', '--inode'),
+    option('-I', '--ignore'),
+    flag('-k', '--kibibytes'),
+    flag('-L', '--deference'),
+    flag('-m'),
+    flag('-n', '--numeric-uid-gid'),
+    flag('-N', '--literal'),
+    flag('-o'),
+    flag('-p'),
+    flag('-q', '--hide-control-chars'),
+    flag('--show-control-chars'),
+    flag('-Q', '--quote-name'),
+    option('--quoting-style'),
+    flag('-r', '--reverse'),
+    flag('-R', '--recursive'),
+    flag('-s', '--size'),
+    flag('-S'),
+    option('--sort', choices=['none', 'size', 'time', 'extension', 'version']),
+    option('--time'),
+    option('--time-style'),
+    flag('-t'),
+    option('-T', '--tabsize', default=False),
+    flag('-u'),
+    flag('-U'),
+    flag('-v'),
+    option('-w', '--width'),
+    flag('-x'),
+    flag('-X'),
+    flag('-1', dest='one_per_line'),
+    flag('--help'),
+    flag('--version'),
+]
+
+UNAME_SPEC = [
+    flag('-a', '--all'),
+    flag('-s', '--kernel-name'),
+    flag('-n', '--nodename'),
+    flag('-r', '--kernel-release'),
+    flag('-v', '--kernel-version'),
+    flag('-m', '--kernel-machine'),
+    flag('-p', '--processor'),
+    flag('-i', '--hardware-platform'),
+    flag('-o', '--operating-system'),
+    flag('--help'),
+    flag('--version'),
+]
+
+WGET_SPEC = [
+    flag('-h', '--help'),
+    flag('-V', '--version'),
+    option('-O', '--output-document'),
+]
+
+PING_SPEC = [
+    flag('-h'),
+    option('-c', dest='count', type=int),
+    option('-i', dest='interval', type=float, default=1.0),
+    option('-w', dest='deadline', type=float),
+]
+
+SSH_SPEC = [
+    option('-p', dest='port', default=22, type=int),
+    option('-l', dest='username'),
+    option('host_string'),
+]
+
+# All parsers are built here, once, when the module is first imported.
+COMMAND_PARSERS = {
+    'ls': CommandParser('ls', LS_SPEC),
+    'uname': CommandParser('uname', UNAME_SPEC),
+    'wget': CommandParser('wget', WGET_SPEC, known_only=True),
+    'ssh': CommandParser('ssh', SSH_SPEC),
+    'ping': CommandParser('ping', PING_SPEC, known_only=True),
+}
+
+
+def parse(command, params):
+    """ Parses `params` with the registered parser of `command`, see CommandParser.parse. """
+    return COMMAND_PARSERS[command].parse(params)
@@ -19,9 +19,10 @@
 
 import re
 import random
-import gevent
 import logging
 
+from hornet.common.clock import CLOCK
+
 IP_ADDRESS_REGEX = "^([01]?\\d\\d?|2[0-4]\\d|25[0-5])\\." \
                     "([01]?\\d\\d?|2[0-4]\\d|25[0-5])\\." \
                     "([01]?\\d\\d?|2[0-4]\\d|25[0-5])\\." \
@@ -31,16 +32,26 @@ logger = logging.getLogger(__name__)
 
 
 class PingCommand(object):
+    """
+        Makes up replies from `host`, every `interval` seconds, until Ctrl+C, `count` replies were
+        sent, or `deadline` seconds passed. The replies are paced by a Ticker of the shell.
+    """
+
+    # Shorter intervals are for root only
+    MIN_INTERVAL = 0.2
 
-    def __init__(self, host, shell):
+    def __init__(self, host, shell, count=None, interval=1, deadline=None):
         self.user_provided_host = host
         self.shell = shell
+        self.count = count
+        self.interval = interval
+        self.deadline = deadline
 
         self.host = None
         self.ip = None
 
         # These record the stats to show at the end
-        self.total_count = 1
+        self.total_count = 0
         self.success_count = 0
         self.times = []
 
@@ -58,34 +69,43 @@ class PingCommand(object):
 
         self.shell.writeline('PING {} ({}) 56(84) bytes of data.'.format(self.host, self.ip))
 
-        while not self.shell.interrupt:
-            if random.uniform(0, 1) < self.success_probability:
-                time = random.normalvariate(self.mean, self.standard_deviation)
-                line = '64 bytes from {} ({}): icmp_seq={} ttl=53 time={:.1f} ms'.format(
-                    self.host,
-                    self.ip,
-                    self.total_count,
-                    time
-                )
-                self.success_count += 1
-                self.times.append(time)
-                self.shell.writeline(line)
-            self.total_count += 1
-            gevent.sleep(1)
-
-        self.shell.writeline('^C')
+        start_time = CLOCK.monotonic()
+        with self.shell.every(self.interval, duration=self.deadline) as ticker:
+            while ticker.wait():
+                self._reply()
+                if self.count is not None and self.total_count >= self.count:
+                    break
+                self.shell.flush()
+        elapsed_time = CLOCK.monotonic() - start_time
+
+        if self.shell.interrupt:
+            self.shell.writeline('^C')
         self.shell.writeline('--- {} ping statistics ---'.format(self.user_provided_host))
-        self.shell.writeline('{} packets transmitted, {} received, {} packet loss, time {:.2f}ms'.format(
-            self.total_count, self.success_count, self._get_percentage_packet_loss(), sum(self.times)
+        self.shell.writeline('{} packets transmitted, {} received, {} packet loss, time {:.0f}ms'.format(
+            self.total_count, self.success_count, self._get_percentage_packet_loss(), elapsed_time * 1000
         ))
         if self.times:  # Only show the average if ctrl + C was not pressed before a second was up
             self.shell.writeline('rtt min/avg/max/mdev = {:.3f}/{:.3f}/{:.3f}/{:.3f} ms'.format(
                 min(self.times),
-                sum(self.times) / self.total_count,
+                sum(self.times) / len(self.times),
                 max(self.times),
                 self._get_std_deviation()
             ))
 
+    def _reply(self):
+        self.total_count += 1
+        if random.uniform(0, 1) < self.success_probability:
+            time = random.normalvariate(self.mean, self.standard_deviation)
+            line = '64 bytes from {} ({}): icmp_seq={} ttl=53 time={:.1f} ms'.format(
+                self.host,
+                self.ip,
+                self.total_count,
+                time
+            )
+            self.success_count += 1
+            self.times.append(time)
+            self.shell.writeline(line)
+
     def _resolve_hostname(self):
         if re.match(IP_ADDRESS_REGEX, self.user_provided_host):
             target_host = self._reverse_hostname_lookup(self.user_provided_host)
@@ -97,14 +117,17 @@ class PingCommand(object):
                 self.host = self.user_provided_host
         else:
             if self.user_provided_host in self.shell.vhosts:  # Only ping hosts in our honeypot
+                self.host = self.user_provided_host
                 self.ip = self.shell.vhosts[self.user_provided_host].ip_address
 
     def _get_percentage_packet_loss(self):
+        if not self.total_count:
+            return '0%'
         return '{:.2%}'.format(1 - float(self.success_count)/self.total_count)
 
     def _get_std_deviation(self):
         variance = sum((t - self.mean)**2 for t in self.times)
-        return (variance / self.total_count) ** 0.5
+        return (variance / len(self.times)) ** 0.5
 
     def _reverse_hostname_lookup(self, ip_addr):
         for h in self.shell.vhosts:
@@ -21,13 +21,9 @@ import logging
 import os
 import random
 import urlparse
-import gevent
-import requests
-import requests.exceptions
 import time
 import socket
 
-from contextlib import closing
 from hornet.common.helpers import human_readable
 
 logger = logging.getLogger(__name__)
@@ -36,8 +32,10 @@ logger = logging.getLogger(__name__)
 class WgetCommand(object):
 
     PROGRESS_BAR = '{:.0%}[{}>{}] {:,}  {}'
+    UNKNOWN_PROGRESS_BAR = '    [ <=> ] {:,}  {}'
+    PROGRESS_INTERVAL = 0.3
 
-    def __init__(self, url, working_path, filesystem, args, shell):
+    def __init__(self, url, working_path, filesystem, args, shell, downloads):
         self.shell = shell
         self.url = url
         self.parsed_url = None
@@ -46,7 +44,8 @@ class WgetCommand(object):
         self.filesystem = filesystem
         self.outputfile = None
         self.fail_flag = False
-        self.session = requests.session()
+        self.downloads = downloads
+        self.download = None
 
         self.ip_address = None
         self.port = None
@@ -55,7 +54,8 @@ class WgetCommand(object):
         # Used to render the progressbar
         self.progressbar_size = 50
 
-        # Used to calculate download progress and speed
+        # Used to calculate download progress and speed. total_size is None if the server
+        # didn't send a content-length.
         self.total_size = 0
         self.currently_downloaded = 0
         self.start_time = None
@@ -69,59 +69,65 @@ class WgetCommand(object):
 
     def process(self):
         self._parse_url()
-        self._get_total_size()
-
+        if not self.fail_flag:
+            self.download = self.downloads.submit(self.url)
+            try:
+                self._download()
+            finally:
+                self.download.close()
         if self.fail_flag:
             self._write_info_line()
             self._write_dns_resolution_failed()
             self.shell.writeline('wget: unable to resolve host address \'{}\''.format(self.parsed_url.hostname))
+
+    def _download(self):
+        self.shell.flush()
+        if not self.download.wait_headers():
+            self.fail_flag = True
             return
+        self.total_size = self.download.total_size
+        self.content_type = self.download.content_type
+        logger.debug('Total size set to: {}'.format(self.total_size))
 
         self._write_info_line()
         self._write_dns_resolution_successful()
         self._write_connection_info()
 
-        output_path = os.path.join(self.working_path, self.outputfile)
-        with open(self.filesystem.getsyspath(output_path), 'w') as output:
-            self.start_time = time.clock()
-            with closing(self.session.get(self.url, stream=True)) as response:
-                progress_greenlet = gevent.spawn(self._render_progressbar)
-                logger.debug('Progress greenlet started')
-                for data in response.iter_content(128):
-                    if data:
-                        self.currently_downloaded += len(data)
-                        output.write(data)
-                        gevent.sleep(0)
-                logger.debug('Download complete')
-                gevent.joinall([progress_greenlet])
-                self._write_conclusion()
-
-    def _get_total_size(self):
-        try:
-            resp = self.session.get(self.url)
-        except requests.exceptions.RequestException:
-            self.fail_flag = True
+        self.start_time = time.time()
+        self.shell.updateline(self._get_progressbar())
+        # Redrawn on the ticks of the shell, not on every chunk that arrives, until the download ends
+        with self.shell.every(self.PROGRESS_INTERVAL, delay=self.PROGRESS_INTERVAL) as ticker:
+            stop = lambda _: ticker.stop()
+            self.download.finished.rawlink(stop)
+            try:
+                while ticker.wait():
+                    self.currently_downloaded = self.download.received
+                    self.shell.updateline(self._get_progressbar())
+            finally:
+                self.download.finished.unlink(stop)
+        self.currently_downloaded = self.download.received
+        if not self.download.done:
+            # Ctrl+C, wget leaves what arrived so far behind
+            self.shell.writeline('^C')
+            self.download.save(self.filesystem, os.path.join(self.working_path, self.outputfile))
             return
-        if not resp.status_code == 200:
-            logger.debug('Response for url: {} is "{}"'.format(self.url, resp.status_code))
-            self.fail_flag = True
+        # Update one last time to show the final progress
+        self.shell.updateline('{}  in {:.2f}s'.format(self._get_progressbar(), time.time() - self.start_time))
+        self.shell.writeline('')
+
+        # Complete downloads become a reference to the stored payload, incomplete ones a copy of what arrived
+        self.download.save(self.filesystem, os.path.join(self.working_path, self.outputfile))
+
+        if self.download.failed:
+            logger.debug('Download of %s failed after %s bytes', self.url, self.currently_downloaded)
+            self.shell.writeline('{} - Read error at byte {} ({}). Giving up.'.format(
+                time.strftime('%Y-%m-%d %H:%M:%S'),
+                self.currently_downloaded,
+                self.download.error
+            ))
             return
-        content_length = resp.headers.get('content-length', None)
-        if content_length:
-            try:
-                self.total_size = int(content_length)
-            except ValueError:
-                logger.error('Invalid content-length received '
-                             'for url ({}): {}'.format(self.url, content_length))
-                self.fail_flag = True
-        elif len(resp.content):
-            self.total_size = len(resp.content)
-        else:
-            self.fail_flag = True
-        self.content_type = resp.headers.get('content-type', None)
-        if not self.content_type:
-            self.content_type = 'text/plain'
-        logger.debug('Total size set to: {}'.format(self.total_size))
+        logger.debug('Download complete')
+        self._write_conclusion()
 
     def _write_info_line(self):
         self.shell.writeline('--{}-- {}'.format(time.strftime('%Y-%m-%d %H:%M:%S'), self.url))
@@ -131,17 +137,25 @@ class WgetCommand(object):
                              'not known.'.format(self.parsed_url.hostname, self.parsed_url.hostname))
 
     def _write_dns_resolution_successful(self):
-        try:
-            # This will generally be successful. If the hostname was really not
-            # resolved, `_get_total_size()` would have failed.
-            self.ip_address = socket.gethostbyname(self.parsed_url.hostname)
-        except socket.error:
-            self.ip_address = '.'.join(''.format(random.randint(1, 254)) for i in range(4))
+        if self.downloads.offline:
+            # No lookups either, make up an address that stays the same for the host
+            self.ip_address = self._make_up_ip_address(random.Random(self.parsed_url.hostname))
+        else:
+            try:
+                # This will generally be successful. If the hostname was really not
+                # resolved, `_get_total_size()` would have failed.
+                self.ip_address = socket.gethostbyname(self.parsed_url.hostname)
+            except socket.error:
+                self.ip_address = self._make_up_ip_address(random)
         self.shell.writeline('Resolving {0} ({0})... {1}'.format(
             self.parsed_url.hostname,
             self.ip_address,
         ))
 
+    @staticmethod
+    def _make_up_ip_address(rng):
+        return '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+
     def _write_connection_info(self):
         self.shell.writeline('Connecting to {0} ({0})|{1}|:{2}... connected.'.format(
             self.parsed_url.hostname,
@@ -149,29 +163,26 @@ class WgetCommand(object):
             self.port
         ))
         self.shell.writeline('HTTP request sent, awaiting response... 200 OK')
-        self.shell.writeline('Length: {} ({}) [{}]'.format(
-            self.total_size,
-            human_readable(self.total_size),
-            self.content_type
-        ))
+        if self.total_size is None:
+            self.shell.writeline('Length: unspecified [{}]'.format(self.content_type))
+        else:
+            self.shell.writeline('Length: {} ({}) [{}]'.format(
+                self.total_size,
+                human_readable(self.total_size),
+                self.content_type
+            ))
         self.shell.writeline('Saving to:\'{}\''.format(self.outputfile))
         self.shell.writeline('')
 
-    def _render_progressbar(self):
-        while not self.currently_downloaded == self.total_size:
-            self.shell.updateline(self._get_progressbar())
-            gevent.sleep(0.3)
-        # Update one last time to show 100% progress
-        self.shell.updateline('{}  in {:.2f}s'.format(self._get_progressbar(), time.clock()-self.start_time))
-        self.shell.writeline('')
-
     def _get_progressbar(self):
-        percent = self.currently_downloaded / float(self.total_size)
+        elapsed_time = max(time.time() - self.start_time, 0.001)
+        speed = human_readable(self.currently_downloaded / elapsed_time, suffix='B/s')
+        if self.total_size is None:
+            return self.UNKNOWN_PROGRESS_BAR.format(self.currently_downloaded, speed)
+
+        percent = self.currently_downloaded / float(self.total_size) if self.total_size else 1.0
         done = int(percent * self.progressbar_size)
         not_done = self.progressbar_size - done
-
-        elapsed_time = time.clock() - self.start_time
-        speed = human_readable(self.currently_downloaded / elapsed_time, suffix='B/s')
         return self.PROGRESS_BAR.format(
             percent,
             (done - 1) * '=',
@@ -193,9 +204,12 @@ class WgetCommand(object):
                 self.port = 443
 
     def _write_conclusion(self):
-        self.shell.writeline('{} - \'{}\' saved [{}/{}]'.format(
+        if self.total_size is None:
+            saved = self.currently_downloaded
+        else:
+            saved = '{}/{}'.format(self.currently_downloaded, self.total_size)
+        self.shell.writeline('{} - \'{}\' saved [{}]'.format(
             time.strftime('%Y-%m-%d %H:%M:%S'),
             self.outputfile,
-            self.currently_downloaded,
-            self.total_size
+            saved
         ))
@@ -11,7 +11,7 @@
 #
 # This program is distributed in the hope that it will be useful,
 # but WITHOUT ANY WARRANTY; without even the implied warranty of
-# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURzPOSE.  See the
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 # GNU General Public License for more details.
 #
 # You should have received a copy of the GNU General Public License
@@ -19,26 +19,118 @@
 
 import logging
 import gevent
+import gevent.queue
+
+from hornet.core.db.writer import DatabaseThread
 
 logger = logging.getLogger(__name__)
 
+# Queued by SessionConsumer.stop(), one for each worker
+_STOP = object()
+
+
 class SessionConsumer(object):
+    """
+        Finalises finished sessions. A pool of worker greenlets takes sessions off `session_q`
+        in batches and writes their end times, command counts and durations to the database,
+        one transaction per batch. `session_q` should be bounded, so that finished sessions can't
+        pile up in memory when persistence falls behind (`Session.finish` drops them then, with a
+        warning). On stop, the workers persist everything that is queued before they return.
+    """
 
-    def __init__(self, session_q):
+    def __init__(self, session_q, db_handler, workers=2, batch_size=50, stats_interval=60):
         self.session_q = session_q
+        self.db_handler = db_handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stats_interval = stats_interval
         self.run_greenlet = None
+        self.worker_greenlets = []
+
+        # Counters used to report how well persistence keeps up
+        self.processed = 0
+        self.failed = 0
+        self.throughput = 0.0
+        self._last_processed = 0
+
+    @property
+    def queue_depth(self):
+        return self.session_q.qsize()
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'queue_size': self.session_q.maxsize,
+            'workers': self.workers,
+            'processed': self.processed,
+            'failed': self.failed,
+            'throughput': self.throughput
+        }
+
+    def _process_sessions(self, db_thread, sessions):
+        logger.debug('Persisting %s sessions', len(sessions))
+        rows = []
+        for session in sessions:
+            rows.append({
+                'session_id': str(session.id),
+                'end_time': session.end_time,
+                'command_count': session.command_count,
+                'duration': round(session.end_time - session.start_time, 3)
+            })
+        try:
+            db_thread.run(self.db_handler.finish_attack_sessions, rows)
+        except Exception:
+            logger.exception('Could not persist %s sessions', len(rows))
+            self.failed += len(rows)
+        else:
+            self.processed += len(rows)
+
+    def _take_batch(self):
+        """ Waits for sessions, and returns up to `batch_size` of them, and whether a stop came after them. """
+        sessions = []
+        session = self.session_q.get()
+        while session is not _STOP:
+            sessions.append(session)
+            if len(sessions) >= self.batch_size:
+                break
+            try:
+                session = self.session_q.get_nowait()
+            except gevent.queue.Empty:
+                break
+        return sessions, session is _STOP
 
-    def _process_session(self, session):
-        logger.debug('Persisting session %s', session.id)
+    def _work(self):
+        db_thread = DatabaseThread(self.db_handler.engine)
+        try:
+            while True:
+                sessions, stop = self._take_batch()
+                if sessions:
+                    self._process_sessions(db_thread, sessions)
+                if stop:
+                    return
+        finally:
+            db_thread.close()
 
-    def _start_processing(self):
-        for session in self.session_q:
-            self._process_session(session)
+    def _report(self):
+        while True:
+            gevent.sleep(self.stats_interval)
+            self.throughput = (self.processed - self._last_processed) / float(self.stats_interval)
+            self._last_processed = self.processed
+            if self.session_q.full():
+                logger.warning('Session persistence is falling behind: %s', self.stats())
+            else:
+                logger.debug('Session consumer stats: %s', self.stats())
 
     def start(self):
-        self.run_greenlet = gevent.spawn(self._start_processing)
+        self.worker_greenlets = [gevent.spawn(self._work) for _ in range(self.workers)]
+        self.run_greenlet = gevent.spawn(self._report)
         return self.run_greenlet
 
     def stop(self):
-        logger.info('Consumer stopping, no further sessions will be processed.')
+        logger.info('Consumer stopping, persisting the %s sessions still queued.', self.queue_depth)
         self.run_greenlet.kill()
+        # Behind everything queued so far, so the workers persist all of it before they return
+        for _ in self.worker_greenlets:
+            self.session_q.put(_STOP)
+        gevent.joinall(self.worker_greenlets)
+        self.worker_greenlets = []
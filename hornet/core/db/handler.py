@@ -19,15 +19,37 @@
 
 import logging
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine
 from sqlalchemy.orm import sessionmaker
 
-from models import AttackCommand, AttackSession, Base
+from hornet.common.clock import CLOCK
+from models import AttackCommand, AttackSession, AuthAttempt, Base
+from writer import BatchWriter, ColumnBatcher, DatabaseThread
 
 logger = logging.getLogger(__name__)
 
 Session = sessionmaker()
 
+AUTH_ATTEMPT_COLUMNS = ('time', 'session_id', 'source_ip', 'username', 'password', 'client_version', 'success')
+
+
+def clip(value, column):
+    """ Shortens `value` to the length of `column`, which a database in strict mode would reject it beyond. """
+    length = column.type.length
+    if value is None or length is None or len(value) <= length:
+        return value
+    if isinstance(value, str):
+        # Without the last character, if it was cut in the middle
+        return value[:length].decode('utf-8', 'ignore').encode('utf-8')
+    return value[:length]
+
+
+def clip_auth_attempt(*values):
+    """ Clips the values of an authentication attempt, in the order of AUTH_ATTEMPT_COLUMNS, to their columns. """
+    table = AuthAttempt.__table__
+    return [clip(value, table.c[name]) if name in ('username', 'password', 'client_version') else value
+            for name, value in zip(AUTH_ATTEMPT_COLUMNS, values)]
+
 
 class DatabaseHandler(object):
 
@@ -37,21 +59,79 @@ class DatabaseHandler(object):
         self.engine = create_engine(config.database, echo=False)
         Session.configure(bind=self.engine)
         Base.metadata.create_all(self.engine)
+        self.command_writer = BatchWriter(self.engine, AttackCommand.__table__,
+                                          batch_size=config.persistence_batch_size,
+                                          flush_interval=config.persistence_flush_interval)
+        # Brute-forcers make by far the most records, these are collected in much larger batches
+        self.auth_attempts = ColumnBatcher(AUTH_ATTEMPT_COLUMNS, self._write_auth_attempts,
+                                           batch_size=config.persistence_auth_batch_size,
+                                           flush_interval=config.persistence_flush_interval)
+        self._auth_thread = DatabaseThread(self.engine)
+        # Sessions are inserted right away, before any of their commands or their end can be written
+        self._session_thread = DatabaseThread(self.engine)
+
+    def start(self):
+        self.auth_attempts.start()
+        return self.command_writer.start()
+
+    def stop(self):
+        self.auth_attempts.stop()
+        self._auth_thread.close()
+        self.command_writer.stop()
+        self._session_thread.close()
 
     def create_attack_session(self, session):
         logger.debug('Creating new attack session, %s - start-time: %s remote-addr: %s',
                      session.id, session.start_time, session.client_address)
-        with self.session_context() as dbsession:
-            attack_session = AttackSession(start_time=session.start_time, id=session.id,
-                                           source_ip=session.client_address[0], source_port=session.client_address[1])
-            dbsession.add(attack_session)
-
-    def create_attack_command(self, attack_session_id, command, host):
-        logger.debug('Adding a new attack command (%s) to session %s.', command, attack_session_id)
-        with self.session_context() as dbsession:
-            attack_session = dbsession.query(AttackSession).filter_by(id=attack_session_id).one()
-            attack_command = AttackCommand(command=command, host=host.hostname, session_id=attack_session.id)
-            attack_session.commands.append(attack_command)
+        # On the database thread, only the calling greenlet waits for the insert
+        self._session_thread.run(self.insert_rows, AttackSession.__table__, [{
+            'id': str(session.id),
+            'start_time': session.start_time,
+            'source_ip': session.client_address[0],
+            'source_port': session.client_address[1]
+        }])
+
+    def create_attack_command(self, attack_session_id, command, hostname):
+        logger.debug('Queueing a new attack command (%s) for session %s.', command, attack_session_id)
+        table = AttackCommand.__table__
+        self.command_writer.put({
+            'time': CLOCK.timestamp(),
+            'command': clip(command, table.c.command),
+            'host': clip(hostname, table.c.host),
+            'session_id': str(attack_session_id)
+        })
+
+    def create_auth_attempt(self, session, username, password, client_version, success):
+        self.auth_attempts.add(*clip_auth_attempt(CLOCK.timestamp(), str(session.id), session.client_address[0],
+                                                  username, password, client_version, success))
+
+    def create_auth_attempts(self, columns):
+        """ Queues a whole batch of attempts, as columns (see ColumnBatcher). """
+        self.auth_attempts.extend(columns)
+
+    def _write_auth_attempts(self, columns):
+        self._auth_thread.run(self.insert_columns, AuthAttempt.__table__, columns)
+
+    @staticmethod
+    def insert_rows(connection, table, rows):
+        connection.execute(table.insert(), rows)
+
+    @staticmethod
+    def insert_columns(connection, table, columns):
+        names = list(columns)
+        rows = [dict(zip(names, values)) for values in zip(*[columns[name] for name in names])]
+        connection.execute(table.insert(), rows)
+
+    @staticmethod
+    def finish_attack_sessions(connection, rows):
+        """ Writes the final state of a batch of sessions, using `connection`'s transaction. """
+        table = AttackSession.__table__
+        statement = table.update().where(table.c.id == bindparam('session_id')).values(
+            end_time=bindparam('end_time'),
+            command_count=bindparam('command_count'),
+            duration=bindparam('duration')
+        )
+        connection.execute(statement, rows)
 
     @contextmanager
     def session_context(self):
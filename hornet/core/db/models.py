@@ -17,9 +17,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import arrow
+from hornet.common.clock import CLOCK
 
-from sqlalchemy import Column, String, UnicodeText, ForeignKey, Integer
+from sqlalchemy import Boolean, Column, Float, String, Unicode, UnicodeText, ForeignKey, Integer
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -30,10 +30,13 @@ class AttackSession(Base):
     __tablename__ = 'attacksession'
 
     id = Column(String(50), primary_key=True)
-    start_time = Column(Integer)
+    # Timestamps have millisecond resolution, a single precision FLOAT (MySQL's default) would lose it
+    start_time = Column(Float(precision=53))
     source_ip = Column(String(16))
     source_port = Column(Integer)
-    end_time = Column(Integer)
+    end_time = Column(Float(precision=53))
+    command_count = Column(Integer)
+    duration = Column(Float(precision=53))
     commands = relationship('AttackCommand', backref='session', order_by='AttackCommand.time',
                             cascade="all, delete-orphan")
 
@@ -42,8 +45,21 @@ class AttackCommand(Base):
     __tablename__ = 'attackcommand'
 
     id = Column(Integer, autoincrement=True, primary_key=True)
-    time = Column(Integer, default=lambda: arrow.now().timestamp)
+    time = Column(Float(precision=53), default=lambda: CLOCK.timestamp())
     command = Column(String(2048))
     host = Column(String(2048))
     output = Column(UnicodeText)
     session_id = Column(String(50), ForeignKey('attacksession.id'))
+
+class AuthAttempt(Base):
+
+    __tablename__ = 'authattempt'
+
+    id = Column(Integer, autoincrement=True, primary_key=True)
+    time = Column(Float(precision=53))
+    session_id = Column(String(50))
+    source_ip = Column(String(16))
+    username = Column(Unicode(256))
+    password = Column(Unicode(256))
+    client_version = Column(String(256))
+    success = Column(Boolean)
@@ -0,0 +1,236 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import gevent
+import gevent.event
+import gevent.queue
+
+from gevent.threadpool import ThreadPool
+
+logger = logging.getLogger(__name__)
+
+# Queued by BatchWriter.stop(), after the last row
+_STOP = object()
+
+
+class DatabaseThread(object):
+    """
+        A native thread that owns a single database connection. C drivers like mysqlclient
+        cannot be monkey-patched by gevent, so running their queries on the hub would block
+        every other session while the query is in flight. Work submitted here only blocks
+        the calling greenlet.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._pool = ThreadPool(1)
+        self._connection = None
+
+    def run(self, func, *args):
+        """ Runs `func(connection, *args)` inside a transaction on the database thread. """
+        return self._pool.apply(self._run_in_transaction, (func, args))
+
+    def close(self):
+        self._pool.apply(self._close_connection)
+        self._pool.kill()
+
+    def _run_in_transaction(self, func, args):
+        if self._connection is None:
+            self._connection = self.engine.connect()
+        try:
+            with self._connection.begin():
+                return func(self._connection, *args)
+        except Exception:
+            self._close_connection()
+            raise
+
+    def _close_connection(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class BatchWriter(object):
+    """
+        Write-behind buffer for a single table. Rows are queued by the caller without touching
+        the database, and a dedicated greenlet inserts them in bulk (one multi-row INSERT per
+        batch) whenever `batch_size` rows are waiting or `flush_interval` seconds have passed.
+    """
+
+    def __init__(self, engine, table, batch_size=100, flush_interval=1.0):
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = gevent.queue.Queue()
+        self.run_greenlet = None
+        self._thread = DatabaseThread(engine)
+
+    def put(self, row):
+        self.queue.put(row)
+
+    def start(self):
+        self.run_greenlet = gevent.spawn(self._run)
+        return self.run_greenlet
+
+    def stop(self):
+        if self.run_greenlet is not None:
+            # The greenlet writes the rows it holds, and everything queued before the stop, then returns
+            self.queue.put(_STOP)
+            self.run_greenlet.join()
+            self.run_greenlet = None
+        # Whatever is left in the queue (if it never ran) still has to reach the database.
+        rows = drain(self.queue, len(self.queue))
+        if rows:
+            self.flush(rows)
+        self._thread.close()
+
+    def flush(self, rows):
+        logger.debug('Flushing %s rows into %s', len(rows), self.table.name)
+        try:
+            self._thread.run(self._insert, rows)
+            return
+        except Exception:
+            if len(rows) == 1:
+                logger.exception('Could not write a row into %s: %r', self.table.name, rows[0])
+                return
+            logger.warning('Could not write %s rows into %s, writing them one by one', len(rows), self.table.name,
+                           exc_info=True)
+        # A single bad row fails the whole statement, it shouldn't take the others with it
+        for row in rows:
+            try:
+                self._thread.run(self._insert, [row])
+            except Exception:
+                logger.exception('Could not write a row into %s: %r', self.table.name, row)
+
+    def _run(self):
+        while True:
+            row = self.queue.get()
+            if row is _STOP:
+                return
+            rows = [row]
+            deadline = gevent.get_hub().loop.now() + self.flush_interval
+            while len(rows) < self.batch_size:
+                remaining = deadline - gevent.get_hub().loop.now()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self.queue.get(timeout=remaining)
+                except gevent.queue.Empty:
+                    break
+                if row is _STOP:
+                    self.flush(rows)
+                    return
+                rows.append(row)
+            self.flush(rows)
+
+    def _insert(self, connection, rows):
+        connection.execute(self.table.insert().values(rows))
+
+
+class ColumnBatcher(object):
+    """
+        Collects records column by column, and hands full batches to `flush`, as a dict of column
+        name to list of values, from a dedicated greenlet. Batches go out once `batch_size` records
+        are waiting, or after `flush_interval` seconds. Adding a record only appends to the columns;
+        the greenlet is only woken up once the batch is full, so high rates of records cost no
+        greenlet switches.
+    """
+
+    def __init__(self, columns, flush, batch_size=1000, flush_interval=1.0):
+        self.columns = columns
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.run_greenlet = None
+        self._stopping = False
+        self._full = gevent.event.Event()
+        self._values = self._create_values()
+
+    def add(self, *values):
+        """ Adds a record, its values in the order of `columns`. """
+        for column_values, value in zip(self._values, values):
+            column_values.append(value)
+        if len(self._values[0]) >= self.batch_size:
+            self._full.set()
+
+    def extend(self, columns):
+        """ Adds a whole batch of records, as passed to `flush`. """
+        for column_values, name in zip(self._values, self.columns):
+            column_values.extend(columns[name])
+        if len(self._values[0]) >= self.batch_size:
+            self._full.set()
+
+    def __len__(self):
+        return len(self._values[0])
+
+    def start(self):
+        self._stopping = False
+        self.run_greenlet = gevent.spawn(self._run)
+        return self.run_greenlet
+
+    def stop(self):
+        if self.run_greenlet is not None:
+            # Lets the greenlet finish the batch it might be flushing
+            self._stopping = True
+            self._full.set()
+            self.run_greenlet.join()
+            self.run_greenlet = None
+        self._flush_waiting()
+
+    def _run(self):
+        while not self._stopping:
+            self._full.wait(self.flush_interval)
+            self._full.clear()
+            self._flush_waiting()
+
+    def _flush_waiting(self):
+        if not len(self):
+            return
+        values, self._values = self._values, self._create_values()
+        logger.debug('Flushing %s records', len(values[0]))
+        self._flush_values(values)
+
+    def _flush_values(self, values):
+        try:
+            self.flush(dict(zip(self.columns, values)))
+        except Exception:
+            count = len(values[0])
+            if count == 1:
+                logger.exception('Could not flush a record: %r', [column_values[0] for column_values in values])
+                return
+            # A single bad record fails the whole batch, so retry its halves until that record is found
+            logger.warning('Could not flush %s records, retrying in smaller batches', count, exc_info=True)
+            middle = count // 2
+            self._flush_values(tuple(column_values[:middle] for column_values in values))
+            self._flush_values(tuple(column_values[middle:] for column_values in values))
+
+    def _create_values(self):
+        return tuple([] for _ in self.columns)
+
+
+def drain(queue, count):
+    """ Takes up to `count` items off `queue` without blocking. """
+    items = []
+    for _ in range(count):
+        try:
+            items.append(queue.get_nowait())
+        except gevent.queue.Empty:
+            break
+    return items
@@ -0,0 +1,407 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import io
+import logging
+import mimetypes
+import os
+import random
+import tempfile
+import time
+import urlparse
+
+import gevent
+import gevent.event
+import gevent.lock
+import requests
+import requests.adapters
+
+from contextlib import closing, contextmanager
+
+from hornet.common.clock import CLOCK
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadError(Exception):
+    pass
+
+
+class Download(object):
+    """
+        A single fetch of `url`, run in its own greenlet by the DownloadScheduler. The body is
+        spooled to a temporary file and hashed as it arrives. It can be followed while the download
+        is still running, with iter_body(), iter_progress() or `finished`, and saved to a filesystem when done.
+
+        A Download can be shared by several users (see DownloadScheduler.submit); each of them
+        follows it on its own, from the start, and calls close() when done with it.
+    """
+
+    # Bodies up to this size stay in memory
+    SPOOL_SIZE = 1024 * 1024
+    MAX_READ_SIZE = 256 * 1024
+
+    def __init__(self, url, payloads=None):
+        self.url = url
+        self.payloads = payloads
+        self.sha256 = None  # Set once the download completed successfully
+        self.status_code = None
+        self.total_size = None  # None if the server didn't send a content-length
+        self.content_type = None
+        self.received = 0
+        self.error = None
+        self.done = False
+        self.headers_ready = gevent.event.Event()
+        self.finished = gevent.event.Event()
+        self.greenlet = None
+        self.users = 1
+        self._progress = gevent.event.Event()
+        self._body = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE)
+        self._hash = hashlib.sha256()
+
+    @classmethod
+    def completed(cls, url, body, size, content_type, sha256=None, payloads=None):
+        """ A Download that is done already: `size` bytes in the file object `body`, which it takes over. """
+        download = cls(url, payloads)
+        download._body.close()
+        download._body = body
+        download.status_code = 200
+        download.total_size = download.received = size
+        download.content_type = content_type
+        download.sha256 = sha256
+        download._finish()
+        return download
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def wait_headers(self):
+        """ Blocks until the status and headers are known, or the download failed. Returns False if it failed. """
+        self.headers_ready.wait()
+        return not self.failed
+
+    def iter_body(self):
+        """ Yields the body, chunk by chunk, as it arrives. Check `failed` afterwards. """
+        offset = 0
+        while True:
+            if offset < self.received:
+                self._body.seek(offset)
+                data = self._body.read(min(self.received - offset, self.MAX_READ_SIZE))
+                offset += len(data)
+                yield data
+            elif self.done:
+                return
+            else:
+                self._progress.wait()
+
+    def iter_progress(self):
+        """ Yields the number of bytes received so far, every time it changes. """
+        reported = 0
+        while True:
+            if reported < self.received:
+                reported = self.received
+                yield reported
+            elif self.done:
+                return
+            else:
+                self._progress.wait()
+
+    def save(self, filesystem, path):
+        """ Writes the body (so far) to `path` on `filesystem`, as a reference to the stored payload if possible. """
+        if not isinstance(path, unicode):
+            path = unicode(path)
+        if self.payloads is not None and self.sha256 in self.payloads:
+            self.payloads.link(self.sha256, filesystem, path)
+            # Linking goes around the filesystem, which has to forget what it knew about the path
+            filesystem.invalidate(path)
+        else:
+            if filesystem.isfile(path):
+                # It might be a link to a stored payload, which must not be overwritten
+                filesystem.remove(path)
+            self._body.seek(0)
+            filesystem.setbinfile(path, self._body)
+
+    def close(self):
+        self.users -= 1
+        if not self.users and self.done:
+            self._body.close()
+
+    def _set_headers(self, status_code, headers):
+        self.status_code = status_code
+        if status_code != 200:
+            raise DownloadError('Status code {}'.format(status_code))
+        content_length = headers.get('content-length', None)
+        if content_length:
+            try:
+                self.total_size = int(content_length)
+            except ValueError:
+                raise DownloadError('Invalid content-length: {}'.format(content_length))
+        self.content_type = headers.get('content-type', None) or 'text/plain'
+
+    def _append(self, data):
+        self._body.seek(0, 2)
+        self._body.write(data)
+        self._hash.update(data)
+        self.received += len(data)
+        self._notify()
+
+    def _store(self):
+        self.sha256 = self._hash.hexdigest()
+        if self.payloads is not None:
+            self.payloads.add(self.sha256, self._body, self.received, self.url)
+
+    def _finish(self, error=None):
+        self.error = error
+        self.done = True
+        self.headers_ready.set()
+        self.finished.set()
+        self._notify()
+        if not self.users:
+            self._body.close()
+
+    def _notify(self):
+        # Wake up everyone waiting for data, later waiters wait on a new event
+        progress, self._progress = self._progress, gevent.event.Event()
+        progress.set()
+
+
+class _HostSlots(object):
+    """ Limits the concurrent downloads from one host. Tracks its users, so idle hosts can be forgotten. """
+
+    def __init__(self, limit):
+        self.semaphore = gevent.lock.BoundedSemaphore(limit)
+        self.users = 0
+
+
+class _Bandwidth(object):
+    """ Shares `rate` bytes per second between all downloads, by making them wait their turn. """
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self._available_at = 0
+
+    def consume(self, size):
+        now = CLOCK.monotonic()
+        self._available_at = max(self._available_at, now) + size / self.rate
+        gevent.sleep(self._available_at - now)
+
+
+class DownloadScheduler(object):
+    """
+        Runs all outbound downloads of the process, over a shared pool of keep-alive connections.
+        At most `max_concurrent` downloads run at once, and at most `max_per_host` from the same
+        host; further downloads wait for a slot. Connecting and each read are bounded by timeouts,
+        whole downloads by `max_duration`, and all of them together share `bandwidth` bytes per
+        second (0 for no limit). Completed downloads are kept in `payloads`, a PayloadStore.
+
+        Concurrent requests for the same URL share a single download. URLs in `cache`, a UrlCache,
+        are served from the PayloadStore without a request while they are fresh.
+
+        In `offline` mode there are no requests at all. URLs are served from the cache (however old
+        the entry), from `offline_directory` (<host>/<path> or just the file name of the URL), or
+        else get a made-up response: `fake_size` (min, max) bytes of `fake_content_type`, guessed
+        from the URL if not given. Made-up responses depend on the URL only, and aren't stored.
+    """
+
+    # Reads start small, so that slow downloads still show progress, and grow while the data
+    # keeps arriving quickly.
+    MIN_CHUNK_SIZE = 1024
+    MAX_CHUNK_SIZE = 256 * 1024
+    SLOW_READ = 0.3
+
+    def __init__(self, max_concurrent=32, max_per_host=4, connect_timeout=10, read_timeout=30,
+                 max_duration=300, bandwidth=0, payloads=None, cache=None, offline=False,
+                 offline_directory=None, fake_content_type=None, fake_size=(4096, 65536)):
+        self.payloads = payloads
+        self.cache = cache
+        self.offline = offline
+        self.offline_directory = os.path.abspath(offline_directory) if offline_directory else None
+        self.fake_content_type = fake_content_type
+        self.fake_size = fake_size
+        self.max_concurrent = max_concurrent
+        self.max_per_host = max_per_host
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_duration = max_duration
+        self.bandwidth = _Bandwidth(bandwidth) if bandwidth else None
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_concurrent, pool_maxsize=max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Like wget, ask for the body as it is, so that it can be saved byte for byte
+        self.session.headers['Accept-Encoding'] = 'identity'
+
+        self._slots = gevent.lock.BoundedSemaphore(max_concurrent)
+        self._host_slots = {}
+        self._in_flight = {}
+        self.active = 0
+        self.coalesced = 0
+        self.served_locally = 0
+
+    @classmethod
+    def from_config(cls, config, payloads=None, cache=None, offline_directory=None):
+        return cls(payloads=payloads,
+                   cache=cache,
+                   offline=config.download_offline,
+                   offline_directory=offline_directory,
+                   fake_content_type=config.download_fake_content_type,
+                   fake_size=config.download_fake_size,
+                   max_concurrent=config.download_max_concurrent,
+                   max_per_host=config.download_max_per_host,
+                   connect_timeout=config.download_connect_timeout,
+                   read_timeout=config.download_read_timeout,
+                   max_duration=config.download_max_duration,
+                   bandwidth=config.download_bandwidth)
+
+    def submit(self, url):
+        """
+            Starts downloading `url` (once there is a free slot), returns the Download. If `url` is
+            being downloaded already, that download is returned instead, even if it is halfway done.
+        """
+        download = self._in_flight.get(url)
+        if download is not None:
+            logger.debug('Joining the running download of %s', url)
+            download.users += 1
+            self.coalesced += 1
+            return download
+        download = self._get_local(url)
+        if download is not None:
+            self.served_locally += 1
+            return download
+        download = self._in_flight[url] = Download(url, self.payloads)
+        download.greenlet = gevent.spawn(self._run, download)
+        return download
+
+    def _get_local(self, url):
+        """ Returns a completed Download of `url` if it can be served without a request, None otherwise. """
+        if self.cache is not None and self.payloads is not None:
+            entry = self.cache.get(url, allow_stale=self.offline)
+            if entry is not None and entry['sha256'] in self.payloads:
+                logger.debug('Serving %s from the URL cache', url)
+                self.payloads.add(entry['sha256'], None, entry['size'], url)
+                return Download.completed(url, open(self.payloads.path(entry['sha256']), 'rb'), entry['size'],
+                                          entry['content_type'], entry['sha256'], self.payloads)
+        if not self.offline:
+            return None
+        path = self._get_offline_path(url)
+        if path is not None:
+            logger.debug('Serving %s from %s', url, path)
+            return Download.completed(url, open(path, 'rb'), os.path.getsize(path), _guess_content_type(url))
+        return self._get_fake(url)
+
+    def _get_offline_path(self, url):
+        if self.offline_directory is None:
+            return None
+        parsed_url = urlparse.urlparse(url)
+        url_path = parsed_url.path.lstrip('/')
+        for relative_path in (os.path.join(parsed_url.hostname or '', url_path), os.path.basename(url_path)):
+            path = os.path.normpath(os.path.join(self.offline_directory, relative_path))
+            # Don't let ../ in the URL escape the directory
+            if path.startswith(os.path.join(self.offline_directory, '')) and os.path.isfile(path):
+                return path
+        return None
+
+    def _get_fake(self, url):
+        logger.debug('Making up a response for %s', url)
+        seed = hashlib.sha256(url.encode('utf-8') if isinstance(url, unicode) else url).digest()
+        size = random.Random(seed).randint(*self.fake_size)
+        body = (seed * (size // len(seed) + 1))[:size]
+        return Download.completed(url, io.BytesIO(body), size, self.fake_content_type or _guess_content_type(url))
+
+    @contextmanager
+    def _host_slot(self, host):
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = _HostSlots(self.max_per_host)
+        slots.users += 1
+        try:
+            with slots.semaphore:
+                yield
+        finally:
+            slots.users -= 1
+            if not slots.users:
+                del self._host_slots[host]
+
+    def _run(self, download):
+        error = None
+        try:
+            with self._host_slot(urlparse.urlparse(download.url).netloc):
+                with self._slots:
+                    self.active += 1
+                    try:
+                        with gevent.Timeout(self.max_duration, DownloadError('Download took too long')):
+                            self._fetch(download)
+                    finally:
+                        self.active -= 1
+        except Exception as e:
+            logger.debug('Download of %s failed: %s', download.url, e)
+            error = e
+        else:
+            try:
+                download._store()
+                if self.cache is not None and self.payloads is not None:
+                    self.cache.put(download.url, download.sha256, download.content_type, download.received)
+            except (IOError, OSError):
+                logger.exception('Could not store the payload downloaded from %s', download.url)
+        del self._in_flight[download.url]
+        download._finish(error)
+
+    def _fetch(self, download):
+        response = self.session.get(download.url, stream=True, timeout=self.timeout)
+        with closing(response):
+            download._set_headers(response.status_code, response.headers)
+            chunks = self._iter_chunks(response.raw)
+            if download.total_size is None:
+                # Without a content-length, an empty body counts as a failure
+                first_chunk = next(chunks, None)
+                if not first_chunk:
+                    raise DownloadError('Empty response without content-length')
+                download._append(first_chunk)
+            download.headers_ready.set()
+            for data in chunks:
+                download._append(data)
+                if self.bandwidth is not None:
+                    self.bandwidth.consume(len(data))
+
+    def _iter_chunks(self, raw):
+        chunk_size = self.MIN_CHUNK_SIZE
+        max_chunk_size = self.MAX_CHUNK_SIZE
+        if self.bandwidth is not None:
+            # Don't read more at once than the whole budget for a second
+            max_chunk_size = max(min(max_chunk_size, int(self.bandwidth.rate)), self.MIN_CHUNK_SIZE)
+        while True:
+            started = time.time()
+            data = raw.read(chunk_size, decode_content=False)
+            if not data:
+                return
+            elapsed = time.time() - started
+            if len(data) == chunk_size and elapsed < self.SLOW_READ / 2:
+                chunk_size = min(chunk_size * 2, max_chunk_size)
+            elif elapsed > self.SLOW_READ:
+                chunk_size = max(chunk_size // 2, self.MIN_CHUNK_SIZE)
+            yield data
+
+
+def _guess_content_type(url):
+    path = urlparse.urlparse(url).path
+    if not path or path.endswith('/'):
+        return 'text/html'
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
@@ -18,13 +18,23 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import io
 import logging
+import stat
+import collections
 
 import fs.errors
 
 import hornet
 
+from fs.base import FS
+from fs.info import Info
+from fs.memoryfs import MemoryFS
+from fs.mode import Mode
 from fs.osfs import OSFS
+from fs.path import dirname, join, recursepath
+
+from hornet.core.path_cache import PathCache
 
 
 directories = []
@@ -36,7 +46,112 @@ with open(os.path.join(os.path.dirname(hornet.__file__), 'data',
         directories.append(unicode(line))
 
 
-class SandboxedFS(OSFS):
+# The subset of os.stat_result that ls needs, for files that don't exist on disk
+StatResult = collections.namedtuple('StatResult', ['st_mode', 'st_nlink', 'st_size', 'st_mtime', 'st_blocks'])
+
+
+DEFAULT_SNAPSHOT = os.path.join(os.path.dirname(hornet.__file__), 'data', 'linux_fs_snapshot.txt')
+
+_snapshots = {}
+
+
+def synthetic_stat(is_dir, size, mtime, mode=None, nlink=None):
+    """ Makes up a plausible stat result, as an ext4 filesystem with 4K blocks would report it. """
+    if is_dir:
+        return StatResult(mode or stat.S_IFDIR | 0o755, nlink or 2, 4096, mtime, 8)
+    return StatResult(mode or stat.S_IFREG | 0o644, nlink or 1, size, mtime, (size + 4095) // 4096 * 8)
+
+
+def load_snapshot(path):
+    """
+        Parses a filesystem snapshot into a list of (mode, mtime, path) tuples. Each line of the
+        file holds an octal mode, an mtime and an absolute path. Parsed snapshots are cached.
+    """
+    if path not in _snapshots:
+        entries = []
+        with open(path) as snapshot_file:
+            for line in snapshot_file:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                mode, mtime, entry_path = line.split(None, 2)
+                entries.append((int(mode, 8), int(mtime), unicode(entry_path)))
+        _snapshots[path] = entries
+    return _snapshots[path]
+
+
+def _stat(filesystem, path):
+    return filesystem.stat(path)
+
+
+def _listdir(filesystem, path):
+    return sorted(filesystem.listdir(path))
+
+
+class _PathCacheMixin(object):
+    """
+        Gives a filesystem a PathCache, and keeps it up to date by invalidating every path that is
+        modified through the filesystem. Writes to an open file don't invalidate anything by themselves,
+        opening the file for writing does.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.path_cache = PathCache()
+        super(_PathCacheMixin, self).__init__(*args, **kwargs)
+
+    def cached(self, path, name, compute):
+        """ Returns compute(filesystem, path), computed only once until `path` is modified. """
+        _path = self.validatepath(unicode(path))
+        return self.path_cache.get(_path, name, lambda: compute(self, _path))
+
+    def cached_stat(self, path):
+        return self.cached(path, 'stat', _stat)
+
+    def cached_listdir(self, path):
+        """ Returns the sorted names in the directory `path`. """
+        return self.cached(path, 'listdir', _listdir)
+
+    def invalidate(self, path):
+        """ Must be called for every modification that doesn't go through the filesystem's own methods. """
+        self.path_cache.invalidate(self.validatepath(unicode(path)))
+
+    def makedir(self, path, permissions=None, recreate=False):
+        result = super(_PathCacheMixin, self).makedir(path, permissions, recreate)
+        self.invalidate(path)
+        return result
+
+    def open(self, path, mode='r', *args, **kwargs):
+        result = super(_PathCacheMixin, self).open(path, mode, *args, **kwargs)
+        if Mode(mode).writing:
+            self.invalidate(path)
+        return result
+
+    def openbin(self, path, mode='r', *args, **kwargs):
+        result = super(_PathCacheMixin, self).openbin(path, mode, *args, **kwargs)
+        if Mode(mode).writing:
+            self.invalidate(path)
+        return result
+
+    def remove(self, path):
+        super(_PathCacheMixin, self).remove(path)
+        self.invalidate(path)
+
+    def removedir(self, path):
+        super(_PathCacheMixin, self).removedir(path)
+        self.invalidate(path)
+
+    def setinfo(self, path, info):
+        super(_PathCacheMixin, self).setinfo(path, info)
+        self.invalidate(path)
+
+    def move(self, src_path, dst_path, overwrite=False):
+        # Might be an os.rename() behind the filesystem's back
+        super(_PathCacheMixin, self).move(src_path, dst_path, overwrite)
+        self.invalidate(src_path)
+        self.invalidate(dst_path)
+
+
+class SandboxedFS(_PathCacheMixin, OSFS):
 
     def __init__(self, *args, **kwargs):
         create_fs = kwargs.pop('create_fs') if 'create_fs' in kwargs else False
@@ -93,3 +208,294 @@ class SandboxedFS(OSFS):
         if not isinstance(path, unicode):
             path = unicode(path)
         return super(SandboxedFS, self).isdir(path)
+
+    def stat(self, path):
+        if not isinstance(path, unicode):
+            path = unicode(path)
+        return os.stat(self.getsyspath(path))
+
+
+class _TextPathsMixin(object):
+    """ Lets callers use byte string paths, which pyfilesystem refuses on Python 2. """
+
+    def validatepath(self, path):
+        if not isinstance(path, unicode):
+            path = unicode(path)
+        return super(_TextPathsMixin, self).validatepath(path)
+
+
+class _FileReferencesMixin(object):
+    """
+        Lets an in-memory filesystem hold files that are on disk anyway, like captured payloads, as
+        references instead of copies: link_file() leaves an empty placeholder, and reads of it go to
+        the file on disk. Writing to a reference makes it an ordinary (in-memory) file again.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._references = {}  # Path -> path of the file on disk
+        super(_FileReferencesMixin, self).__init__(*args, **kwargs)
+
+    def link_file(self, path, syspath):
+        """ Makes `path` a reference to `syspath`, a file on disk that must not change anymore. """
+        _path = self.validatepath(path)
+        with self._lock:
+            self.create(_path, wipe=True)
+            self._references[_path] = syspath
+
+    def get_reference(self, path):
+        """ The file on disk that `path` refers to, or None if it isn't a reference. """
+        return self._references.get(self.validatepath(path))
+
+    def getinfo(self, path, namespaces=None):
+        info = super(_FileReferencesMixin, self).getinfo(path, namespaces)
+        syspath = self._references.get(self.validatepath(path))
+        if syspath is None or 'details' not in info.raw:
+            return info
+        raw = dict(info.raw, details=dict(info.raw['details'], size=os.path.getsize(syspath)))
+        return Info(raw)
+
+    def openbin(self, path, mode='r', buffering=-1, **options):
+        _path = self.validatepath(path)
+        with self._lock:
+            syspath = self._references.get(_path)
+            if syspath is not None:
+                _mode = Mode(mode)
+                if not _mode.writing:
+                    return io.open(syspath, 'rb')
+                del self._references[_path]
+                if not _mode.truncate:
+                    with io.open(syspath, 'rb') as disk_file:
+                        self.setbinfile(_path, disk_file)
+            return super(_FileReferencesMixin, self).openbin(_path, mode, buffering, **options)
+
+    def remove(self, path):
+        super(_FileReferencesMixin, self).remove(path)
+        self._references.pop(self.validatepath(path), None)
+
+    def move(self, src_path, dst_path, overwrite=False):
+        _src_path = self.validatepath(src_path)
+        with self._lock:
+            syspath = self._references.get(_src_path)
+            if syspath is None:
+                return super(_FileReferencesMixin, self).move(_src_path, dst_path, overwrite)
+            # Moves the reference, rather than copying what it refers to
+            if not overwrite and self.exists(dst_path):
+                raise fs.errors.DestinationExists(dst_path)
+            self.link_file(dst_path, syspath)
+            self.remove(_src_path)
+
+
+class _UpperFS(_FileReferencesMixin, MemoryFS):
+    """ The in-memory upper layer of an OverlayFS. """
+
+
+class MemorySandboxedFS(_PathCacheMixin, _FileReferencesMixin, _TextPathsMixin, MemoryFS):
+    """
+        An alternative to SandboxedFS that lives entirely in memory. It is built from a snapshot
+        file (see load_snapshot) instead of a directory on disk, and stat results are synthesized
+        from the snapshot's modes and mtimes.
+    """
+
+    def __init__(self, snapshot_path=None):
+        super(MemorySandboxedFS, self).__init__()
+        self._modes = {}
+        for mode, mtime, path in load_snapshot(snapshot_path or DEFAULT_SNAPSHOT):
+            if stat.S_ISDIR(mode):
+                self.makedirs(path, recreate=True)
+            else:
+                self.makedirs(dirname(path), recreate=True)
+                self.create(path)
+            self._modes[path] = mode
+            self.setinfo(path, {'details': {'accessed': mtime, 'modified': mtime}})
+
+    def remove(self, path):
+        super(MemorySandboxedFS, self).remove(path)
+        self._modes.pop(self.validatepath(path), None)
+
+    def removedir(self, path):
+        super(MemorySandboxedFS, self).removedir(path)
+        self._modes.pop(self.validatepath(path), None)
+
+    def stat(self, path):
+        _path = self.validatepath(path)
+        info = self.getinfo(_path, namespaces=['details'])
+        details = info.raw['details']
+        nlink = None
+        if info.is_dir:
+            # Like on a real filesystem, each subdirectory links back through its '..'
+            nlink = 2 + sum(1 for entry in self.scandir(_path) if entry.is_dir)
+        return synthetic_stat(info.is_dir, details['size'], details['modified'], self._modes.get(_path), nlink)
+
+
+class OverlayFS(_PathCacheMixin, _TextPathsMixin, FS):
+    """
+        A copy-on-write view of another filesystem. Reads fall through to `base`, which is never
+        modified; anything written, created or removed only changes an in-memory upper layer.
+        Each session gets one of these, so sessions can't see or clobber each other's changes.
+
+        Cached values of paths the overlay hasn't modified come from the base's PathCache, which
+        is shared by all sessions of a host.
+    """
+
+    def __init__(self, base):
+        super(OverlayFS, self).__init__()
+        self.base = base
+        self.upper = _UpperFS()
+        self._whiteouts = set()  # Paths removed from the base, as seen by this overlay
+        self._modified = set()  # Paths whose stat or listing may differ from the base's
+        self._base_generation = base.path_cache.generation
+
+    def cached(self, path, name, compute):
+        _path = self.validatepath(path)
+        if _path not in self._modified and not self._hidden(_path):
+            return self.base.cached(_path, name, compute)
+        if self._base_generation != self.base.path_cache.generation:
+            # The values cached here might have been derived from the base, which changed since
+            self.path_cache.clear()
+            self._base_generation = self.base.path_cache.generation
+        return self.path_cache.get(_path, name, lambda: compute(self, _path))
+
+    def invalidate(self, path):
+        _path = self.validatepath(path)
+        self._modified.update(recursepath(_path))
+        self.path_cache.invalidate(_path)
+
+    def _hidden(self, path):
+        return any(p in self._whiteouts for p in recursepath(path))
+
+    def _in_base(self, path):
+        return not self._hidden(path) and self.base.exists(path)
+
+    def _copy_up_dir(self, path):
+        self.upper.makedirs(path, recreate=True)
+
+    def getinfo(self, path, namespaces=None):
+        _path = self.validatepath(path)
+        if self.upper.exists(_path):
+            return self.upper.getinfo(_path, namespaces)
+        if self._hidden(_path):
+            raise fs.errors.ResourceNotFound(path)
+        return self.base.getinfo(_path, namespaces)
+
+    def listdir(self, path='/'):
+        _path = self.validatepath(path)
+        if not self.getinfo(_path).is_dir:
+            raise fs.errors.DirectoryExpected(path)
+        names = set()
+        if self.upper.isdir(_path):
+            names.update(self.upper.listdir(_path))
+        if not self._hidden(_path) and self.base.isdir(_path):
+            names.update(name for name in self.base.listdir(_path) if join(_path, name) not in self._whiteouts)
+        return sorted(names)
+
+    def makedir(self, path, permissions=None, recreate=False):
+        _path = self.validatepath(path)
+        with self._lock:
+            if self.exists(_path):
+                if not recreate:
+                    raise fs.errors.DirectoryExists(path)
+                return self.opendir(_path)
+            if not self.isdir(dirname(_path)):
+                raise fs.errors.ResourceNotFound(path)
+            self._copy_up_dir(dirname(_path))
+            self._whiteouts.discard(_path)
+            self.upper.makedir(_path)
+            self.invalidate(_path)
+            return self.opendir(_path)
+
+    def openbin(self, path, mode='r', buffering=-1, **options):
+        _path = self.validatepath(path)
+        _mode = Mode(mode)
+        _mode.validate_bin()
+        with self._lock:
+            if not _mode.writing:
+                if self.upper.exists(_path):
+                    return self.upper.openbin(_path, mode, buffering, **options)
+                if self._hidden(_path):
+                    raise fs.errors.ResourceNotFound(path)
+                return self.base.openbin(_path, mode, buffering, **options)
+
+            if self.isdir(_path):
+                raise fs.errors.FileExpected(path)
+            if not self.isdir(dirname(_path)):
+                raise fs.errors.ResourceNotFound(path)
+            if _mode.exclusive and self.exists(_path):
+                raise fs.errors.FileExists(path)
+            self._copy_up_dir(dirname(_path))
+            if not _mode.truncate and not self.upper.exists(_path) and self._in_base(_path):
+                self.upper.setbytes(_path, self.base.getbytes(_path))
+            self._whiteouts.discard(_path)
+            result = self.upper.openbin(_path, mode, buffering, **options)
+            self.invalidate(_path)
+            return result
+
+    def link_file(self, path, syspath):
+        """ Makes `path` a reference to `syspath`, a file on disk, see _FileReferencesMixin. """
+        _path = self.validatepath(path)
+        with self._lock:
+            if self.isdir(_path):
+                raise fs.errors.FileExpected(path)
+            if not self.isdir(dirname(_path)):
+                raise fs.errors.ResourceNotFound(path)
+            self._copy_up_dir(dirname(_path))
+            self._whiteouts.discard(_path)
+            self.upper.link_file(_path, syspath)
+            self.invalidate(_path)
+
+    def move(self, src_path, dst_path, overwrite=False):
+        _src_path = self.validatepath(src_path)
+        with self._lock:
+            syspath = self.upper.get_reference(_src_path) if self.upper.exists(_src_path) else None
+            if syspath is None:
+                return super(OverlayFS, self).move(_src_path, dst_path, overwrite)
+            if not overwrite and self.exists(dst_path):
+                raise fs.errors.DestinationExists(dst_path)
+            self.link_file(dst_path, syspath)
+            self.remove(_src_path)
+
+    def remove(self, path):
+        _path = self.validatepath(path)
+        with self._lock:
+            if self.getinfo(_path).is_dir:
+                raise fs.errors.FileExpected(path)
+            if self.upper.exists(_path):
+                self.upper.remove(_path)
+            if self.base.exists(_path):
+                self._whiteouts.add(_path)
+            self.invalidate(_path)
+
+    def removedir(self, path):
+        _path = self.validatepath(path)
+        with self._lock:
+            if _path == '/':
+                raise fs.errors.RemoveRootError(path)
+            if not self.getinfo(_path).is_dir:
+                raise fs.errors.DirectoryExpected(path)
+            if self.listdir(_path):
+                raise fs.errors.DirectoryNotEmpty(path)
+            if self.upper.exists(_path):
+                self.upper.removedir(_path)
+            if self.base.exists(_path):
+                self._whiteouts.add(_path)
+            self.invalidate(_path)
+
+    def setinfo(self, path, info):
+        _path = self.validatepath(path)
+        with self._lock:
+            if self.getinfo(_path).is_dir:
+                self._copy_up_dir(_path)
+            elif not self.upper.exists(_path):
+                self._copy_up_dir(dirname(_path))
+                self.upper.setbytes(_path, self.base.getbytes(_path))
+            self.upper.setinfo(_path, info)
+            self.invalidate(_path)
+
+    def stat(self, path):
+        _path = self.validatepath(path)
+        if self.upper.isfile(_path) or (self.upper.isdir(_path) and not self._in_base(_path)):
+            details = self.upper.getinfo(_path, namespaces=['details']).raw['details']
+            return synthetic_stat(self.upper.isdir(_path), details['size'], details['modified'])
+        if self._hidden(_path):
+            raise fs.errors.ResourceNotFound(path)
+        # Directories that were only copied up to hold new entries keep the base's metadata
+        return self.base.stat(_path)
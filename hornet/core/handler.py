@@ -18,39 +18,64 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-import os
 
-from paramiko import SSHException
+from paramiko import SSHException, Transport
 from telnetsrv.paramiko_ssh import SSHHandler
 
 from hornet.core.session import Session
 from hornet.core.shell import Shell
-from hornet.common.helpers import get_rsa_key_file
 
 logger = logging.getLogger(__name__)
 
+# _Transport hooks into these private parts of paramiko (as of 2.4), fail loudly if they are gone
+if not (hasattr(Transport, '_modulus_pack') and hasattr(Transport, '_get_modulus_pack')):  # pragma: no cover
+    raise ImportError('paramiko.Transport has no _modulus_pack/_get_modulus_pack, group exchange would not '
+                      'use the configured moduli')
+
+
+class _Transport(Transport):
+    """
+        Does group exchange with the moduli it is given, parsed once by the HostKeyStore, instead of
+        Transport.load_server_moduli() reading the file again for every connection (and replacing it
+        for all of them). paramiko 2.4 reads `_modulus_pack` to decide whether to offer group exchange,
+        and calls `_get_modulus_pack()` during the exchange.
+    """
+
+    def __init__(self, sock, moduli):
+        self.moduli = moduli
+        super(_Transport, self).__init__(sock)
+
+    @property
+    def _modulus_pack(self):
+        return self.moduli
+
+    def _get_modulus_pack(self):
+        return self.moduli
+
 
 class SSHWrapper(object):
 
     """ Helper class to pass the client socket to _SSHHandler """
 
-    def __init__(self, vhosts, session_q, config, working_directory, db_handler):
+    def __init__(self, vhosts, session_q, config, working_directory, db_handler, host_keys, reaper):
         self.vhosts = vhosts
         self.session_q = session_q
+        self.reaper = reaper
         self.config = config
         self.db_handler = db_handler
         self.working_directory = working_directory
+        self.host_keys = host_keys
+        # Logins always go to the default host
+        self.default_host = vhosts[config.default_hostname]
 
     def handle_session(self, client_socket, client_address):
         current_session = Session(client_address, self.session_q)
+        self.reaper.add(current_session)
         logger.info('Connection from %s, %s', client_address, client_socket)
 
-        # Set the host_key attribute on our _SSHHandler class
-        key_file_path = os.path.join(self.working_directory, self.config.key_file)
-        _SSHHandler.host_key = get_rsa_key_file(key_file_path)
-
         try:
-            _SSHHandler(current_session, client_socket, client_address, self.vhosts, self.config, self.db_handler)
+            _SSHHandler(current_session, client_socket, client_address, self.vhosts, self.default_host, self.config,
+                        self.db_handler, self.host_keys.keys, self.host_keys.moduli)
         except (SSHException, EOFError):
             logging.error('SSH Session %s ended unexpectedly', current_session.id)
 
@@ -59,11 +84,15 @@ class _SSHHandler(SSHHandler):
 
     telnet_handler = Shell
 
-    def __init__(self, session, socket, client_address, vhosts, config, db_handler):
+    def __init__(self, session, socket, client_address, vhosts, default_host, config, db_handler, host_keys,
+                 moduli=None):
         self.session = session
         self.vhosts = vhosts
+        self.default_host = default_host
         self.config = config
         self.db_handler = db_handler
+        self.host_keys = host_keys
+        self.moduli = moduli
         request = _SSHHandler.dummy_request()
         request._sock = socket
         super(_SSHHandler, self).__init__(request, client_address, None)
@@ -72,19 +101,21 @@ class _SSHHandler(SSHHandler):
         raise Exception()  # Disable username based logins.
 
     def authCallback(self, username, password):
-        default = None
-        for hostname, host in self.vhosts.iteritems():
-            if host.default:
-                default = host
-        if default.authenticate(username, password):
+        success = self.default_host.authenticate(username, password)
+        self.db_handler.create_auth_attempt(self.session, username, password, self.transport.remote_version, success)
+        if success:
+            self.session.authenticated = True
             return True
         else:
             raise Exception('Bad username/password')
 
     def setup(self):
 
-        self.transport.load_server_moduli()
-        self.transport.add_server_key(self.host_key)
+        # Replaces the Transport SSHHandler made, which isn't started yet
+        self.transport = _Transport(self.client, self.moduli)
+        self.session.connection = self.transport
+        for key in self.host_keys:
+            self.transport.add_server_key(key)
         self.transport.start_server(server=self)
 
         while True:  # pragma: no cover
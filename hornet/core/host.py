@@ -17,55 +17,46 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import argparse
 import logging
 import os
-import hornet
+
+import gevent
 
 from fs.errors import IllegalBackReference
-from hornet.common.helpers import get_random_item
+from hornet.core.commands.assets import COMMAND_ASSETS
 from hornet.core.commands.ifconfig_command import IfconfigCommand
 from hornet.core.commands.ls_command import LsCommand
+from hornet.core.commands.parsers import ParseError, parse
 from hornet.core.commands.ping_command import PingCommand
 from hornet.core.commands.wget_command import WgetCommand
-from hornet.core.fs_wrapper import SandboxedFS
+from hornet.core.downloads import DownloadScheduler
+from hornet.core.fs_wrapper import SandboxedFS, MemorySandboxedFS, OverlayFS
 
 logger = logging.getLogger(__name__)
 
 
-class Parser(argparse.ArgumentParser):
-    def error(self, message):
-        logger.info('User supplied wrong arguments: %s', message)
-        raise ParseError()
-
-
-class ParseError(Exception):
-    pass
-
-
 class VirtualHost(object):
     """ Represents a single host. This class implements the commands
         that are host-specific, like pwd, ls, etc.
     """
 
-    def __init__(self, params, network, fs_dir, create_fs=False):
+    def __init__(self, params, network, fs_dir, create_fs=False, downloads=None):
         self.hostname = params['hostname']
         self.ip_address = params['ip_address']
         self.network = network
         self.env = params['env']
 
-        valid_ips = map(str, network[1:-1])
         if self.ip_address is None:
             logger.error('IP address for %s is not specified in the config file (or is "null")', self.hostname)
-            if not self._set_ip_from_previous_run(fs_dir, valid_ips):
-                self.ip_address = get_random_item(valid_ips)
+            if not self._set_ip_from_previous_run(fs_dir):
+                self.ip_address = network.random_host()
                 logger.info('Assigned random IP %s to host %s', self.ip_address, self.hostname)
         else:
-            if not self.ip_address in valid_ips:
+            if not network.is_valid_host(self.ip_address):
                 logger.error('IP Address %s for %s is not valid for the specified network', params['ip_address'],
                              self.hostname)
-                if not self._set_ip_from_previous_run(fs_dir, valid_ips):
-                    self.ip_address = get_random_item(valid_ips)
+                if not self._set_ip_from_previous_run(fs_dir):
+                    self.ip_address = network.random_host()
                     logger.info('Assigned random IP %s to host %s', self.ip_address, self.hostname)
 
         self.valid_logins = params['valid_logins']
@@ -75,15 +66,24 @@ class VirtualHost(object):
             self.default = True
         else:
             self.default = False
-        self.filesystem = SandboxedFS(os.path.join(fs_dir, '{}_{}'.format(self.hostname, self.ip_address)),
-                                      create_fs=create_fs, create=True)
+        if params.get('filesystem', 'os') == 'memory':
+            self.filesystem = MemorySandboxedFS(params.get('fs_snapshot'))
+        else:
+            self.filesystem = SandboxedFS(os.path.join(fs_dir, '{}_{}'.format(self.hostname, self.ip_address)),
+                                          create_fs=create_fs, create=True)
         self.working_path = '/'
+        self.ifconfig_command = IfconfigCommand(network)
+        # Normally the process-wide scheduler, shared by all hosts
+        self.downloads = downloads if downloads is not None else DownloadScheduler()
+
+    def create_session(self, filesystem=None):
+        """ Returns a view of this host for a single session, see VirtualHostSession. """
+        return VirtualHostSession(self, filesystem)
 
     def authenticate(self, username, password):
-        logging.info('Login attempt: %s@%s - %s', username, self.hostname, password)
-        if self.valid_logins.get(username, None) == password or self.valid_logins.get(username, None) == '*':
-            return True
-        return False
+        logger.debug('Login attempt: %s@%s - %s', username, self.hostname, password)
+        valid_password = self.valid_logins.get(username)
+        return valid_password is not None and (valid_password == password or valid_password == '*')
 
     def login(self, username):
         logger.debug('User "%s" has logged into "%s" host', username, self.hostname)
@@ -128,50 +128,50 @@ class VirtualHost(object):
             shell.writeline('{}'.format(self.working_path))
 
     def run_wget(self, params, shell):
-        parser = Parser(add_help=False)
-        parser.add_argument('-h', '--help', action='store_true', default=False)
-        parser.add_argument('-V', '--version', action='store_true', default=False)
-        parser.add_argument('-O', '--output-document')
-        args, unparsed = parser.parse_known_args(params)
+        args, unparsed = parse('wget', params)
 
         if unparsed:
             url = unparsed[0]
         elif not args.help and not args.version:
-            noparam_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                             'commands', 'wget', 'no_param')
-            self.send_data_from_file(noparam_file_path, shell)
+            self.send_asset('wget/no_param', shell)
             return
 
         if args.help:
-            help_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                          'commands', 'wget', 'help')
-            self.send_data_from_file(help_file_path, shell)
+            self.send_asset('wget/help', shell)
             return
 
         if args.version:
-            version_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                             'commands', 'wget', 'version')
-            self.send_data_from_file(version_file_path, shell)
+            self.send_asset('wget/version', shell)
             return
 
-        wget_command = WgetCommand(url, self.working_path, self.filesystem, args, shell)
+        wget_command = WgetCommand(url, self.working_path, self.filesystem, args, shell, self.downloads)
         wget_command.process()
 
     def run_ping(self, params, shell):
+        try:
+            args, unparsed = parse('ping', params)
+        except ParseError:
+            self.send_asset('ping/help', shell)
+            return
 
-        options = [x for x in params if x.startswith('-')]
+        filtered_params = [p for p in unparsed if not p.startswith('-')]
 
-        if '-h' in options or len(params) == 0:
-            help_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                          'commands', 'ping', 'help')
-            self.send_data_from_file(help_file_path, shell)
+        if args.h or not filtered_params:
+            self.send_asset('ping/help', shell)
+            return
+        if args.count is not None and args.count <= 0:
+            shell.writeline('ping: bad number of packets to transmit.')
+            return
+        if args.interval < PingCommand.MIN_INTERVAL:
+            shell.writeline('ping: cannot flood; minimal interval allowed for user is 200ms')
+            return
+        if args.deadline is not None and args.deadline < 0:
+            shell.writeline('ping: bad wait time.')
             return
-
-        filtered_params = [p for p in params if not p.startswith('-')]
 
         ping_host = filtered_params[-1]
         logger.debug('Going to ping %s', ping_host)
-        ping_command = PingCommand(ping_host, shell)
+        ping_command = PingCommand(ping_host, shell, count=args.count, interval=args.interval, deadline=args.deadline)
         ping_command.process()
 
     def run_ifconfig(self, params, shell):
@@ -181,22 +181,12 @@ class VirtualHost(object):
         if params:
             parameter = params[0]
             if parameter == '--version':
-                version_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                                 'commands', 'ifconfig', 'version')
-                self.send_data_from_file(version_file_path, shell)
-                logger.debug('Sending version string for ifconfig from %s file', version_file_path)
+                self.send_asset('ifconfig/version', shell)
                 return
             elif parameter == '--help' or parameter == '-h':
-                help_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                              'commands', 'ifconfig', 'help')
-                self.send_data_from_file(help_file_path, shell)
-                logger.debug('Sending version string for ifconfig from %s file', help_file_path)
+                self.send_asset('ifconfig/help', shell)
                 return
-        output_template_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                            'commands', 'ifconfig', 'output_template')
-        ifconfig_command = IfconfigCommand(params, output_template_path, self.ip_address, self.network)
-        output = ifconfig_command.process()
-        shell.writeline(output)
+        shell.writeline(self.ifconfig_command.process(params, self.ip_address))
 
     def run_ls(self, params, shell):
         paths = []
@@ -210,87 +200,25 @@ class VirtualHost(object):
         if not paths:  # List contents of working dir by default
             paths.append(self.working_path)
 
-        parser = Parser(add_help=False)
-        parser.add_argument('-a', '--all', action='store_true', default=False)
-        parser.add_argument('-A', '--almost-all', action='store_true', default=False)
-        parser.add_argument('-d', '--directory', action='store_true', default=False)
-        parser.add_argument('-l', action='store_true', default=False)
-
-        # We ignore these (for now), but still parse them ;-)
-        parser.add_argument('-h', '--human-readable', action='store_true', default=False)
-        parser.add_argument('-b', '--escape', action='store_true', default=False)
-        parser.add_argument('--block-size')
-        parser.add_argument('-B', '--ignore-backups', action='store_true', default=False)
-        parser.add_argument('-c', action='store_true', default=False)
-        parser.add_argument('-C', action='store_true', default=False)
-        parser.add_argument('--color')
-        parser.add_argument('-D', '--dired', action='store_true', default=False)
-        parser.add_argument('-f', action='store_true', default=False)
-        parser.add_argument('-F', '--classify', action='store_true', default=False)
-        parser.add_argument('--file-type', action='store_true', default=False)
-        parser.add_argument('--format')
-        parser.add_argument('--full-time', action='store_true', default=False)
-        parser.add_argument('-g', action='store_true', default=False)
-        parser.add_argument('--group-directories-first', action='store_true', default=False)
-        parser.add_argument('-G', '--no-group', action='store_true', default=False)
-        parser.add_argument('-H', '--dereference-command-line', action='store_true', default=False)
-        parser.add_argument('--dereference-command-line-symlink-to-dir', action='store_true', default=False)
-        parser.add_argument('--hide')
-        parser.add_argument('--indicator-style')
-        parser.add_argument('-i', '--inode', action='store_true', default=False)
-        parser.add_argument('-I', '--ignore')
-        parser.add_argument('-k', '--kibibytes', action='store_true', default=False)
-        parser.add_argument('-L', '--deference', action='store_true', default=False)
-        parser.add_argument('-m', action='store_true', default=False)
-        parser.add_argument('-n', '--numeric-uid-gid', action='store_true', default=False)
-        parser.add_argument('-N', '--literal', action='store_true', default=False)
-        parser.add_argument('-o', action='store_true', default=False)
-        parser.add_argument('-p', action='store_true', default=False)
-        parser.add_argument('-q', '--hide-control-chars', action='store_true', default=False)
-        parser.add_argument('--show-control-chars', action='store_true', default=False)
-        parser.add_argument('-Q', '--quote-name', action='store_true', default=False)
-        parser.add_argument('--quoting-style')
-        parser.add_argument('-r', '--reverse', action='store_true', default=False)
-        parser.add_argument('-R', '--recursive', action='store_true', default=False)
-        parser.add_argument('-s', '--size', action='store_true', default=False)
-        parser.add_argument('-S', action='store_true', default=False)
-        parser.add_argument('--sort')
-        parser.add_argument('--time')
-        parser.add_argument('--time-style')
-        parser.add_argument('-t', action='store_true', default=False)
-        parser.add_argument('-T', '--tabsize', default=False)
-        parser.add_argument('-u', action='store_true', default=False)
-        parser.add_argument('-U', action='store_true', default=False)
-        parser.add_argument('-v', action='store_true', default=False)
-        parser.add_argument('-w', '--width')
-        parser.add_argument('-x', action='store_true', default=False)
-        parser.add_argument('-X', action='store_true', default=False)
-        parser.add_argument('-1', dest='one_per_line', action='store_true', default=False)
-        parser.add_argument('--help', action='store_true', default=False)
-        parser.add_argument('--version', action='store_true', default=False)
-
         try:
-            args = parser.parse_args(other_params)
+            args = parse('ls', other_params)
         except ParseError:
             shell.writeline('ls: invalid options: \"{}\"'.format(' '.join(params)))
             shell.writeline('Try \'ls --help\' for more information.')
             return
 
         if args.help:
-            help_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                          'commands', 'ls', 'help')
-            logger.debug('Sending help string from file %s', help_file_path)
-            self.send_data_from_file(help_file_path, shell)
+            self.send_asset('ls/help', shell)
             return
 
         if args.version:
-            version_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                             'commands', 'ls', 'version')
-            logger.debug('Sending version string from file %s', version_file_path)
-            self.send_data_from_file(version_file_path, shell)
+            self.send_asset('ls/version', shell)
             return
 
         ls_cmd = LsCommand(args, paths, self.filesystem, self.working_path)
+        if args.recursive and not args.directory:
+            self._stream_listing(ls_cmd, shell)
+            return
         output = ls_cmd.process()
         shell.writeline(output)
 
@@ -322,21 +250,8 @@ class VirtualHost(object):
         info = ['Linux', self.hostname, '3.13.0-37-generic',
                 '#64-Ubuntu SMP Mon Sep 22 21:30:01 UTC 2014', 'i686',
                 'i686', 'i686', 'GNU/Linux']
-        parser = Parser(add_help=False)
-        parser.add_argument('-a', '--all', default=False, action='store_true')
-        parser.add_argument('-s', '--kernel-name', default=False, action='store_true')
-        parser.add_argument('-n', '--nodename', default=False, action='store_true')
-        parser.add_argument('-r', '--kernel-release', default=False, action='store_true')
-        parser.add_argument('-v', '--kernel-version', default=False, action='store_true')
-        parser.add_argument('-m', '--kernel-machine', default=False, action='store_true')
-        parser.add_argument('-p', '--processor', default=False, action='store_true')
-        parser.add_argument('-i', '--hardware-platform', default=False, action='store_true')
-        parser.add_argument('-o', '--operating-system', default=False, action='store_true')
-        parser.add_argument('--help', default=False, action='store_true')
-        parser.add_argument('--version', default=False, action='store_true')
-
         try:
-            args = parser.parse_args(params)
+            args = parse('uname', params)
         except ParseError:
             shell.writeline('uname: invalid options -- \'{}\''.format(' '.join(params)))
             shell.writeline('Try \'uname --help\' for more information.')
@@ -347,14 +262,10 @@ class VirtualHost(object):
             shell.writeline(buff)
             return
         if args.help:
-            help_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                          'commands', 'uname', 'help')
-            self.send_data_from_file(help_file_path, shell)
+            self.send_asset('uname/help', shell)
             return
         if args.version:
-            version_file_path = os.path.join(os.path.dirname(hornet.__file__), 'data',
-                                             'commands', 'uname', 'version')
-            self.send_data_from_file(version_file_path, shell)
+            self.send_asset('uname/version', shell)
             return
         if args.kernel_name:
             buff = buff + info[0] + ' '
@@ -375,19 +286,60 @@ class VirtualHost(object):
 
         shell.writeline(buff)
 
-    def _set_ip_from_previous_run(self, fs_dir, valid_ips):  # pragma: no cover
+    def _set_ip_from_previous_run(self, fs_dir):  # pragma: no cover
         for dir_name in os.listdir(fs_dir):
             if dir_name.startswith(self.hostname + '_'):
                 possible_ip = dir_name.split('_')[1]
-                if possible_ip in valid_ips:
+                if self.network.is_valid_host(possible_ip):
                     self.ip_address = possible_ip
                     logger.info('Assigned IP %s to host %s', self.ip_address, self.hostname)
                     return True
         return False
 
     @staticmethod
-    def send_data_from_file(path, shell):
-        with open(path, 'r') as infile:
-            for line in infile:
-                line = line.strip()
-                shell.writeline(line)
+    def _stream_listing(ls_cmd, shell):
+        """ Sends a recursive listing as it is made, until it ends, is interrupted or gets too long. """
+        budget = shell.config.max_recursive_listing_output  # Bytes this listing may still produce
+        truncated = False
+        for chunk in ls_cmd.iter_recursive():
+            if shell.interrupt:
+                break
+            if len(chunk) > budget:
+                logger.info('Recursive listing stopped, it reached the limit of %s bytes',
+                            shell.config.max_recursive_listing_output)
+                truncated = True
+                break
+            budget -= len(chunk)
+            shell.write(chunk)
+            # A listing of a large tree shouldn't keep the other sessions waiting
+            gevent.sleep(0)
+        shell.writeline('')
+        if truncated:
+            # What ls reports when the terminal goes away in the middle of its output
+            shell.writeline('ls: write error: Input/output error')
+
+    @staticmethod
+    def send_asset(name, shell):
+        logger.debug('Sending command asset %s', name)
+        shell.writecooked(COMMAND_ASSETS.get(name))
+
+
+class VirtualHostSession(VirtualHost):
+    """
+        A single session's view of a VirtualHost. The working directory, the logged in user and
+        any filesystem changes belong to the view, everything else is read from the shared host.
+    """
+
+    def __init__(self, host, filesystem=None):
+        self.host = host
+        self.filesystem = OverlayFS(host.filesystem) if filesystem is None else filesystem
+        self.working_path = '/'
+        self.logged_in = False
+        self.current_user = None
+
+    def __getattr__(self, name):
+        # Only called for attributes the view doesn't have itself (hostname, ip_address, env, ...)
+        return getattr(self.host, name)
+
+    def create_session(self, filesystem=None):
+        return self.host.create_session(filesystem)
@@ -0,0 +1,116 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import logging
+
+from fs.path import dirname, recursepath
+
+from hornet.common.clock import CLOCK
+
+logger = logging.getLogger(__name__)
+
+
+class PathCache(object):
+    """
+        Values derived from the paths of a filesystem (stat results, directory listings, the lines
+        ls prints for them), kept until the filesystem modifies the path and calls `invalidate`.
+        Only the `max_entries` most recently used paths are kept, and none for longer than `max_age`
+        seconds, because other processes (the other workers) can modify a filesystem on disk too.
+        `generation` changes whenever anything is invalidated.
+    """
+
+    def __init__(self, max_entries=10000, max_age=60):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.generation = 0
+        # Least recently used first, path -> (time cached, {name: value})
+        self._entries = collections.OrderedDict()
+        # Directory -> its cached paths, and its paths with cached descendants, so that
+        # invalidating a subtree only visits the paths cached in it
+        self._children = {}
+
+    def get(self, path, name, compute):
+        """ Returns the value `name` of `path`, calling `compute()` for it if it isn't cached. """
+        now = CLOCK.monotonic()
+        entry = self._entries.pop(path, None)
+        if entry is not None and now - entry[0] <= self.max_age:
+            self._entries[path] = entry
+            try:
+                return entry[1][name]
+            except KeyError:
+                pass
+        # Computing the value can cache other paths, e.g. the entries of a directory, which must not evict this one
+        value = compute()
+        entry = self._entries.pop(path, None)
+        if entry is None or now - entry[0] > self.max_age:
+            entry = (now, {})
+            while len(self._entries) >= self.max_entries:
+                self._unlink(self._entries.popitem(last=False)[0])
+            self._link(path)
+        entry[1][name] = value
+        self._entries[path] = entry
+        return value
+
+    def _link(self, path):
+        """ Indexes `path` under its directory, and the directories above that aren't indexed yet. """
+        while path != '/':
+            parent = dirname(path)
+            children = self._children.get(parent)
+            if children is not None:
+                children.add(path)
+                return
+            self._children[parent] = set([path])
+            path = parent
+
+    def _unlink(self, path):
+        """ Removes `path` from the index, and the directories above it that are left with nothing cached. """
+        while path != '/' and path not in self._entries and path not in self._children:
+            parent = dirname(path)
+            children = self._children.get(parent)
+            if children is None:  # Nothing was cached for it
+                return
+            children.discard(path)
+            if children:
+                return
+            del self._children[parent]
+            path = parent
+
+    def invalidate(self, path):
+        """
+            Forgets `path`, everything below it, and the directories above it: a directory's stat
+            changes with its entries, and the values of a directory can include its entries' stat.
+        """
+        self.generation += 1
+        pending = [path]
+        while pending:
+            for cached_path in self._children.pop(pending.pop(), ()):
+                self._entries.pop(cached_path, None)
+                pending.append(cached_path)
+        for cached_path in reversed(recursepath(path)):
+            self._entries.pop(cached_path, None)
+            self._unlink(cached_path)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._children.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,120 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import errno
+import fcntl
+import json
+import logging
+import os
+import shutil
+
+from fs.errors import NoSysPath
+
+from hornet.common.clock import CLOCK
+from hornet.common.helpers import write_atomically
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadStore(object):
+    """
+        Keeps every captured payload once, named by its SHA-256 hash, under `directory`:
+        <directory>/ab/abcdef... holds the data, and abcdef....json next to it the metadata
+        (size, first and last time seen, how often, and from which URLs). The hashes already
+        in the store are kept in memory, so storing a known payload only updates its metadata.
+        Worker processes share the store, each only knows about the hashes it has seen itself.
+    """
+
+    MAX_URLS = 100
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            logger.info('Creating directory {} for captured payloads'.format(directory))
+            os.makedirs(directory)
+        self.known_hashes = set()
+        for dir_path, _, file_names in os.walk(directory):
+            self.known_hashes.update(name[:-len('.json')] for name in file_names if name.endswith('.json'))
+        logger.debug('%s payloads in %s', len(self.known_hashes), directory)
+
+    def path(self, sha256):
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def __contains__(self, sha256):
+        return sha256 in self.known_hashes
+
+    def add(self, sha256, source, size, url):
+        """
+            Records one capture of the payload with hash `sha256`. `source` is a file object with
+            the payload, it is only read if the payload isn't in the store yet.
+        """
+        path = self.path(sha256)
+        if sha256 not in self.known_hashes and not os.path.exists(path):
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            source.seek(0)
+            write_atomically(path, lambda payload_file: shutil.copyfileobj(source, payload_file))
+            logger.info('Stored new payload %s (%s bytes) from %s', sha256, size, url)
+
+        # Another worker can be recording a capture of the same payload, the lock on the payload
+        # keeps the two from overwriting each other's changes to the metadata
+        with open(path, 'rb') as payload_file:
+            fcntl.flock(payload_file.fileno(), fcntl.LOCK_EX)
+            if os.path.exists(path + '.json'):
+                metadata = self.get_metadata(sha256)
+            else:
+                metadata = {'sha256': sha256, 'size': size, 'first_seen': CLOCK.timestamp(), 'count': 0, 'urls': []}
+            metadata['count'] += 1
+            metadata['last_seen'] = CLOCK.timestamp()
+            if url not in metadata['urls'] and len(metadata['urls']) < self.MAX_URLS:
+                metadata['urls'].append(url)
+            write_atomically(path + '.json', lambda metadata_file: json.dump(metadata, metadata_file))
+        self.known_hashes.add(sha256)
+        return metadata
+
+    def get_metadata(self, sha256):
+        with open(self.path(sha256) + '.json') as metadata_file:
+            return json.load(metadata_file)
+
+    def link(self, sha256, filesystem, path):
+        """
+            Makes `path` on `filesystem` a copy of the stored payload: a hard link where the filesystem
+            is on disk (and on the same device), a reference to the stored file on in-memory filesystems
+            that support them, a real copy otherwise.
+        """
+        try:
+            syspath = filesystem.getsyspath(path)
+        except NoSysPath:
+            syspath = None
+        if syspath is not None:
+            try:
+                if os.path.lexists(syspath):
+                    # Never write through an existing link, that would change the stored payload
+                    os.remove(syspath)
+                os.link(self.path(sha256), syspath)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM):
+                    raise
+        elif hasattr(filesystem, 'link_file'):
+            # Payloads can be large, keeping them in memory once per session adds up
+            filesystem.link_file(path, self.path(sha256))
+            return
+        with open(self.path(sha256), 'rb') as payload_file:
+            filesystem.setbinfile(path, payload_file)
@@ -0,0 +1,176 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import logging
+import signal
+import socket
+import sys
+
+import gevent
+import gevent.subprocess
+import gevent.queue
+
+logger = logging.getLogger(__name__)
+
+# Python 2 doesn't export this constant, the value is the same on every Linux architecture.
+SO_REUSEPORT = getattr(socket, 'SO_REUSEPORT', 15)
+
+
+def create_reuseport_socket(host, port):
+    """ Creates a TCP socket bound to (host, port) that can share the port with other processes. """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    return sock
+
+
+class _Record(object):
+    """ Stands in for the Session object a worker process reported on. """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _Worker(object):
+
+    def __init__(self, index, process, channel):
+        self.index = index
+        self.process = process
+        self.channel = channel
+        self.reader_greenlet = None
+
+
+class WorkerSupervisor(object):
+    """
+        Runs the SSH server in `config.workers` separate processes, each with its own gevent hub,
+        all accepting on the same port through SO_REUSEPORT. Dead workers are restarted.
+
+        Workers don't talk to the database. Everything they would persist is sent over a socket
+        pair to this process, where it goes through the single DatabaseHandler and SessionConsumer.
+    """
+
+    def __init__(self, config, working_directory, vhost_ips, db_handler, session_q, check_interval=1):
+        self.config = config
+        self.working_directory = working_directory
+        self.vhost_ips = vhost_ips
+        self.db_handler = db_handler
+        self.session_q = session_q
+        self.check_interval = check_interval
+        self.workers = {}
+        self.server_host = config.host
+        self.server_port = None
+        self.run_greenlet = None
+        self._reserved_socket = None
+
+    def start(self):
+        # Bind (without listening) first, so that port 0 resolves to one port that all workers share.
+        self._reserved_socket = create_reuseport_socket(self.config.host, self.config.port)
+        self.server_port = self._reserved_socket.getsockname()[1]
+        for index in range(self.config.workers):
+            self._spawn_worker(index)
+        logger.info('SSH server listening on {}:{} with {} worker processes'.format(
+            self.server_host, self.server_port, self.config.workers))
+        self.run_greenlet = gevent.spawn(self._supervise)
+        return self.run_greenlet
+
+    def stop(self):
+        if self.run_greenlet is not None:
+            self.run_greenlet.kill()
+        for worker in self.workers.values():
+            self._stop_worker(worker)
+        self.workers = {}
+        self._reserved_socket.close()
+
+    def reload(self):
+        for worker in self.workers.values():
+            worker.process.send_signal(signal.SIGHUP)
+
+    def _spawn_worker(self, index):
+        parent_end, child_end = socket.socketpair()
+        args = [
+            sys.executable, '-m', 'hornet.core.worker',
+            '--index', str(index),
+            '--channel-fd', str(child_end.fileno()),
+            '--port', str(self.server_port),
+            '--vhost-ips', json.dumps(self.vhost_ips),
+            '--log-level', str(self._get_log_level()),
+            self.working_directory
+        ]
+        process = gevent.subprocess.Popen(args, close_fds=False)
+        child_end.close()
+        worker = _Worker(index, process, parent_end)
+        worker.reader_greenlet = gevent.spawn(self._read_channel, worker)
+        self.workers[index] = worker
+        logger.info('Started worker %s (pid %s)', index, process.pid)
+
+    @staticmethod
+    def _get_log_level():
+        # Workers log to the same stream, at whatever level our own output is shown
+        root_logger = logging.getLogger()
+        if root_logger.handlers:
+            return min(handler.level for handler in root_logger.handlers) or root_logger.getEffectiveLevel()
+        return root_logger.getEffectiveLevel()
+
+    def _stop_worker(self, worker):
+        if worker.process.poll() is None:
+            worker.process.terminate()
+            worker.process.wait()
+        # The worker flushes its channel before exiting, let the reader pick up the remainder.
+        worker.reader_greenlet.join(timeout=5)
+        worker.reader_greenlet.kill()
+        worker.channel.close()
+
+    def _supervise(self):
+        while True:
+            gevent.sleep(self.check_interval)
+            for index, worker in self.workers.items():
+                returncode = worker.process.poll()
+                if returncode is not None:
+                    logger.error('Worker %s (pid %s) died with exit code %s, restarting it',
+                                 index, worker.process.pid, returncode)
+                    self._stop_worker(worker)
+                    self._spawn_worker(index)
+
+    def _read_channel(self, worker):
+        reader = worker.channel.makefile('r')
+        for line in reader:
+            try:
+                self._handle_message(json.loads(line))
+            except Exception:
+                logger.exception('Could not handle message from worker %s: %s', worker.index, line)
+
+    def _handle_message(self, message):
+        kind = message.pop('type')
+        if kind == 'session_start':
+            # Only this worker's reader waits for the insert (on the database thread), which keeps the
+            # session ahead of the worker's later messages about it
+            self.db_handler.create_attack_session(_Record(**message))
+        elif kind == 'command':
+            self.db_handler.create_attack_command(message['session_id'], message['command'], message['hostname'])
+        elif kind == 'session_end':
+            try:
+                self.session_q.put_nowait(_Record(**message))
+            except gevent.queue.Full:
+                logger.warning('Session queue is full, the end of session %s is not recorded', message['id'])
+        elif kind == 'auth_attempts':
+            self.db_handler.create_auth_attempts(message['columns'])
+        else:
+            logger.error('Unknown message type from worker: %s', kind)
@@ -0,0 +1,115 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import heapq
+import itertools
+import logging
+import gevent
+
+from hornet.common.clock import CLOCK
+
+logger = logging.getLogger(__name__)
+
+
+class SessionReaper(object):
+    """
+        Ends the sessions that timed out: idle for `idle_timeout` seconds, not logged in within
+        `preauth_timeout`, or running for longer than `max_duration` (0 for no limit). The deadlines
+        of all sessions are kept in a single heap, checked by one greenlet every `resolution` seconds.
+
+        Deadlines are on the monotonic clock (see Clock). Activity only updates the session itself
+        (Session.touch), so it costs nothing here. When the deadline of a session that has been
+        active since comes up, the session is put back with its new deadline.
+    """
+
+    def __init__(self, session_q, idle_timeout=60, preauth_timeout=60, max_duration=0, resolution=1):
+        self.session_q = session_q
+        self.idle_timeout = idle_timeout
+        self.preauth_timeout = preauth_timeout
+        self.max_duration = max_duration
+        self.resolution = resolution
+        self.run_greenlet = None
+        self.expired = 0
+        self._deadlines = []
+        self._counter = itertools.count()  # Keeps sessions with the same deadline in order
+
+    @classmethod
+    def from_config(cls, session_q, config):
+        return cls(session_q,
+                   idle_timeout=config.session_idle_timeout,
+                   preauth_timeout=config.session_preauth_timeout,
+                   max_duration=config.session_max_duration)
+
+    def add(self, session):
+        heapq.heappush(self._deadlines, (self.get_deadline(session), next(self._counter), session))
+
+    def get_deadline(self, session):
+        deadline = session.last_active + self.idle_timeout
+        if not session.authenticated and self.preauth_timeout:
+            deadline = min(deadline, session.started + self.preauth_timeout)
+        if self.max_duration:
+            deadline = min(deadline, session.started + self.max_duration)
+        return deadline
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def reap(self, now=None):
+        """ Closes the connections of the sessions that timed out by `now` (monotonic), finishes and returns them. """
+        if now is None:
+            now = CLOCK.monotonic()
+        expired = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, session = heapq.heappop(self._deadlines)
+            if session.end_time is not None:
+                continue  # Finished already
+            deadline = self.get_deadline(session)
+            if deadline > now:
+                heapq.heappush(self._deadlines, (deadline, next(self._counter), session))
+            else:
+                expired.append(session)
+        if expired:
+            logger.debug('%s sessions timed out', len(expired))
+            self.expired += len(expired)
+        # First, so that none of them can still record activity once they are finished
+        for session in expired:
+            if session.connection is not None:
+                try:
+                    session.connection.close()
+                except Exception:
+                    logger.exception('Could not close the connection of session %s', session.id)
+        for session in expired:
+            session.finish()  # Doesn't block, even when the session queue is full
+        return expired
+
+    def _run(self):
+        while True:
+            gevent.sleep(self.resolution)
+            try:
+                self.reap()
+            except Exception:
+                logger.exception('Could not end timed out sessions')
+
+    def start(self):
+        self.run_greenlet = gevent.spawn(self._run)
+        return self.run_greenlet
+
+    def stop(self):
+        if self.run_greenlet is not None:
+            self.run_greenlet.kill()
@@ -0,0 +1,173 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import heapq
+import logging
+import math
+
+from gevent.hub import get_hub, getcurrent
+
+from hornet.common.clock import CLOCK
+
+logger = logging.getLogger(__name__)
+
+
+class Ticker(object):
+    """
+        The ticks of one periodic output of a command, e.g. a ping reply every second. The command
+        waits for each tick with wait(), and calls stop() (or leaves the `with` block) when it's done.
+        Ticks the command was too busy for are merged, not queued up.
+    """
+
+    def __init__(self, interval, end=None):
+        self.interval = interval
+        self.end = end  # Monotonic time at which the scheduler stops the ticker, None for never
+        self.stopped = False
+        self._ticked = False
+        self._waiter = None
+
+    def wait(self):
+        """ Blocks until the next tick. Returns False, without waiting, once the ticker is stopped. """
+        if not self._ticked and not self.stopped:
+            self._waiter = getcurrent()
+            try:
+                get_hub().switch()
+            finally:
+                self._waiter = None
+        self._ticked = False
+        return not self.stopped
+
+    def tick(self):
+        self._ticked = True
+        self._wake()
+
+    def stop(self):
+        """ Wakes up the waiting command right away. The scheduler drops the ticker when it comes up next. """
+        self.stopped = True
+        self._wake()
+
+    def _wake(self):
+        waiter, self._waiter = self._waiter, None
+        if waiter is None:
+            return
+        hub = get_hub()
+        if getcurrent() is hub:
+            waiter.switch()
+        else:
+            hub.loop.run_callback(waiter.switch)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class PeriodicScheduler(object):
+    """
+        Drives the periodic output of the commands of all sessions, like ping replies and wget progress
+        bars. The tickers are kept in slots of `resolution` seconds, by their next tick, and the slots
+        in a single heap, checked by one timer of the event loop. It switches straight to the commands
+        that are due: no timer of their own, and no extra greenlet switch, per command and tick.
+        Times are on the monotonic clock (see Clock).
+    """
+
+    def __init__(self, resolution=0.01):
+        self.resolution = resolution
+        self._slots = {}  # Slot number -> tickers due then, in order
+        self._due = []  # Heap of slot numbers
+        self._timer = None
+        self._timer_due = None
+        self._ticking = False
+
+    def every(self, interval, delay=0, duration=None):
+        """
+            Returns a new Ticker that ticks first after `delay` seconds, then every `interval` seconds,
+            and is stopped after `duration` seconds (if given).
+        """
+        now = CLOCK.monotonic()
+        ticker = Ticker(interval, None if duration is None else now + duration)
+        due = now + delay
+        if ticker.end is not None:
+            due = min(due, ticker.end)
+        self._push(due, ticker)
+        return ticker
+
+    def __len__(self):
+        return sum(len(tickers) for tickers in self._slots.itervalues())
+
+    def tick(self, now=None):
+        """ Ticks (or stops) every ticker that is due by `now`, and returns when the next one is due, or None. """
+        if now is None:
+            now = CLOCK.monotonic()
+        self._ticking = True
+        try:
+            while self._due and self._due[0] * self.resolution <= now:
+                slot = heapq.heappop(self._due)
+                due = slot * self.resolution
+                for ticker in self._slots.pop(slot):
+                    if ticker.stopped:
+                        continue
+                    if ticker.end is not None and due >= ticker.end:
+                        ticker.stop()
+                        continue
+                    # A late tick (a busy process) moves the following ones, rather than causing a burst
+                    next_due = due + ticker.interval
+                    if next_due <= now:
+                        next_due = now + ticker.interval
+                    if ticker.end is not None:
+                        next_due = min(next_due, ticker.end)
+                    self._push(next_due, ticker)
+                    # Runs the command until it waits again, when called by the timer
+                    ticker.tick()
+        finally:
+            self._ticking = False
+        return self._due[0] * self.resolution if self._due else None
+
+    def _push(self, due, ticker):
+        slot = int(math.ceil(due / self.resolution))
+        tickers = self._slots.get(slot)
+        if tickers is not None:
+            tickers.append(ticker)
+            return
+        self._slots[slot] = [ticker]
+        heapq.heappush(self._due, slot)
+        due = slot * self.resolution
+        if not self._ticking and (self._timer_due is None or due < self._timer_due):
+            self._start_timer(due)
+
+    def _start_timer(self, due):
+        if self._timer is not None:
+            self._timer.stop()
+        self._timer_due = due
+        self._timer = get_hub().loop.timer(max(due - CLOCK.monotonic(), 0))
+        self._timer.start(self._run)
+
+    def _run(self):
+        self._timer_due = None
+        try:
+            next_due = self.tick()
+        except Exception:
+            logger.exception('Could not run the periodic output of commands')
+            next_due = self._due[0] * self.resolution if self._due else None
+        if next_due is not None and self._timer_due is None:
+            self._start_timer(next_due)
+
+
+SCHEDULER = PeriodicScheduler()
@@ -18,37 +18,44 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import uuid
-import arrow
-import gevent
 import logging
 
+import gevent.queue
+
+from hornet.common.clock import CLOCK
+
 logger = logging.getLogger(__name__)
 
 
 class Session(object):
+    """ An SSH connection to the honeypot. The SessionReaper finishes it once it timed out. """
 
     def __init__(self, client_address, session_q):
         self.id = uuid.uuid4()
-        self.start_time = arrow.now().timestamp
+        self.start_time = CLOCK.timestamp()
+        self.started = CLOCK.monotonic()  # Like start_time and last_active, for deadlines
         self.end_time = None
+        self.command_count = 0
         self.client_address = client_address
         self.session_q = session_q
-        self.last_activity = arrow.now().timestamp
-        self.watcher_greenlet = gevent.spawn(self.watch)
-
-    def watch(self, max_diff=60):
-        logger.debug('Started watching %s', self)
-        while True:
-            diff = arrow.now().timestamp - self.last_activity
-            if diff > max_diff:
-                self.finish()
-                break
-            gevent.sleep(5)
+        self.last_activity = self.start_time
+        self.last_active = self.started
+        self.authenticated = False
+        self.connection = None  # Closed when the session times out, if set
+
+    def touch(self):
+        """ Records activity on the session. """
+        self.last_activity = CLOCK.timestamp()
+        self.last_active = CLOCK.monotonic()
 
     def finish(self):
-        logger.debug('Detected inactive session: %s', self.id)
+        logger.debug('Session ended: %s', self.id)
         self.end_time = self.last_activity
-        self.session_q.put(self)
+        # Never blocks the caller (often the SessionReaper) when persistence falls behind
+        try:
+            self.session_q.put_nowait(self)
+        except gevent.queue.Full:
+            logger.warning('Session queue is full, the end of session %s is not recorded', self.id)
 
     def __repr__(self):
         return '<Session last_activity={}, id={}, client_address={}>'.format(
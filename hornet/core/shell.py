@@ -17,14 +17,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import argparse
 import curses
 
 import logging
 import socket
-import arrow
 
 from telnetsrv.green import TelnetHandler
+from hornet.core.commands.parsers import ParseError, parse
+from hornet.core.scheduler import SCHEDULER
 
 logger = logging.getLogger(__name__)
 
@@ -37,9 +37,13 @@ class Shell(TelnetHandler):
     PROMPT = ''
     WELCOME = ''
 
+    # Buffered output is sent right away once it grows this large
+    MAX_BUFFERED_OUTPUT = 32 * 1024
+
     def __init__(self, request, client_address, server, session, vhosts, config, db_handler):
         self.session = session
         self.vhosts = vhosts
+        self.host_filesystems = {}  # This session's overlays of the vhost filesystems, by hostname
         self.login_stack = []
         self.logging = logger
         self.current_host = None
@@ -48,11 +52,23 @@ class Shell(TelnetHandler):
         self.input = None
         self.command_greenlet = None
         self.interrupt = False
+        self._tickers = []  # Of the running command, Ctrl+C stops them
         self.db_handler = db_handler
         self.db_handler.create_attack_session(self.session)
+        self._output = []
+        self._output_size = 0
 
         TelnetHandler.__init__(self, request, client_address, server)
 
+    def get_host_session(self, hostname):
+        """
+            Returns a new view of a vhost for this session, with its own working directory and user.
+            Views of the same host share the session's filesystem changes, like nested ssh logins would.
+        """
+        host_session = self.vhosts[hostname].create_session(self.host_filesystems.get(hostname))
+        self.host_filesystems[hostname] = host_session.filesystem
+        return host_session
+
     def set_host(self, host, default=False):
 
         self.current_host = host
@@ -67,7 +83,7 @@ class Shell(TelnetHandler):
         if not self.authentication_ok():
             return
 
-        default_host = self.vhosts[self.config.default_hostname]
+        default_host = self.get_host_session(self.config.default_hostname)
         self.login_stack.append(default_host)
         self.set_host(default_host, default=True)
         self.session_start()
@@ -80,6 +96,7 @@ class Shell(TelnetHandler):
 
                     # Clear the interrupt flag
                     self.interrupt = False
+                    self._tickers = []
 
                     cmd = self.input.cmd
                     params = self.input.params
@@ -102,19 +119,24 @@ class Shell(TelnetHandler):
                         self.writeerror("{}: command not found".format(cmd))
                     finally:
                         self.PROMPT = self.current_host.prompt
+                        self.session.command_count += 1
                         self.db_handler.create_attack_command(
-                            self.session.id, cmd, self.current_host
+                            self.session.id, cmd, self.current_host.hostname
                         )
             except socket.error:
                 break
+        try:
+            self.flush()
+        except socket.error:
+            pass
         self.logging.debug("Exiting handler")
 
     def run_ssh(self, params):
-        parser = argparse.ArgumentParser()
-        parser.add_argument('-p', dest='port', default=22, type=int)
-        parser.add_argument('-l', dest='username')
-        parser.add_argument('host_string')
-        args = parser.parse_args(params)
+        try:
+            args = parse('ssh', params)
+        except ParseError:
+            self.writeline('usage: ssh [-l login_name] [-p port] [user@]hostname')
+            return
         username = args.username
         if username is None:
             try:
@@ -130,7 +152,7 @@ class Shell(TelnetHandler):
             return
 
         # Hostname is valid. Now get the password.
-        new_host = self.vhosts[hostname]
+        new_host = self.get_host_session(hostname)
         password = self.readline(echo=False, prompt=self.PROMPT_PASS, use_history=False)
         if new_host.authenticate(username, password):
             self.login_stack.append(new_host)
@@ -177,18 +199,63 @@ class Shell(TelnetHandler):
         if type(char) in [type(()), type([]), type("")]:
             for v in char:
                 if v == chr(3):
-                    self.interrupt = True
+                    self.set_interrupt()
                 self.cookedq.put(v)
         else:
             if char == chr(3):
-                self.interrupt = True
+                self.set_interrupt()
             self.cookedq.put(char)
 
+    def set_interrupt(self):
+        """ Ctrl+C: tells the running command to stop, and wakes it up if it waits for a tick. """
+        self.interrupt = True
+        for ticker in self._tickers:
+            ticker.stop()
+        self._tickers = []
+
+    def every(self, interval, delay=0, duration=None):
+        """ A Ticker (see PeriodicScheduler.every) for periodic output of the running command. """
+        ticker = SCHEDULER.every(interval, delay, duration)
+        self._tickers.append(ticker)
+        return ticker
+
     def updateline(self, data):
         self.write('\r')
         self.write(self.CODES['DEOL'])
         self.write(data)
+        self.flush()
 
     def writecooked(self, text):
-        TelnetHandler.writecooked(self, text)
-        self.session.last_activity = arrow.now().timestamp
+        """ Buffers outgoing data, see flush(). """
+        self._output.append(text)
+        self._output_size += len(text)
+        if self._output_size >= self.MAX_BUFFERED_OUTPUT:
+            self.flush()
+
+    def flush(self):
+        """
+            Sends all buffered output with a single channel send, so that it goes out in as few SSH
+            packets as possible. This happens whenever the shell waits for input (so the output of a
+            command goes out together with the next prompt) and on updateline(). Commands that block,
+            e.g. to sleep or wait for the network, call it first.
+        """
+        if not self._output:
+            return
+        output = ''.join(self._output)
+        self._output = []
+        self._output_size = 0
+        TelnetHandler.writecooked(self, output)
+        self.session.touch()
+
+    def getc(self, block=True):
+        self.flush()
+        return TelnetHandler.getc(self, block)
+
+    def sendcommand(self, cmd, opt=None):
+        # Option negotiation runs outside of commands, nothing would flush it later
+        TelnetHandler.sendcommand(self, cmd, opt)
+        self.flush()
+
+    def options_handler(self, sock, cmd, opt):
+        TelnetHandler.options_handler(self, sock, cmd, opt)
+        self.flush()
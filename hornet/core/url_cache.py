@@ -0,0 +1,118 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import time
+
+from hornet.common.helpers import write_atomically
+
+logger = logging.getLogger(__name__)
+
+
+class UrlCache(object):
+    """
+        Remembers which payload (by its hash in the PayloadStore) a URL returned, so that it can be
+        served again without a request. Each entry is a small JSON file in `directory`, named by the
+        hash of its URL, so all worker processes share the cache. Entries are fresh for `ttl` seconds,
+        and only the `max_entries` most recently used are kept.
+    """
+
+    def __init__(self, directory, ttl=86400, max_entries=10000):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if not os.path.isdir(directory):
+            logger.info('Creating directory {} for the URL cache'.format(directory))
+            os.makedirs(directory)
+        # Least recently used first
+        self._entries = collections.OrderedDict()
+        for key in sorted(self._list_keys(), key=self._get_last_used):
+            entry = self._read(key)
+            if entry is not None:
+                self._entries[key] = entry
+        self._evict()
+        logger.debug('%s entries in the URL cache in %s', len(self._entries), directory)
+
+    def get(self, url, allow_stale=False):
+        """ Returns the entry for `url`, or None if there is none (or only an expired one, unless `allow_stale`). """
+        key = self._get_key(url)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            # Another process might have added it
+            entry = self._read(key)
+            if entry is None:
+                return None
+        self._entries[key] = entry
+        if entry['url'] != url or (not allow_stale and time.time() - entry['fetched'] > self.ttl):
+            return None
+        try:
+            os.utime(self._get_path(key), None)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, url, sha256, content_type, size):
+        key = self._get_key(url)
+        entry = {'url': url, 'sha256': sha256, 'content_type': content_type, 'size': size, 'fetched': time.time()}
+        write_atomically(self._get_path(key), lambda entry_file: json.dump(entry, entry_file))
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        self._evict()
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key, entry = self._entries.popitem(last=False)
+            logger.debug('Evicting %s from the URL cache', entry['url'])
+            try:
+                os.remove(self._get_path(key))
+            except OSError:
+                pass
+
+    def _read(self, key):
+        try:
+            with open(self._get_path(key)) as entry_file:
+                return json.load(entry_file)
+        except (IOError, ValueError):
+            return None
+
+    def _list_keys(self):
+        return [name[:-len('.json')] for name in os.listdir(self.directory) if name.endswith('.json')]
+
+    def _get_last_used(self, key):
+        try:
+            return os.path.getmtime(self._get_path(key))
+        except OSError:
+            return 0
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    @staticmethod
+    def _get_key(url):
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        return hashlib.sha1(url).hexdigest()
@@ -0,0 +1,187 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Entry point of the worker processes started by hornet.core.prefork.WorkerSupervisor,
+# run as `python -m hornet.core.worker`.
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import argparse
+import json
+import logging
+import signal
+import socket
+import gevent
+import gevent.queue
+
+from hornet.main import Hornet
+from hornet.common.clock import CLOCK
+from hornet.core.db.handler import AUTH_ATTEMPT_COLUMNS, clip_auth_attempt
+from hornet.core.db.writer import ColumnBatcher
+from hornet.core.prefork import create_reuseport_socket
+
+logger = logging.getLogger(__name__)
+
+
+class ForwardingDatabaseHandler(object):
+    """
+        Used in place of DatabaseHandler inside worker processes. Every record is queued and
+        written, in order, to the channel leading to the supervisor, which owns the database.
+    """
+
+    def __init__(self, channel, queue_size=10000, auth_batch_size=1000, flush_interval=1.0):
+        self.channel = channel
+        self.outbox = gevent.queue.Queue(maxsize=queue_size)
+        self.run_greenlet = None
+        # Authentication attempts are forwarded in batches, a message per attempt would be too many
+        self.auth_attempts = ColumnBatcher(AUTH_ATTEMPT_COLUMNS, self._send_auth_attempts,
+                                           batch_size=auth_batch_size, flush_interval=flush_interval)
+
+    def create_attack_session(self, session):
+        self.send(type='session_start', id=str(session.id), start_time=session.start_time,
+                  client_address=session.client_address)
+
+    def create_attack_command(self, attack_session_id, command, hostname):
+        self.send(type='command', session_id=str(attack_session_id), command=command, hostname=hostname)
+
+    def finish_attack_session(self, session):
+        self.send(type='session_end', id=str(session.id), start_time=session.start_time,
+                  end_time=session.end_time, command_count=session.command_count)
+
+    def create_auth_attempt(self, session, username, password, client_version, success):
+        self.auth_attempts.add(*clip_auth_attempt(CLOCK.timestamp(), str(session.id), session.client_address[0],
+                                                  username, password, client_version, success))
+
+    def _send_auth_attempts(self, columns):
+        self.send(type='auth_attempts', columns=columns)
+
+    def send(self, **message):
+        self.outbox.put(json.dumps(message) + '\n')
+
+    def start(self):
+        self.auth_attempts.start()
+        self.run_greenlet = gevent.spawn(self._forward)
+        return self.run_greenlet
+
+    def stop(self):
+        self.auth_attempts.stop()
+        # Ends the forwarding once every queued record reached the supervisor
+        self.outbox.put(StopIteration)
+        self.run_greenlet.join()
+
+    def _forward(self):
+        for line in self.outbox:
+            try:
+                self.channel.sendall(line)
+            except socket.error:
+                logger.error('Lost the connection to the supervisor')
+                break
+
+
+class SessionForwarder(object):
+    """ Used in place of SessionConsumer inside worker processes. """
+
+    def __init__(self, session_q, db_handler):
+        self.session_q = session_q
+        self.db_handler = db_handler
+        self.run_greenlet = None
+
+    def _start_processing(self):
+        for session in self.session_q:
+            self.db_handler.finish_attack_session(session)
+
+    def start(self):
+        self.run_greenlet = gevent.spawn(self._start_processing)
+        return self.run_greenlet
+
+    def stop(self):
+        # Ends the iteration once everything queued before is forwarded
+        self.session_q.put(StopIteration)
+        self.run_greenlet.join()
+
+
+class HornetWorker(Hornet):
+
+    def __init__(self, working_directory, channel, port, vhost_ips):
+        self.channel = channel
+        self.port = port
+        self.vhost_ips = vhost_ips
+        super(HornetWorker, self).__init__(working_directory)
+
+    def _load_config(self):
+        config = super(HornetWorker, self)._load_config()
+        # Use the addresses the supervisor settled on, instead of picking random ones again.
+        for host_params in config.vhost_params:
+            host_params['ip_address'] = self.vhost_ips.get(host_params['hostname'], host_params['ip_address'])
+        return config
+
+    def _create_db_handler(self):
+        return ForwardingDatabaseHandler(self.channel, auth_batch_size=self.config.persistence_auth_batch_size,
+                                         flush_interval=self.config.persistence_flush_interval)
+
+    def _create_consumer(self):
+        return SessionForwarder(self.session_q, self.db_handler)
+
+    def start(self):
+        self.host_keys.load()
+        self.sighup_handler = gevent.signal(signal.SIGHUP, self.reload)
+        listener = create_reuseport_socket(self.config.host, self.port)
+        listener.listen(socket.SOMAXCONN)
+        self.server_greenlet = self._start_server(listener=listener)
+        self.consumer_greenlet = self.consumer.start()
+        self.db_writer_greenlet = self.db_handler.start()
+        return [self.server_greenlet, self.consumer_greenlet, self.db_writer_greenlet]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--index', type=int, required=True)
+    parser.add_argument('--channel-fd', type=int, required=True)
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--vhost-ips', type=json.loads, default={})
+    parser.add_argument('--log-level', type=int, default=logging.WARNING)
+    parser.add_argument('working_directory')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level,
+                        format='%(asctime)s [%(levelname)s] (%(name)s) [worker {}] %(message)s'.format(args.index))
+    logging.getLogger('paramiko').setLevel(max(args.log_level, logging.WARNING))
+
+    channel = socket.fromfd(args.channel_fd, socket.AF_UNIX, socket.SOCK_STREAM)
+    honeypot = HornetWorker(args.working_directory, channel, args.port, args.vhost_ips)
+    greenlets = honeypot.start()
+
+    stop_greenlet = gevent.Greenlet(honeypot.stop)
+
+    def shutdown():
+        logger.info('Worker %s shutting down', args.index)
+        if not stop_greenlet and not stop_greenlet.ready():  # Not started yet
+            stop_greenlet.start()
+
+    gevent.signal(signal.SIGTERM, shutdown)
+    # Either the server was stopped, or the supervisor went away.
+    gevent.joinall([greenlets[0], greenlets[2]], count=1)
+    # Stopping the server is only the first step, the records still queued have to reach the supervisor
+    if stop_greenlet or stop_greenlet.ready():
+        stop_greenlet.join()
+
+
+if __name__ == '__main__':
+    main()
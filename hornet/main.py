@@ -21,15 +21,24 @@ import json
 import logging
 import os
 import shutil
+import signal
+import gevent
 import gevent.server
 import gevent.queue
 
 import hornet
 from hornet.core.handler import SSHWrapper
 from hornet.common.config import Config
+from hornet.common.keys import HostKeyStore
+from hornet.core.commands.assets import COMMAND_ASSETS
 from hornet.core.host import VirtualHost
 from hornet.core.consumer import SessionConsumer
 from hornet.core.db.handler import DatabaseHandler
+from hornet.core.downloads import DownloadScheduler
+from hornet.core.payloads import PayloadStore
+from hornet.core.url_cache import UrlCache
+from hornet.core.prefork import WorkerSupervisor
+from hornet.core.reaper import SessionReaper
 
 logger = logging.getLogger(__name__)
 
@@ -38,21 +47,43 @@ class Hornet(object):
 
     def __init__(self, working_directory, vhost_create_fs=False):
         self.server = None
+        self.supervisor = None
         self.handler = None
         self.server_greenlet = None
-        self.session_q = gevent.queue.Queue()
-        self.consumer = SessionConsumer(self.session_q)
         self.consumer_greenlet = None
+        self.db_writer_greenlet = None
+        self.sighup_handler = None
         self.working_directory = working_directory
         self.config = self._load_config()
+        self.host_keys = HostKeyStore(self.config.host_key_files, self.working_directory,
+                                      moduli_file=self.config.moduli_file, bundled_moduli=self.config.bundled_moduli)
         self._vhost_create_fs = vhost_create_fs
+        self.db_handler = self._create_db_handler()
+        self.session_q = gevent.queue.Queue(maxsize=self.config.consumer_queue_size)
+        self.consumer = self._create_consumer()
+        self.reaper = SessionReaper.from_config(self.session_q, self.config)
+        self.payloads = PayloadStore(os.path.join(self.working_directory, self.config.payload_directory))
+        self.url_cache = UrlCache(os.path.join(self.working_directory, self.config.download_cache_directory),
+                                  ttl=self.config.download_cache_ttl, max_entries=self.config.download_cache_size)
+        offline_directory = self.config.download_offline_directory
+        if offline_directory:
+            offline_directory = os.path.join(self.working_directory, offline_directory)
+        self.downloads = DownloadScheduler.from_config(self.config, self.payloads, self.url_cache, offline_directory)
+
+        # Create virtual hosts
+        self.vhosts = self._create_vhosts()
+
+    def _create_db_handler(self):
         try:
-            self.db_handler = DatabaseHandler(self.config)
+            return DatabaseHandler(self.config)
         except Exception:
             logger.exception('Could not initialize database: %s', self.config.database)
 
-        # Create virtual hosts
-        self.vhosts = self._create_vhosts()
+    def _create_consumer(self):
+        return SessionConsumer(self.session_q, self.db_handler,
+                               workers=self.config.consumer_workers,
+                               batch_size=self.config.consumer_batch_size,
+                               stats_interval=self.config.consumer_stats_interval)
 
     def _load_config(self):
         config_path = os.path.join(self.working_directory, 'config.json')
@@ -75,23 +106,57 @@ class Hornet(object):
 
         hosts = {}
         for host_params in self.config.vhost_params:
-            h = VirtualHost(host_params, self.config.network, vhosts_path, create_fs=self._vhost_create_fs)
+            if host_params.get('fs_snapshot'):
+                host_params['fs_snapshot'] = os.path.join(self.working_directory, host_params['fs_snapshot'])
+            h = VirtualHost(host_params, self.config.network, vhosts_path, create_fs=self._vhost_create_fs,
+                            downloads=self.downloads)
             hosts[h.hostname] = h
         return hosts
 
     def start(self):
-        self.handler = SSHWrapper(self.vhosts, self.session_q, self.config, self.working_directory, self.db_handler)
-        self.server = gevent.server.StreamServer((self.config.host, self.config.port),
-                                                 handle=self.handler.handle_session)
-        self.server_greenlet = gevent.spawn(self.server.serve_forever)
+        self.host_keys.load()
+        self.sighup_handler = gevent.signal(signal.SIGHUP, self.reload)
+        if self.config.workers > 1:
+            self.server_greenlet = self._start_workers()
+        else:
+            self.server_greenlet = self._start_server(listener=(self.config.host, self.config.port))
+
+        self.consumer_greenlet = self.consumer.start()
+        self.db_writer_greenlet = self.db_handler.start()
+        return [self.server_greenlet, self.consumer_greenlet, self.db_writer_greenlet]
+
+    def _start_server(self, listener):
+        self.handler = SSHWrapper(self.vhosts, self.session_q, self.config, self.working_directory, self.db_handler,
+                                  self.host_keys, self.reaper)
+        self.reaper.start()
+        self.server = gevent.server.StreamServer(listener, handle=self.handler.handle_session)
+        server_greenlet = gevent.spawn(self.server.serve_forever)
         while self.server.server_port == 0:
             gevent.sleep(0)  # Bad way of waiting, but can't think of anything right now.
         logger.info('SSH server listening on {}:{}'.format(self.server.server_host, self.server.server_port))
+        return server_greenlet
 
-        self.consumer_greenlet = self.consumer.start()
-        return [self.server_greenlet, self.consumer_greenlet]
+    def _start_workers(self):
+        # The workers accept the connections, this process only supervises them and persists their sessions
+        vhost_ips = dict((hostname, host.ip_address) for hostname, host in self.vhosts.iteritems())
+        self.supervisor = WorkerSupervisor(self.config, self.working_directory, vhost_ips,
+                                           self.db_handler, self.session_q)
+        return self.supervisor.start()
+
+    def reload(self):
+        logger.info('Received reload request')
+        self.host_keys.reload()
+        COMMAND_ASSETS.reload()
+        if self.supervisor is not None:
+            self.supervisor.reload()
 
     def stop(self):
         logging.debug('Stopping the server')
-        self.server.stop()
+        self.sighup_handler.cancel()
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        else:
+            self.server.stop()
+        self.reaper.stop()
         self.consumer.stop()
+        self.db_handler.stop()
@@ -2,6 +2,7 @@ import os
 import tempfile
 import unittest
 import shutil
+import gevent.pywsgi
 import hornet
 
 
@@ -27,3 +28,20 @@ class BaseTestClass(unittest.TestCase):
         default_host.filesystem.create('/etc/sysctl.conf')
         default_host.filesystem.create('/.hidden/.rcconf')
         default_host.filesystem.create('/initrd.img')
+
+    def serve_http(self, body, content_type='application/octet-stream', chunk_size=4096):
+        """
+            Starts a local HTTP server that answers every request with `body`. Returns the server's
+            base URL, and the list that the path of each request it receives is appended to.
+        """
+        requests_seen = []
+
+        def application(environ, start_response):
+            requests_seen.append(environ['PATH_INFO'])
+            start_response('200 OK', [('Content-Type', content_type), ('Content-Length', str(len(body)))])
+            return [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+
+        server = gevent.pywsgi.WSGIServer(('127.0.0.1', 0), application, log=None)
+        server.start()
+        self.addCleanup(server.stop)
+        return 'http://127.0.0.1:{}'.format(server.server_port), requests_seen
@@ -20,6 +20,7 @@
 import gevent.monkey
 gevent.monkey.patch_all()
 
+import json
 import paramiko
 import re
 import os
@@ -1359,6 +1360,144 @@ class HornetTests(BaseTestClass):
 
         honeypot.stop()
 
+    def test_ls_recursive(self):
+        """ Test 'ls -R', and that each recursive listing stops at the output limit """
+
+        config_path = os.path.join(self.working_dir, 'config.json')
+        with open(config_path) as config_file:
+            config = json.load(config_file)
+        config['commands']['max_recursive_listing_output'] = 115
+        with open(config_path, 'w') as config_file:
+            json.dump(config, config_file)
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        self.create_filesystem(honeypot)
+
+        while honeypot.server.server_port == 0:  # wait until the server is ready
+            gevent.sleep(0)
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = client.invoke_shell()
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        welcome = ''
+        while channel.recv_ready():
+            welcome += channel.recv(1)
+        self.assertTrue(welcome.endswith('$ '))
+
+        def run(command):
+            channel.send(command + '\r\n')
+            output = ''
+            while not output.endswith('$ '):
+                output += channel.recv(1)
+            return output.split('\r\n')[1:-1]
+
+        command_output = run('ls -R etc')
+        self.assertEquals(command_output, ['etc:', 'init.d passwd sysctl.conf', '', 'etc/init.d:', ''])
+
+        command_output = run('ls -Ra /')
+        self.assertEquals(command_output[:2], ['/:', '. .. .hidden bin etc initrd.img var'])
+        self.assertEquals(command_output[3:5], ['/.hidden:', '. .. .rcconf'])
+        # The rest is cut off after 115 bytes
+        self.assertEquals(command_output[5:], ['', '/bin:', '. ..', 'ls: write error: Input/output error'])
+        # The limit is per listing, not per session
+        command_output = run('ls -R etc')
+        self.assertEquals(command_output, ['etc:', 'init.d passwd sysctl.conf', '', 'etc/init.d:', ''])
+
+        honeypot.stop()
+
+    def test_ls_long_alignment(self):
+        """ Test if the columns of 'ls -la' are as wide as their widest value, like ls makes them """
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        self.create_filesystem(honeypot)
+        default_host = honeypot.vhosts[honeypot.config.default_hostname]
+        default_host.filesystem.setbytes(u'/etc/passwd', b'x' * 123456)
+
+        while honeypot.server.server_port == 0:  # wait until the server is ready
+            gevent.sleep(0)
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = client.invoke_shell()
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        welcome = ''
+        while channel.recv_ready():
+            welcome += channel.recv(1)
+        self.assertTrue(welcome.endswith('$ '))
+
+        channel.send('ls -la /etc\r\n')
+        output = ''
+        while not output.endswith('$ '):
+            output += channel.recv(1)
+
+        lines = output.split('\r\n')[1:-1]
+        self.assertTrue(lines[0].startswith('total '))
+        names = ['.', '..', '.config', 'init.d', 'passwd', 'sysctl.conf']
+        self.assertEquals([line.split()[-1] for line in lines[1:]], names)
+        # Every name starts in the same column, and the widest size fills its column
+        self.assertEquals(set(len(line) - len(name) for line, name in zip(lines[1:], names)), {len(lines[1]) - 1})
+        self.assertTrue(' ftp ftp 123456 ' in lines[5])
+
+        honeypot.stop()
+
+    def test_ls_sort(self):
+        """ Test if ls sorts by size, time and extension, reverses, and leaves listings unsorted with -U """
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        self.create_filesystem(honeypot)
+        default_host = honeypot.vhosts[honeypot.config.default_hostname]
+        filesystem = default_host.filesystem
+        filesystem.makedir(u'/sorting')
+        for name, size, modified in [(u'a.log', 10, 1200000000), (u'b.txt', 300, 1400000000), (u'c', 200, 1000000000)]:
+            filesystem.setbytes(u'/sorting/' + name, b'x' * size)
+            filesystem.setinfo(u'/sorting/' + name, {'details': {'modified': modified}})
+
+        while honeypot.server.server_port == 0:  # wait until the server is ready
+            gevent.sleep(0)
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = client.invoke_shell()
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        welcome = ''
+        while channel.recv_ready():
+            welcome += channel.recv(1)
+        self.assertTrue(welcome.endswith('$ '))
+
+        def run(command):
+            channel.send(command + '\r\n')
+            output = ''
+            while not output.endswith('$ '):
+                output += channel.recv(1)
+            return output.split('\r\n')[1:-1]
+
+        self.assertEquals(run('ls -S /sorting'), ['b.txt c a.log'])
+        self.assertEquals(run('ls -t /sorting'), ['b.txt a.log c'])
+        self.assertEquals(run('ls -tr /sorting'), ['c a.log b.txt'])
+        self.assertEquals(run('ls --sort=extension /sorting'), ['c a.log b.txt'])
+        self.assertEquals(run('ls -r /sorting'), ['c b.txt a.log'])
+        self.assertEquals(sorted(run('ls -U /sorting')[0].split()), ['a.log', 'b.txt', 'c'])
+        self.assertEquals([line.split()[-1] for line in run('ls -lS /sorting')[1:]], ['b.txt', 'c', 'a.log'])
+        self.assertTrue(run('ls --sort=colour /sorting')[0].startswith('ls: '))
+
+        honeypot.stop()
+
     def verify_long_list(self, actual_list, expected_list):
         for exp in expected_list:
             found = False
@@ -315,4 +315,45 @@ class HornetTests(BaseTestClass):
         next_prompt = lines[-1]
         self.assertTrue(next_prompt.endswith('$ '))
 
-        honeypot.stop()
\ No newline at end of file
+        honeypot.stop()
+
+    def test_ping_count(self):
+        """ Tests 'ping -c 3 -i 0.2 test01', which stops by itself after three pings """
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+
+        while honeypot.server.server_port == 0:  # wait until the server is ready
+            gevent.sleep(0)
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = client.invoke_shell()
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        welcome = ''
+        while channel.recv_ready():
+            welcome += channel.recv(1)
+        self.assertTrue(welcome.endswith('$ '))
+
+        channel.send('ping -c 3 -i 0.2 test01\r\n')
+        output = ''
+        while not output.endswith('$ '):
+            output += channel.recv(1)
+
+        lines = output.split('\r\n')[1:-1]
+        lines = [l for l in lines if not l.startswith('64 bytes from')]  # Skip the ping response lines
+        self.assertTrue(lines[0].startswith('PING test01 ('))
+        self.assertEquals('--- test01 ping statistics ---', lines[1])
+        self.assertTrue(lines[2].startswith('3 packets transmitted, '))
+
+        channel.send('ping -i 0.1 test01\r\n')
+        output = ''
+        while not output.endswith('$ '):
+            output += channel.recv(1)
+        self.assertTrue('ping: cannot flood; minimal interval allowed for user is 200ms' in output)
+
+        honeypot.stop()
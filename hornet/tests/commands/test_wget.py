@@ -19,6 +19,8 @@
 import gevent.monkey
 gevent.monkey.patch_all()
 
+import hashlib
+import json
 import os
 import unittest
 import paramiko
@@ -30,6 +32,177 @@ from hornet.tests.commands.base import BaseTestClass
 
 class HornetTests(BaseTestClass):
 
+    def test_wget_single_request(self):
+        """ Tests if 'wget' downloads a payload with a single streamed request """
+
+        payload = os.urandom(300 * 1024)
+        base_url, requests_seen = self.serve_http(payload)
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+
+        while honeypot.server.server_port == 0:  # wait until the server is ready
+            gevent.sleep(0)
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        # If we log in properly, this should raise no errors
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = client.invoke_shell()
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        welcome = ''
+        while channel.recv_ready():
+            welcome += channel.recv(1)
+        lines = welcome.split('\r\n')
+        prompt = lines[-1]
+        self.assertTrue(prompt.endswith('$ '))
+
+        # Now send the wget command
+        wget_command = 'wget {}/payload.bin'.format(base_url)
+        channel.send(wget_command + '\r\n')
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        output = ''
+        while not output.endswith('$ '):
+            output += channel.recv(1)
+
+        lines = output.split('\r\n')
+        command_output = lines[1:-1]
+        next_prompt = lines[-1]
+
+        self.assertEquals(requests_seen, ['/payload.bin'])
+        self.assertEquals(command_output[4], 'Length: 307200 (300.0K) [application/octet-stream]')
+        self.assertTrue(command_output[-1].endswith('\'payload.bin\' saved [307200/307200]'))
+
+        # The download is kept in the payload store, not in the host filesystem every session shares
+        default_host = honeypot.vhosts[honeypot.config.default_hostname]
+        self.assertFalse(default_host.filesystem.exists(u'payload.bin'))
+        sha256 = hashlib.sha256(payload).hexdigest()
+        self.assertTrue(sha256 in honeypot.payloads)
+        with open(honeypot.payloads.path(sha256), 'rb') as payload_file:
+            self.assertEquals(payload_file.read(), payload)
+
+        self.assertTrue(next_prompt.endswith('$ '))
+        honeypot.stop()
+
+    def test_wget_offline(self):
+        """ Tests if 'wget' in offline mode makes up a response instead of resolving and connecting """
+
+        config_path = os.path.join(self.working_dir, 'config.json')
+        with open(config_path) as config_file:
+            config = json.load(config_file)
+        config.setdefault('downloads', {}).update({'offline': True, 'fake_min_size': 2000, 'fake_max_size': 2000,
+                                                   'fake_content_type': 'application/x-sh'})
+        with open(config_path, 'w') as config_file:
+            json.dump(config, config_file)
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+
+        while honeypot.server.server_port == 0:  # wait until the server is ready
+            gevent.sleep(0)
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        # If we log in properly, this should raise no errors
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = client.invoke_shell()
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        welcome = ''
+        while channel.recv_ready():
+            welcome += channel.recv(1)
+        lines = welcome.split('\r\n')
+        prompt = lines[-1]
+        self.assertTrue(prompt.endswith('$ '))
+
+        # Now send the wget command
+        wget_command = 'wget http://nowhere.invalid/bins.sh'
+        channel.send(wget_command + '\r\n')
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        output = ''
+        while not output.endswith('$ '):
+            output += channel.recv(1)
+
+        lines = output.split('\r\n')
+        command_output = lines[1:-1]
+        next_prompt = lines[-1]
+
+        self.assertTrue(command_output[1].startswith('Resolving nowhere.invalid (nowhere.invalid)... '))
+        self.assertFalse(command_output[1].endswith('failed: Name or service not known.'))
+        self.assertEquals(command_output[4], 'Length: 2000 (2.0K) [application/x-sh]')
+        self.assertTrue(command_output[-1].endswith('\'bins.sh\' saved [2000/2000]'))
+
+        self.assertTrue(next_prompt.endswith('$ '))
+
+        channel.send('ls -l bins.sh\r\n')
+        output = ''
+        while not output.endswith('$ '):
+            output += channel.recv(1)
+        self.assertTrue(' 2000 ' in output.split('\r\n')[1])
+        default_host = honeypot.vhosts[honeypot.config.default_hostname]
+        self.assertFalse(default_host.filesystem.exists(u'bins.sh'))
+
+        honeypot.stop()
+
+    def test_wget_then_ls(self):
+        """ Tests if a file downloaded by 'wget' shows up in a listing made before, and only in its own session """
+
+        base_url, _ = self.serve_http(b'x' * 2000)
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+
+        while honeypot.server.server_port == 0:  # wait until the server is ready
+            gevent.sleep(0)
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = client.invoke_shell()
+
+        while not channel.recv_ready():
+            gevent.sleep(0)  # :-(
+
+        welcome = ''
+        while channel.recv_ready():
+            welcome += channel.recv(1)
+        self.assertTrue(welcome.endswith('$ '))
+
+        def run(command):
+            channel.send(command + '\r\n')
+            output = ''
+            while not output.endswith('$ '):
+                output += channel.recv(1)
+            return output.split('\r\n')[1:-1]
+
+        self.assertFalse([line for line in run('ls -l') if line.endswith(' bins.sh')])
+        run('wget {}/bins.sh'.format(base_url))
+        listed = [line for line in run('ls -l') if line.endswith(' bins.sh')]
+        self.assertEquals(len(listed), 1)
+        self.assertTrue(' 2000 ' in listed[0])
+
+        # Other sessions don't see it
+        other_client = paramiko.SSHClient()
+        other_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        other_client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        channel = other_client.invoke_shell()
+        welcome = ''
+        while not welcome.endswith('$ '):
+            welcome += channel.recv(1)
+        self.assertFalse([line for line in run('ls -l') if line.endswith(' bins.sh')])
+
+        honeypot.stop()
+
     def test_wget_bad_hostname(self):
         """ Tests if 'wget http://asdjkhaskdh/index.html' works (bad hostname case) """
 
@@ -392,11 +565,8 @@ class HornetTests(BaseTestClass):
         self.assertEquals(command, wget_command)
         self.assertTrue(lines[1].startswith('--'))
 
-        default_host = honeypot.vhosts[honeypot.config.default_hostname]
-        file_ = default_host.filesystem.getsyspath('drip')
-        with open(file_, 'r') as downloaded_file:
-            data = downloaded_file.read()
-            self.assertEquals(len(data), 2048)
+        sizes = [honeypot.payloads.get_metadata(sha256)['size'] for sha256 in honeypot.payloads.known_hashes]
+        self.assertEquals(sizes, [2048])
 
         self.assertTrue(command_output[0].startswith('--'))
         self.assertTrue(command_output[0].endswith(
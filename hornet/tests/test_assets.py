@@ -0,0 +1,59 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from hornet.core.commands.assets import AssetCache, COMMAND_ASSETS, COMMANDS_DIR
+
+
+class HornetTests(unittest.TestCase):
+
+    def test_assets_cooked(self):
+        """ Tests whether assets are stored with stripped lines and terminal line endings """
+
+        with open(os.path.join(COMMANDS_DIR, 'ls', 'version')) as version_file:
+            lines = [line.strip() for line in version_file]
+        self.assertEquals(COMMAND_ASSETS.get('ls/version'), '\r\n'.join(lines) + '\r\n')
+        self.assertTrue('wget/no_param' in COMMAND_ASSETS)
+
+    def test_assets_reload(self):
+        """ Tests whether assets are only loaded again when the directory changes """
+
+        assets_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(assets_dir, 'true'))
+            with open(os.path.join(assets_dir, 'true', 'help'), 'w') as help_file:
+                help_file.write('Usage: true  \n')
+            assets = AssetCache(assets_dir)
+            self.assertEquals(assets.get('true/help'), 'Usage: true\r\n')
+            self.assertFalse(assets.reload())
+
+            with open(os.path.join(assets_dir, 'true', 'version'), 'w') as version_file:
+                version_file.write('true (GNU coreutils) 8.21\n')
+            self.assertTrue(assets.reload())
+            self.assertEquals(assets.get('true/version'), 'true (GNU coreutils) 8.21\r\n')
+        finally:
+            shutil.rmtree(assets_dir)
@@ -0,0 +1,88 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import unittest
+
+import gevent
+from gevent.threadpool import ThreadPool
+
+from hornet.common import clock
+
+
+class _Time(object):
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class HornetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.real_time = clock.time
+        self.real_clock_gettime = clock._clock_gettime
+        clock.time = self.time = _Time(1000.5)
+
+    def tearDown(self):
+        clock.time = self.real_time
+        clock._clock_gettime = self.real_clock_gettime
+
+    def test_timestamp(self):
+        """ Tests whether timestamps are the event loop's wall-clock time, in milliseconds """
+
+        gevent.sleep(0.01)
+        timestamp = clock.Clock().timestamp()
+        self.assertAlmostEqual(timestamp, self.real_time.time(), delta=0.01)
+        self.assertAlmostEqual(timestamp * 1000, round(timestamp * 1000), places=3)
+
+    def test_timestamp_without_hub(self):
+        """ Tests whether threads without a hub get the wall-clock time in milliseconds """
+
+        self.time.now = 1000.5678
+        pool = ThreadPool(1)
+        try:
+            self.assertEquals(pool.apply(clock.Clock().timestamp), 1000.567)
+        finally:
+            pool.kill()
+
+    def test_monotonic(self):
+        """ Tests whether the monotonic clock keeps going when the wall clock is set back """
+
+        monotonic_clock = clock.Clock()
+        before = monotonic_clock.monotonic()
+        self.time.now = 900
+        gevent.sleep(0.01)
+        self.assertGreaterEqual(monotonic_clock.monotonic() - before, 0.01)
+
+    def test_monotonic_fallback(self):
+        """ Tests whether the monotonic clock makes up for the wall clock being set back without clock_gettime """
+
+        clock._clock_gettime = None
+        monotonic_clock = clock.Clock()
+        self.assertEquals(monotonic_clock.monotonic(), 1000.5)
+        self.time.now = 900
+        self.assertEquals(monotonic_clock.monotonic(), 1000.5)
+        self.time.now = 910
+        self.assertEquals(monotonic_clock.monotonic(), 1010.5)
@@ -0,0 +1,109 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import os
+import shutil
+import unittest
+import tempfile
+
+import hornet
+from hornet.main import Hornet
+from hornet.core.db.models import AttackSession
+from hornet.core.session import Session
+
+
+class HornetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        test_config = os.path.join(os.path.dirname(hornet.__file__), 'data', 'default_config.json')
+        shutil.copyfile(test_config, os.path.join(self.working_dir, 'config.json'))
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_session_finalisation(self):
+        """ Tests whether finished sessions get their end time, command count and duration persisted """
+
+        honeypot = Hornet(self.working_dir)
+        consumer = honeypot.consumer
+        consumer.start()
+
+        session = Session(('127.0.0.1', 2222), honeypot.session_q)
+        honeypot.db_handler.create_attack_session(session)
+        session.command_count = 3
+        session.last_activity = session.start_time + 42
+        session.finish()
+
+        while consumer.processed + consumer.failed < 1:
+            gevent.sleep(0.01)
+        consumer.stop()
+
+        self.assertEquals(consumer.processed, 1)
+        self.assertEquals(consumer.queue_depth, 0)
+        with honeypot.db_handler.session_context() as dbsession:
+            attack_session = dbsession.query(AttackSession).filter_by(id=str(session.id)).one()
+            self.assertEquals(attack_session.end_time, session.start_time + 42)
+            self.assertEquals(attack_session.command_count, 3)
+            self.assertEquals(attack_session.duration, 42)
+
+    def test_bounded_queue(self):
+        """ Tests whether the session queue is bounded by the configured size """
+
+        honeypot = Hornet(self.working_dir)
+        self.assertEquals(honeypot.session_q.maxsize, honeypot.config.consumer_queue_size)
+        self.assertEquals(honeypot.consumer.stats()['queue_size'], honeypot.config.consumer_queue_size)
+
+    def test_stop_persists_queued_sessions(self):
+        """ Tests whether stopping the consumer persists the sessions that are still queued """
+
+        honeypot = Hornet(self.working_dir)
+        consumer = honeypot.consumer
+        consumer.start()
+
+        sessions = []
+        for _ in range(consumer.batch_size * 3):
+            session = Session(('127.0.0.1', 2222), honeypot.session_q)
+            honeypot.db_handler.create_attack_session(session)
+            session.command_count = 1
+            session.finish()
+            sessions.append(session)
+        consumer.stop()
+
+        self.assertEquals(consumer.processed, len(sessions))
+        self.assertEquals(consumer.queue_depth, 0)
+        with honeypot.db_handler.session_context() as dbsession:
+            finished = dbsession.query(AttackSession).filter(
+                AttackSession.id.in_([str(session.id) for session in sessions]),
+                AttackSession.end_time != None).count()  # noqa
+            self.assertEquals(finished, len(sessions))
+
+    def test_finish_on_full_queue(self):
+        """ Tests whether finishing a session doesn't block when the session queue is full """
+
+        honeypot = Hornet(self.working_dir)
+        for _ in range(honeypot.session_q.maxsize):
+            honeypot.session_q.put(None)
+        session = Session(('127.0.0.1', 2222), honeypot.session_q)
+        with gevent.Timeout(1):
+            session.finish()
+        self.assertEquals(honeypot.session_q.qsize(), honeypot.session_q.maxsize)
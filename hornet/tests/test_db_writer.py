@@ -0,0 +1,170 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+gevent.monkey.patch_all()
+
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from hornet.core.db.handler import clip, clip_auth_attempt
+from hornet.core.db.models import AttackCommand, Base
+from hornet.core.db.writer import BatchWriter, ColumnBatcher
+
+
+class HornetTests(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.engine = create_engine('sqlite:///' + self.db_path)
+        Base.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        os.remove(self.db_path)
+
+    def count_rows(self):
+        return self.engine.execute(AttackCommand.__table__.count()).scalar()
+
+    def test_flush_on_batch_size(self):
+        """ Tests whether a full batch is written without waiting for the flush interval """
+
+        writer = BatchWriter(self.engine, AttackCommand.__table__, batch_size=3, flush_interval=60)
+        writer.start()
+        for i in range(3):
+            writer.put({'time': i, 'command': 'ls', 'host': 'test02', 'session_id': 'abc'})
+        while len(writer.queue):
+            gevent.sleep(0.01)
+        gevent.sleep(0.1)
+        self.assertEquals(self.count_rows(), 3)
+        writer.stop()
+
+    def test_flush_on_interval(self):
+        """ Tests whether a partial batch is written once the flush interval has passed """
+
+        writer = BatchWriter(self.engine, AttackCommand.__table__, batch_size=100, flush_interval=0.1)
+        writer.start()
+        writer.put({'time': 0, 'command': 'uname', 'host': 'test02', 'session_id': 'abc'})
+        gevent.sleep(0.5)
+        self.assertEquals(self.count_rows(), 1)
+        writer.stop()
+
+    def test_stop_flushes_pending_rows(self):
+        """ Tests whether rows still queued at shutdown are written """
+
+        writer = BatchWriter(self.engine, AttackCommand.__table__, batch_size=100, flush_interval=60)
+        for i in range(5):
+            writer.put({'time': i, 'command': 'pwd', 'host': 'test02', 'session_id': 'abc'})
+        writer.stop()
+        self.assertEquals(self.count_rows(), 5)
+
+    def test_stop_flushes_collected_rows(self):
+        """ Tests whether rows the running writer already took off the queue are written on stop """
+
+        writer = BatchWriter(self.engine, AttackCommand.__table__, batch_size=100, flush_interval=60)
+        writer.start()
+        for i in range(5):
+            writer.put({'time': i, 'command': 'id', 'host': 'test02', 'session_id': 'abc'})
+        gevent.sleep(0.1)
+        self.assertEquals(len(writer.queue), 0)  # All waiting in the writer's batch
+        writer.stop()
+        self.assertEquals(self.count_rows(), 5)
+
+    def test_bad_row(self):
+        """ Tests whether a row the database rejects doesn't keep the rest of its batch from being written """
+
+        self.engine.execute(AttackCommand.__table__.insert(), id=3, time=0, command='id', host='test02',
+                            session_id='abc')
+        writer = BatchWriter(self.engine, AttackCommand.__table__, batch_size=100, flush_interval=60)
+        for i in range(1, 6):
+            writer.put({'id': i, 'time': i, 'command': 'w', 'host': 'test02', 'session_id': 'abc'})
+        writer.stop()
+        self.assertEquals(self.count_rows(), 5)
+        commands = self.engine.execute(AttackCommand.__table__.select().order_by('id')).fetchall()
+        self.assertEquals([row.command for row in commands], ['w', 'w', 'id', 'w', 'w'])
+
+    def test_clip(self):
+        """ Tests whether values are shortened to the length of their column, without splitting characters """
+
+        column = AttackCommand.__table__.c.command
+        self.assertEquals(clip('ls', column), 'ls')
+        self.assertEquals(clip(None, column), None)
+        self.assertEquals(len(clip('x' * 5000, column)), 2048)
+        self.assertEquals(clip('x' * 2047 + '\xc3\xa9', column), 'x' * 2047)
+        self.assertEquals(clip(u'\xe9' * 3000, column), u'\xe9' * 2048)
+
+    def test_column_batcher(self):
+        """ Tests whether records are collected by column and flushed in full batches, and the rest on stop """
+
+        batches = []
+        batcher = ColumnBatcher(('username', 'success'), batches.append, batch_size=3, flush_interval=60)
+        batcher.start()
+        batcher.add(u'root', False)
+        batcher.extend({'username': [u'admin', u'pi'], 'success': [False, True]})
+        gevent.sleep(0.1)
+        batcher.add(u'oracle', False)
+        self.assertEquals(batches, [{'username': [u'root', u'admin', u'pi'], 'success': [False, False, True]}])
+        self.assertEquals(len(batcher), 1)
+
+        batcher.stop()
+        self.assertEquals(batches[1], {'username': [u'oracle'], 'success': [False]})
+
+    def test_column_batcher_stop_during_flush(self):
+        """ Tests whether stopping a batcher that is flushing doesn't lose that batch """
+
+        batches = []
+
+        def slow_flush(columns):
+            gevent.sleep(0.1)
+            batches.append(columns)
+
+        batcher = ColumnBatcher(('username',), slow_flush, batch_size=2, flush_interval=60)
+        batcher.start()
+        batcher.add(u'root')
+        batcher.add(u'admin')
+        gevent.sleep(0.01)  # Flushing now
+        batcher.add(u'pi')
+        batcher.stop()
+        self.assertEquals(batches, [{'username': [u'root', u'admin']}, {'username': [u'pi']}])
+
+    def test_column_batcher_bad_record(self):
+        """ Tests whether a record that can't be flushed doesn't keep the rest of its batch from being flushed """
+
+        flushed = []
+
+        def flush(columns):
+            if u'bad' in columns['username']:
+                raise ValueError('Rejected')
+            flushed.extend(columns['username'])
+
+        batcher = ColumnBatcher(('username',), flush, batch_size=100, flush_interval=60)
+        for username in [u'root', u'admin', u'bad', u'pi', u'oracle']:
+            batcher.add(username)
+        batcher.stop()
+        self.assertEquals(flushed, [u'root', u'admin', u'pi', u'oracle'])
+
+    def test_clip_auth_attempt(self):
+        """ Tests whether the credentials and client version of authentication attempts are clipped """
+
+        attempt = clip_auth_attempt(1000.5, 'abc', '127.0.0.1', u'u' * 300, u'p' * 300, 'SSH-2.0-' + 'x' * 300, False)
+        self.assertEquals(attempt, [1000.5, 'abc', '127.0.0.1', u'u' * 256, u'p' * 256, ('SSH-2.0-' + 'x' * 300)[:256],
+                                    False])
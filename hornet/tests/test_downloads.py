@@ -0,0 +1,249 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import gevent
+import gevent.pywsgi
+
+from hornet.core.downloads import DownloadScheduler
+from hornet.core.fs_wrapper import MemorySandboxedFS
+from hornet.core.payloads import PayloadStore
+from hornet.core.url_cache import UrlCache
+
+
+class HornetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.body = b'x' * 50000
+        self.delay = 0
+        self.chunk_delay = 0
+        self.active = 0
+        self.max_active = 0
+        self.client_ports = []
+        self.server = gevent.pywsgi.WSGIServer(('127.0.0.1', 0), self.application, log=None)
+        self.server.start()
+        self.url = 'http://127.0.0.1:{}/payload'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def application(self, environ, start_response):
+        self.client_ports.append(environ['REMOTE_PORT'])
+        self.active += 1
+        self.max_active = max(self.active, self.max_active)
+        try:
+            gevent.sleep(self.delay)
+        finally:
+            self.active -= 1
+        start_response('200 OK', [('Content-Type', 'application/octet-stream'),
+                                  ('Content-Length', str(len(self.body)))])
+        if self.chunk_delay:
+            return self.slow_body()
+        return [self.body]
+
+    def slow_body(self):
+        for i in range(0, len(self.body), 10000):
+            yield self.body[i:i + 10000]
+            gevent.sleep(self.chunk_delay)
+
+    def download(self, scheduler):
+        download = scheduler.submit(self.url)
+        self.assertTrue(download.wait_headers())
+        body = b''.join(download.iter_body())
+        download.close()
+        return download, body
+
+    def test_download_keepalive(self):
+        """ Tests whether downloads are streamed completely, reusing pooled connections """
+
+        scheduler = DownloadScheduler()
+        for _ in range(2):
+            download, body = self.download(scheduler)
+            self.assertFalse(download.failed)
+            self.assertEquals(download.total_size, len(self.body))
+            self.assertEquals(body, self.body)
+        self.assertEquals(len(set(self.client_ports)), 1)
+
+    def test_per_host_limit(self):
+        """ Tests whether no more than max_per_host downloads from one host run at once """
+
+        self.delay = 0.2
+        scheduler = DownloadScheduler(max_per_host=2)
+        downloads = [scheduler.submit('{}?{}'.format(self.url, i)) for i in range(6)]
+        gevent.joinall([download.greenlet for download in downloads])
+        self.assertFalse(any(download.failed for download in downloads))
+        self.assertEquals(self.max_active, 2)
+
+    def test_read_timeout(self):
+        """ Tests whether a download fails when the server doesn't answer in time """
+
+        self.delay = 1
+        scheduler = DownloadScheduler(read_timeout=0.2)
+        download = scheduler.submit(self.url)
+        self.assertFalse(download.wait_headers())
+        self.assertTrue(download.failed)
+
+    def test_bandwidth_limit(self):
+        """ Tests whether downloads are slowed down to the bandwidth budget """
+
+        scheduler = DownloadScheduler(bandwidth=100000)
+        started = time.time()
+        download, body = self.download(scheduler)
+        self.assertEquals(body, self.body)
+        self.assertTrue(time.time() - started >= 0.45)
+
+    def test_payloads_stored_once(self):
+        """ Tests whether downloads are hashed and stored in the payload store once """
+
+        store_dir = tempfile.mkdtemp()
+        try:
+            scheduler = DownloadScheduler(payloads=PayloadStore(store_dir))
+            filesystem = MemorySandboxedFS()
+            for name in ('first', 'second'):
+                download = scheduler.submit(self.url)
+                self.assertTrue(download.wait_headers())
+                list(download.iter_progress())
+                download.save(filesystem, '/tmp/' + name)
+                download.close()
+            self.assertEquals(filesystem.getbytes(u'/tmp/first'), self.body)
+            self.assertEquals(filesystem.getbytes(u'/tmp/second'), self.body)
+
+            metadata = scheduler.payloads.get_metadata(download.sha256)
+            self.assertEquals(metadata['count'], 2)
+            stored_files = [name for _, _, names in os.walk(store_dir) for name in names]
+            self.assertEquals(sorted(stored_files), sorted([download.sha256, download.sha256 + '.json']))
+        finally:
+            shutil.rmtree(store_dir)
+
+    def test_coalesced(self):
+        """ Tests whether concurrent downloads of the same URL share one request, even when joined halfway """
+
+        self.chunk_delay = 0.1
+        scheduler = DownloadScheduler()
+        first = scheduler.submit(self.url)
+        second = scheduler.submit(self.url)
+        self.assertTrue(first is second)
+
+        first.wait_headers()
+        while not first.received:
+            gevent.sleep(0.01)
+        self.assertFalse(first.done)
+        late = scheduler.submit(self.url)
+        self.assertTrue(late is first)
+
+        bodies = [b''.join(download.iter_body()) for download in (first, second, late)]
+        self.assertEquals(bodies, [self.body] * 3)
+        self.assertEquals(len(self.client_ports), 1)
+        self.assertEquals(scheduler.coalesced, 2)
+        for download in (first, second, late):
+            download.close()
+
+        # Once finished, the URL is downloaded again
+        download, body = self.download(scheduler)
+        self.assertFalse(download is first)
+        self.assertEquals(len(self.client_ports), 2)
+
+    def test_cached_download(self):
+        """ Tests whether URLs in the cache are served from the payload store, until the entry expires """
+
+        store_dir = tempfile.mkdtemp()
+        try:
+            cache = UrlCache(os.path.join(store_dir, 'urls'), ttl=60)
+            scheduler = DownloadScheduler(payloads=PayloadStore(os.path.join(store_dir, 'payloads')), cache=cache)
+            self.download(scheduler)
+            download, body = self.download(scheduler)
+            self.assertEquals(body, self.body)
+            self.assertEquals(download.content_type, 'application/octet-stream')
+            self.assertEquals(len(self.client_ports), 1)
+            self.assertEquals(scheduler.served_locally, 1)
+            self.assertEquals(scheduler.payloads.get_metadata(download.sha256)['count'], 2)
+
+            filesystem = MemorySandboxedFS()
+            download = scheduler.submit(self.url)
+            download.save(filesystem, '/tmp/cached')
+            download.close()
+            self.assertEquals(filesystem.getbytes(u'/tmp/cached'), self.body)
+
+            cache.ttl = 0
+            time.sleep(0.01)
+            self.download(scheduler)
+            self.assertEquals(len(self.client_ports), 2)
+        finally:
+            shutil.rmtree(store_dir)
+
+    def test_offline(self):
+        """ Tests whether offline downloads come from the cache, the local directory or are made up, without requests """
+
+        store_dir = tempfile.mkdtemp()
+        try:
+            payloads = PayloadStore(os.path.join(store_dir, 'payloads'))
+            cache = UrlCache(os.path.join(store_dir, 'urls'), ttl=0)
+            self.download(DownloadScheduler(payloads=payloads, cache=cache))
+            self.assertEquals(len(self.client_ports), 1)
+
+            offline_directory = os.path.join(store_dir, 'offline')
+            os.makedirs(os.path.join(offline_directory, 'example.com', 'bin'))
+            with open(os.path.join(offline_directory, 'example.com', 'bin', 'x.sh'), 'w') as local_file:
+                local_file.write('#!/bin/sh\n')
+            with open(os.path.join(offline_directory, 'bot'), 'w') as local_file:
+                local_file.write('ELF')
+
+            scheduler = DownloadScheduler(payloads=payloads, cache=cache, offline=True,
+                                          offline_directory=offline_directory, fake_size=(1000, 2000))
+            # Expired, but offline anything in the cache will do
+            download, body = self.download(scheduler)
+            self.assertEquals(body, self.body)
+
+            download, body = self.download_url(scheduler, 'http://example.com/bin/x.sh')
+            self.assertEquals(body, '#!/bin/sh\n')
+            self.assertEquals(download.content_type, mimetypes.guess_type('x.sh')[0])
+            download, body = self.download_url(scheduler, 'http://example.org/files/bot')
+            self.assertEquals(body, 'ELF')
+            download, body = self.download_url(scheduler, 'http://example.com/../../payloads/bot')
+            self.assertEquals(body, 'ELF')
+
+            download, body = self.download_url(scheduler, 'http://example.com/missing.tar.gz')
+            self.assertTrue(1000 <= download.total_size <= 2000)
+            self.assertEquals(len(body), download.total_size)
+            self.assertEquals(download.content_type, mimetypes.guess_type('missing.tar.gz')[0])
+            self.assertEquals(self.download_url(scheduler, 'http://example.com/missing.tar.gz')[1], body)
+            self.assertNotEquals(self.download_url(scheduler, 'http://example.com/other')[1], body)
+            self.assertEquals(self.download_url(scheduler, 'http://example.com/')[0].content_type, 'text/html')
+
+            self.assertEquals(len(self.client_ports), 1)
+            self.assertEquals(len(payloads.known_hashes), 1)
+        finally:
+            shutil.rmtree(store_dir)
+
+    def download_url(self, scheduler, url):
+        download = scheduler.submit(url)
+        self.assertTrue(download.wait_headers())
+        body = b''.join(download.iter_body())
+        download.close()
+        return download, body
@@ -25,8 +25,10 @@ import string
 import unittest
 import tempfile
 import os
+import stat
 
-from hornet.core.fs_wrapper import SandboxedFS
+from hornet.core.fs_wrapper import SandboxedFS, MemorySandboxedFS, OverlayFS
+from hornet.core.path_cache import PathCache
 
 
 class HornetTests(unittest.TestCase):
@@ -55,6 +57,128 @@ class HornetTests(unittest.TestCase):
         # ensure directory exists on disk
         self.assertTrue(os.path.isdir(os.path.join(testfs.root_path, new_dirname)))
 
+    def test_overlay_copy_on_write(self):
+        """ Tests whether writes to an overlay leave the base filesystem untouched """
+
+        basefs = self.create_filesystem()
+        basefs.makedir(u'/etc')
+        basefs.setbytes(u'/etc/passwd', b'root:x:0:0')
+        overlay = OverlayFS(basefs)
+
+        with overlay.open('/etc/passwd', 'ab') as passwd:
+            passwd.write(b'\nguest:x:1000:1000')
+        overlay.makedir('/etc/cron.d')
+        overlay.create('/etc/cron.d/job')
+
+        self.assertEquals(overlay.getbytes(u'/etc/passwd'), b'root:x:0:0\nguest:x:1000:1000')
+        self.assertEquals(basefs.getbytes(u'/etc/passwd'), b'root:x:0:0')
+        self.assertEquals(overlay.listdir('/etc'), ['cron.d', 'passwd'])
+        self.assertEquals(basefs.listdir(u'/etc'), ['passwd'])
+        self.assertEquals(overlay.stat('/etc/cron.d').st_nlink, 2)
+        self.assertEquals(overlay.stat('/etc/passwd').st_size, 28)
+
+    def test_overlay_remove(self):
+        """ Tests whether files removed from an overlay stay in the base filesystem """
+
+        basefs = self.create_filesystem()
+        basefs.makedir(u'/tmp')
+        basefs.create(u'/tmp/file')
+        overlay = OverlayFS(basefs)
+
+        overlay.remove('/tmp/file')
+        self.assertFalse(overlay.exists('/tmp/file'))
+        self.assertEquals(overlay.listdir('/tmp'), [])
+        overlay.removedir('/tmp')
+        self.assertFalse(overlay.exists('/tmp'))
+        self.assertTrue(basefs.isfile(u'/tmp/file'))
+
+        overlay.makedir('/tmp')
+        self.assertEquals(overlay.listdir('/tmp'), [])
+
+    def test_memory_filesystem(self):
+        """ Tests whether the in-memory filesystem is built from the snapshot, with plausible stat results """
+
+        testfs = MemorySandboxedFS()
+        self.assertTrue(testfs.isdir('/etc/init.d'))
+
+        tmp_stat = testfs.stat('/tmp')
+        self.assertEquals(stat.S_IMODE(tmp_stat.st_mode), 0o1777)
+        self.assertTrue(stat.S_ISDIR(tmp_stat.st_mode))
+        self.assertEquals(tmp_stat.st_size, 4096)
+        self.assertTrue(tmp_stat.st_mtime < 1500000000)
+
+        subdirs = [name for name in testfs.listdir('/dev') if testfs.isdir(os.path.join('/dev', name))]
+        self.assertEquals(testfs.stat('/dev').st_nlink, 2 + len(subdirs))
+
+        testfs.setbytes(u'/tmp/payload', b'x' * 5000)
+        file_stat = testfs.stat('/tmp/payload')
+        self.assertTrue(stat.S_ISREG(file_stat.st_mode))
+        self.assertEquals(file_stat.st_size, 5000)
+        self.assertEquals(file_stat.st_blocks, 16)
+
+    def test_path_cache_invalidation(self):
+        """ Tests whether cached stat results and listings are forgotten when the filesystem changes """
+
+        testfs = self.create_filesystem()
+        testfs.makedir(u'/tmp')
+        self.assertEquals(testfs.cached_listdir('/tmp'), [])
+        tmp_stat = testfs.cached_stat('/tmp')
+        self.assertTrue(testfs.cached_stat('/tmp') is tmp_stat)
+
+        testfs.create('/tmp/file')
+        self.assertEquals(testfs.cached_listdir('/tmp'), ['file'])
+        with testfs.open('/tmp/file', 'w') as new_file:
+            new_file.write(u'data')
+        testfs.makedir('/tmp/dir')
+        self.assertEquals(testfs.cached_listdir('/tmp'), ['dir', 'file'])
+        self.assertEquals(testfs.cached_stat('/tmp/file').st_size, 4)
+        self.assertFalse(testfs.cached_stat('/tmp') is tmp_stat)
+
+        # Changes that go around the filesystem have to be announced
+        os.mkdir(os.path.join(testfs.root_path, 'tmp', 'other'))
+        self.assertEquals(testfs.cached_listdir('/tmp'), ['dir', 'file'])
+        testfs.invalidate('/tmp/other')
+        self.assertEquals(testfs.cached_listdir('/tmp'), ['dir', 'file', 'other'])
+
+    def test_path_cache_subtrees(self):
+        """ Tests whether invalidating a path forgets only its subtree and its directories, and evicted paths """
+
+        cache = PathCache(max_entries=4)
+        for path in ['/', '/a/b/c', '/a/d', '/e']:
+            cache.get(path, 'value', lambda: path)
+        cache.invalidate(u'/a')
+        self.assertEquals(len(cache), 1)
+        self.assertEquals(cache.get('/e', 'value', lambda: None), '/e')
+
+        for path in ['/f/g', '/h/i/j', '/k', '/l', '/m']:
+            cache.get(path, 'value', lambda: path)
+        self.assertEquals(len(cache), 4)
+        # Nothing is left in the index for the evicted paths
+        self.assertEquals(sorted(cache._children), ['/', '/h', '/h/i'])
+        cache.invalidate(u'/h/i/j')
+        self.assertEquals(sorted(cache._children), ['/'])
+        self.assertEquals(len(cache), 3)
+
+    def test_overlay_path_cache(self):
+        """ Tests whether overlays share the cache of the base, except for the paths they modified """
+
+        basefs = self.create_filesystem()
+        basefs.makedir(u'/tmp')
+        basefs.create(u'/tmp/file')
+        first, second = OverlayFS(basefs), OverlayFS(basefs)
+
+        self.assertEquals(first.cached_listdir('/tmp'), ['file'])
+        self.assertTrue(second.cached_stat('/tmp/file') is basefs.cached_stat('/tmp/file'))
+
+        first.create('/tmp/new')
+        first.remove('/tmp/file')
+        self.assertEquals(first.cached_listdir('/tmp'), ['new'])
+        self.assertEquals(second.cached_listdir('/tmp'), ['file'])
+
+        basefs.create(u'/tmp/downloaded')
+        self.assertEquals(first.cached_listdir('/tmp'), ['downloaded', 'new'])
+        self.assertEquals(second.cached_listdir('/tmp'), ['downloaded', 'file'])
+
     def create_filesystem(self):
         temp_dir = tempfile.mkdtemp(prefix='test_hornet_')
         return SandboxedFS(temp_dir)
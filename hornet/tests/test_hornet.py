@@ -20,14 +20,19 @@
 import gevent.monkey
 gevent.monkey.patch_all()
 
+import json
 import os
 import shutil
+import signal
 import unittest
+import uuid
 import tempfile
 import paramiko
 
 import hornet
 from hornet.main import Hornet
+from hornet.common.keys import HostKeyStore
+from hornet.core.db.models import AttackSession, AuthAttempt
 
 
 class HornetTests(unittest.TestCase):
@@ -76,6 +81,68 @@ class HornetTests(unittest.TestCase):
         self.assertTrue(os.path.isfile(os.path.join(self.working_dir, 'test_server.key')))
         honeypot.stop()
 
+    def test_host_keys_loaded_once(self):
+        """ Tests if host keys are loaded at startup and shared by connections """
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        keys = honeypot.host_keys.keys
+        self.assertEquals(len(keys), 2)
+        self.assertTrue(os.path.isfile(os.path.join(self.working_dir, 'test_server_ecdsa.key')))
+
+        port = honeypot.server.server_port
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect('127.0.0.1', port=port, username='testuser', password='testpassword')
+        client.close()
+        self.assertTrue(honeypot.host_keys.keys is keys)
+        honeypot.stop()
+
+    def test_moduli_loaded_once(self):
+        """ Tests if the DH moduli are parsed at startup and used for group exchange """
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        moduli = honeypot.host_keys.moduli
+        self.assertTrue(2048 in moduli.pack)
+
+        port = honeypot.server.server_port
+        transport = paramiko.Transport(('127.0.0.1', port))
+        transport.get_security_options().kex = ('diffie-hellman-group-exchange-sha256',)
+        transport.connect(username='testuser', password='testpassword')
+        self.assertTrue(transport.is_authenticated())
+        transport.close()
+        self.assertTrue(honeypot.host_keys.moduli is moduli)
+        honeypot.stop()
+
+    def test_bundled_moduli(self):
+        """ Tests if the bundled moduli are used when the system has none """
+
+        store = HostKeyStore({}, self.working_dir, moduli_file='no_such_moduli')
+        store.moduli_files = store.moduli_files[:1] + store.moduli_files[-1:]
+        store.load()
+        self.assertEquals(sorted(store.moduli.pack), [2048, 3072, 4096, 6144, 8192])
+
+        store = HostKeyStore({}, self.working_dir, moduli_file='no_such_moduli', bundled_moduli=False)
+        store.moduli_files = store.moduli_files[:1]
+        store.load()
+        self.assertTrue(store.moduli is None)
+
+    def test_host_keys_reload(self):
+        """ Tests if host keys are rotated on SIGHUP """
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        old_fingerprints = set(k.get_fingerprint() for k in honeypot.host_keys)
+        for key_file in honeypot.config.host_key_files.values():
+            os.remove(os.path.join(self.working_dir, key_file))
+        os.kill(os.getpid(), signal.SIGHUP)
+        gevent.sleep(0.5)
+        new_fingerprints = set(k.get_fingerprint() for k in honeypot.host_keys)
+        self.assertEquals(len(new_fingerprints), 2)
+        self.assertFalse(old_fingerprints & new_fingerprints)
+        honeypot.stop()
+
     def test_login_success(self):
         """ Tests whether an SSH client can login to the Honeypot """
 
@@ -107,6 +174,112 @@ class HornetTests(unittest.TestCase):
         gevent.sleep(1)
         honeypot.stop()
 
+        # Stopping flushes the recorded attempts
+        with honeypot.db_handler.session_context() as dbsession:
+            attempt = dbsession.query(AuthAttempt).filter_by(username=u'aksjd').one()
+            self.assertEquals(attempt.password, u'asjdhkasd')
+            self.assertEquals(attempt.source_ip, '127.0.0.1')
+            self.assertTrue(attempt.client_version.startswith('SSH-2.0-paramiko'))
+            self.assertFalse(attempt.success)
+
+    def test_prefork_workers(self):
+        """ Tests whether worker processes serve connections and get restarted when they die """
+
+        config_path = os.path.join(self.working_dir, 'config.json')
+        with open(config_path) as config_file:
+            config = json.load(config_file)
+        config['workers'] = 2
+        with open(config_path, 'w') as config_file:
+            json.dump(config, config_file)
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        supervisor = honeypot.supervisor
+        self.assertEquals(len(supervisor.workers), 2)
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        for _ in range(50):  # Workers need a moment to start listening
+            try:
+                client.connect('127.0.0.1', port=supervisor.server_port, username='testuser',
+                               password='testpassword')
+                break
+            except Exception:
+                gevent.sleep(0.2)
+        client_port = client.get_transport().sock.getsockname()[1]
+        channel = client.invoke_shell()
+        while not channel.recv_ready():
+            gevent.sleep(0)
+        client.close()
+
+        # The session created by the worker is persisted by the supervising process. The database
+        # can be shared with other tests, only this test's client connected from its port.
+        session_ids = []
+        for _ in range(50):
+            with honeypot.db_handler.session_context() as dbsession:
+                session_ids = [attack_session.id for attack_session in
+                               dbsession.query(AttackSession).filter_by(source_port=client_port)]
+            if session_ids:
+                break
+            gevent.sleep(0.1)
+        self.assertEquals(len(session_ids), 1)
+
+        # So are the login attempts, which are sent in batches
+        attempts = 0
+        for _ in range(50):
+            with honeypot.db_handler.session_context() as dbsession:
+                attempts = dbsession.query(AuthAttempt).filter_by(session_id=session_ids[0], username=u'testuser',
+                                                                  success=True).count()
+            if attempts:
+                break
+            gevent.sleep(0.1)
+        self.assertEquals(attempts, 1)
+
+        dead_pid = supervisor.workers[0].process.pid
+        supervisor.workers[0].process.kill()
+        while supervisor.workers[0].process.pid == dead_pid:
+            gevent.sleep(0.1)
+        self.assertEquals(len(supervisor.workers), 2)
+        honeypot.stop()
+
+    def test_prefork_stop_flushes(self):
+        """ Tests whether the records of the workers are persisted when stopping right after they were made """
+
+        config_path = os.path.join(self.working_dir, 'config.json')
+        with open(config_path) as config_file:
+            config = json.load(config_file)
+        config['workers'] = 2
+        config['persistence']['flush_interval'] = 60
+        with open(config_path, 'w') as config_file:
+            json.dump(config, config_file)
+
+        honeypot = Hornet(self.working_dir)
+        honeypot.start()
+        supervisor = honeypot.supervisor
+        username = u'flush-{}'.format(uuid.uuid4().hex[:8])  # Only this test's attempts
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        failures = 0
+        for _ in range(50):  # Workers need a moment to start listening
+            try:
+                client.connect('127.0.0.1', port=supervisor.server_port, username=username,
+                               password='wrong{}'.format(failures), allow_agent=False, look_for_keys=False)
+            except paramiko.AuthenticationException:
+                failures += 1
+                if failures == 3:
+                    break
+            except Exception:
+                gevent.sleep(0.2)
+            client.close()
+        self.assertEquals(failures, 3)
+        # Well within the flush interval, nothing was sent to the supervisor yet
+        honeypot.stop()
+
+        with honeypot.db_handler.session_context() as dbsession:
+            attempts = dbsession.query(AuthAttempt).filter_by(username=username, success=False).count()
+        self.assertEquals(attempts, 3)
+
     def test_vhost_creation(self):
         """ Tests whether virtual hosts are created properly """
 
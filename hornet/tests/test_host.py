@@ -29,7 +29,9 @@ import tempfile
 
 import hornet
 from hornet.main import Hornet
+from hornet.common.config import Network
 from hornet.common.helpers import get_random_item
+from hornet.core.host import VirtualHost
 
 
 class HornetTests(unittest.TestCase):
@@ -58,6 +60,34 @@ class HornetTests(unittest.TestCase):
         for hostname, host in honeypot.vhosts.iteritems():
             self.assertTrue(check_ipv4(host.ip_address))
 
+    def test_network_host_validation(self):
+        """ Tests whether host addresses are validated against the network range """
+
+        network = Network('10.0.0.0/8', '10.0.0.2', '10.0.0.1')
+        self.assertTrue(network.is_valid_host('10.0.0.1'))
+        self.assertTrue(network.is_valid_host('10.255.255.254'))
+        self.assertFalse(network.is_valid_host('10.0.0.0'))
+        self.assertFalse(network.is_valid_host('10.255.255.255'))
+        self.assertFalse(network.is_valid_host('11.0.0.1'))
+        self.assertFalse(network.is_valid_host('10.0.0.443'))
+        self.assertFalse(network.is_valid_host('10.0.0.010'))
+        self.assertFalse(network.is_valid_host(None))
+        for _ in range(100):
+            self.assertTrue(network.is_valid_host(network.random_host()))
+
+    def test_ip_assignment_large_network(self):
+        """ Tests whether a random IP is assigned from a /8 network """
+
+        network = Network('10.0.0.0/8', '10.0.0.2', '10.0.0.1')
+        params = {
+            'hostname': 'large01',
+            'ip_address': None,
+            'env': {},
+            'valid_logins': {}
+        }
+        host = VirtualHost(params, network, self.working_dir)
+        self.assertTrue(network.is_valid_host(host.ip_address))
+
     def test_default_welcome_message(self):
         """
             Tests whether a virtual host loads a default welcome message
@@ -103,3 +133,59 @@ class HornetTests(unittest.TestCase):
         self.assertEquals(hostname, 'test02')
         self.assertTrue(prompt.endswith('$ '))
         honeypot.stop()
+
+    def test_host_sessions_are_independent(self):
+        """ Tests whether sessions of the same host keep their own state and filesystem changes """
+
+        honeypot = Hornet(self.working_dir)
+        host = honeypot.vhosts[honeypot.config.default_hostname]
+        first = host.create_session()
+        second = host.create_session()
+
+        first.login('testuser')
+        first.working_path = '/etc'
+        self.assertEquals(first.hostname, host.hostname)
+        self.assertEquals(first.ip_address, host.ip_address)
+        self.assertFalse(second.logged_in)
+        self.assertIsNone(second.current_user)
+        self.assertEquals(second.working_path, '/')
+        self.assertFalse(host.logged_in)
+
+        first.filesystem.makedir('/private')
+        self.assertTrue(first.filesystem.isdir('/private'))
+        self.assertFalse(second.filesystem.exists('/private'))
+        self.assertFalse(host.filesystem.exists('/private'))
+
+        host.filesystem.makedir('/shared')
+        self.assertTrue(first.filesystem.isdir('/shared'))
+        self.assertTrue(second.filesystem.isdir('/shared'))
+
+    def test_memory_filesystem_host(self):
+        """ Tests whether a vhost can be configured to keep its filesystem in memory """
+
+        network = Network('192.168.0.0/24', '192.168.0.2', '192.168.0.1')
+        params = {
+            'hostname': 'memoryhost',
+            'ip_address': '192.168.0.10',
+            'env': {},
+            'valid_logins': {},
+            'filesystem': 'memory'
+        }
+        host = VirtualHost(params, network, self.working_dir)
+        self.assertTrue(host.filesystem.isdir('/etc'))
+        self.assertEquals(os.listdir(self.working_dir), ['config.json'])
+        self.assertTrue(host.welcome.startswith('Welcome to '))
+
+    def test_ifconfig_output_cached(self):
+        """ Tests whether ifconfig output is rendered once, and again only when the IP changes """
+
+        honeypot = Hornet(self.working_dir)
+        host = honeypot.vhosts[honeypot.config.default_hostname]
+        first = host.ifconfig_command.process([], host.ip_address)
+        self.assertTrue('inet addr:{} '.format(host.ip_address) in first)
+        self.assertTrue(host.ifconfig_command.process([], host.ip_address) is first)
+        self.assertTrue(host.ifconfig_command.process(['lo'], host.ip_address).startswith('lo '))
+
+        host.ip_address = '192.168.0.77'
+        second = host.ifconfig_command.process(['eth0'], host.ip_address)
+        self.assertTrue('inet addr:192.168.0.77 ' in second)
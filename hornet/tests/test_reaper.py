@@ -0,0 +1,110 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import unittest
+
+import gevent.queue
+
+from hornet.core.reaper import SessionReaper
+from hornet.core.session import Session
+
+
+class _Connection(object):
+    closed = False
+    finished_on_close = None
+
+    def __init__(self, session):
+        self.session = session
+
+    def close(self):
+        self.closed = True
+        self.finished_on_close = self.session.end_time is not None
+
+
+class HornetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.session_q = gevent.queue.Queue()
+
+    def create_session(self, reaper, start_time, authenticated=True):
+        session = Session(('127.0.0.1', 2222), self.session_q)
+        session.start_time = session.last_activity = start_time
+        session.started = session.last_active = start_time
+        session.authenticated = authenticated
+        session.connection = _Connection(session)
+        reaper.add(session)
+        return session
+
+    def test_idle_timeout(self):
+        """ Tests whether idle sessions are finished, and active ones only once they are idle for long enough """
+
+        reaper = SessionReaper(self.session_q, idle_timeout=60)
+        idle = self.create_session(reaper, 1000)
+        active = self.create_session(reaper, 1000)
+        active.last_activity = active.last_active = 1050
+
+        self.assertEquals(reaper.reap(1059), [])
+        self.assertEquals(reaper.reap(1061), [idle])
+        self.assertEquals(self.session_q.get_nowait(), idle)
+        self.assertEquals(idle.end_time, 1000)
+        self.assertTrue(idle.connection.closed)
+        self.assertFalse(idle.connection.finished_on_close)
+        self.assertFalse(active.connection.closed)
+        self.assertEquals(len(reaper), 1)
+
+        self.assertEquals(reaper.reap(1111), [active])
+        self.assertEquals(active.end_time, 1050)
+        self.assertEquals(len(reaper), 0)
+
+    def test_preauth_and_max_duration(self):
+        """ Tests whether sessions are finished when not logged in in time, or running for too long """
+
+        reaper = SessionReaper(self.session_q, idle_timeout=60, preauth_timeout=10, max_duration=100)
+        unauthenticated = self.create_session(reaper, 1000, authenticated=False)
+        busy = self.create_session(reaper, 1000)
+        finished = self.create_session(reaper, 1000)
+        finished.end_time = 1001
+
+        for now in range(1000, 1101, 5):
+            busy.last_active = now
+            expired = reaper.reap(now)
+            if now == 1010:
+                self.assertEquals(expired, [unauthenticated])
+            elif now == 1100:
+                self.assertEquals(expired, [busy])
+            else:
+                self.assertEquals(expired, [])
+        self.assertEquals(reaper.expired, 2)
+        self.assertEquals(self.session_q.qsize(), 2)
+
+    def test_full_session_queue(self):
+        """ Tests whether timed out sessions are closed without waiting when the session queue is full """
+
+        self.session_q = gevent.queue.Queue(maxsize=1)
+        reaper = SessionReaper(self.session_q, idle_timeout=60)
+        sessions = [self.create_session(reaper, 1000) for _ in range(3)]
+
+        with gevent.Timeout(1):
+            self.assertEquals(reaper.reap(1061), sessions)
+        self.assertTrue(all(session.connection.closed for session in sessions))
+        self.assertEquals(self.session_q.qsize(), 1)
@@ -0,0 +1,99 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import unittest
+
+import gevent
+
+from hornet.core.scheduler import PeriodicScheduler
+
+
+class HornetTests(unittest.TestCase):
+
+    def test_ticks(self):
+        """ Tests whether tickers tick after their delay, then every interval, and late ticks are merged """
+
+        scheduler = PeriodicScheduler(resolution=1)
+        ticker = scheduler.every(1, delay=2)
+        start = scheduler._due[0] - 2
+        self.assertEquals(len(scheduler), 1)
+
+        self.assertEquals(scheduler.tick(start + 1), start + 2)
+        self.assertFalse(ticker._ticked)
+        self.assertEquals(scheduler.tick(start + 2), start + 3)
+        self.assertTrue(ticker.wait())
+
+        # Three intervals late, a single tick, and the next one an interval from now
+        self.assertEquals(scheduler.tick(start + 6), start + 7)
+        self.assertTrue(ticker.wait())
+        self.assertFalse(ticker._ticked)
+        self.assertEquals(len(scheduler), 1)
+
+    def test_stop(self):
+        """ Tests whether stopping a ticker wakes up its waiter at once, and the scheduler drops it """
+
+        scheduler = PeriodicScheduler(resolution=1)
+        ticker = scheduler.every(60)
+        start = scheduler._due[0]
+        scheduler.tick(start)
+        self.assertTrue(ticker.wait())
+
+        waiter = gevent.spawn(ticker.wait)
+        gevent.sleep(0)
+        ticker.stop()
+        self.assertFalse(waiter.get(timeout=1))
+        self.assertFalse(ticker.wait())
+
+        self.assertEquals(scheduler.tick(start + 60), None)
+        self.assertEquals(len(scheduler), 0)
+
+    def test_duration(self):
+        """ Tests whether the scheduler stops a ticker once its duration is up, even between two ticks """
+
+        scheduler = PeriodicScheduler(resolution=1)
+        ticker = scheduler.every(10, duration=15)
+        start = scheduler._due[0]
+        scheduler.tick(start)
+        self.assertTrue(ticker.wait())
+        self.assertEquals(scheduler.tick(start + 10), start + 15)
+        self.assertTrue(ticker.wait())
+        self.assertEquals(scheduler.tick(start + 15), None)
+        self.assertFalse(ticker.wait())
+
+    def test_run(self):
+        """ Tests whether the scheduler's timer ticks many tickers on time """
+
+        scheduler = PeriodicScheduler()
+        tickers = [scheduler.every(0.01) for _ in range(100)]
+        counts = []
+
+        def count_ticks(ticker):
+            ticks = 0
+            while ticks < 5 and ticker.wait():
+                ticks += 1
+            counts.append(ticks)
+
+        gevent.joinall([gevent.spawn(count_ticks, ticker) for ticker in tickers], timeout=5)
+        self.assertEquals(counts, [5] * 100)
+        for ticker in tickers:
+            ticker.stop()
@@ -0,0 +1,107 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import unittest
+
+import gevent
+import gevent.queue
+
+from hornet.core.commands.assets import COMMAND_ASSETS
+from hornet.core.host import VirtualHost
+from hornet.core.shell import Shell
+
+
+class _Channel(object):
+
+    def __init__(self):
+        self.sent = []
+
+    def sendall(self, data):
+        self.sent.append(data)
+
+
+class _Session(object):
+    last_activity = None
+
+    def touch(self):
+        self.last_activity = 1
+
+
+class _Shell(Shell):
+
+    def __init__(self):
+        # Skip TelnetHandler.__init__, which would run the whole session
+        self.sock = _Channel()
+        self.session = _Session()
+        self.cookedq = gevent.queue.Queue()
+        self.CODES = dict(Shell.CODES, DEOL='\x1b[K')
+        self._output = []
+        self._output_size = 0
+        self.interrupt = False
+        self._tickers = []
+
+
+class HornetTests(unittest.TestCase):
+
+    def test_output_coalesced(self):
+        """ Tests whether output is buffered until flushed, then sent at once """
+
+        shell = _Shell()
+        shell.writeline('first')
+        shell.writeline('second')
+        VirtualHost.send_asset('ls/help', shell)
+        self.assertEquals(shell.sock.sent, [])
+        self.assertEquals(shell.session.last_activity, None)
+
+        shell.flush()
+        shell.flush()
+        self.assertEquals(shell.sock.sent, ['first\r\nsecond\r\n' + COMMAND_ASSETS.get('ls/help')])
+        self.assertTrue(shell.session.last_activity is not None)
+
+    def test_output_flush_points(self):
+        """ Tests whether output is sent on updateline(), when waiting for input, and when too much is buffered """
+
+        shell = _Shell()
+        shell.writeline('Saving to: \'x.sh\'')
+        shell.updateline('0%')
+        self.assertEquals(shell.sock.sent, ['Saving to: \'x.sh\'\r\n\r\x1b[K0%'])
+
+        shell.write('$ ')
+        shell.cookedq.put('l')
+        self.assertEquals(shell.getc(), 'l')
+        self.assertEquals(shell.sock.sent[1:], ['$ '])
+
+        shell.write('x' * Shell.MAX_BUFFERED_OUTPUT)
+        self.assertEquals(len(shell.sock.sent), 3)
+
+    def test_ctrl_c_stops_tickers(self):
+        """ Tests whether Ctrl+C wakes up a command waiting for its next tick """
+
+        shell = _Shell()
+        ticker = shell.every(60, delay=60)
+        waiter = gevent.spawn(ticker.wait)
+        gevent.sleep(0)
+        shell.inputcooker_store_queue(chr(3))
+        self.assertFalse(waiter.get(timeout=1))
+        self.assertTrue(shell.interrupt)
+        self.assertEquals(shell._tickers, [])
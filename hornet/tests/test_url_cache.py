@@ -0,0 +1,70 @@
+# !/usr/bin/env python
+#
+# Hornet - SSH Honeypot
+#
+# Copyright (C) 2015 Aniket Panse <aniketpanse@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gevent.monkey
+
+gevent.monkey.patch_all()
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from hornet.core.url_cache import UrlCache
+
+
+class HornetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.working_dir, 'urls')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_persistent(self):
+        """ Tests whether entries are kept on disk, and seen by other caches on the same directory """
+
+        cache = UrlCache(self.directory)
+        other_cache = UrlCache(self.directory)
+        cache.put('http://example.com/x.sh', 'ab' * 32, 'text/plain', 10)
+
+        entry = other_cache.get('http://example.com/x.sh')
+        self.assertEquals(entry['sha256'], 'ab' * 32)
+        self.assertEquals(entry['size'], 10)
+        self.assertEquals(len(UrlCache(self.directory)), 1)
+        self.assertEquals(cache.get('http://example.com/y.sh'), None)
+
+    def test_ttl_and_lru(self):
+        """ Tests whether expired entries are only returned when allowed, and the least recently used are evicted """
+
+        cache = UrlCache(self.directory, ttl=60, max_entries=2)
+        cache.put('http://example.com/1', '1' * 64, 'text/plain', 1)
+        cache.put('http://example.com/2', '2' * 64, 'text/plain', 2)
+        cache.get('http://example.com/1')
+        cache.put('http://example.com/3', '3' * 64, 'text/plain', 3)
+
+        self.assertEquals(cache.get('http://example.com/2'), None)
+        self.assertEquals(len(os.listdir(self.directory)), 2)
+
+        cache.ttl = 0
+        time.sleep(0.01)
+        self.assertEquals(cache.get('http://example.com/1'), None)
+        self.assertEquals(cache.get('http://example.com/1', allow_stale=True)['size'], 1)